@@ -0,0 +1,3 @@
+"""
+PDF抽出パイプラインのベンチマーク
+"""
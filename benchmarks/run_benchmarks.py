@@ -0,0 +1,280 @@
+"""
+PDF抽出パイプラインのベンチマーク
+
+使い方:
+    python -m benchmarks.run_benchmarks -o before.json
+    python -m benchmarks.run_benchmarks --sizes 10 100 --profiles text tables -o after.json
+    python -m benchmarks.run_benchmarks --compare before.json after.json
+
+合成PDF（benchmarks/synthetic_pdf.py）をサイズ・種類ごとに生成し、
+工程ごとの処理時間とピークメモリ（RSS）をJSONで出力します。
+各ケースは別プロセスで実行するので、ピークメモリはケースごとの値です
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .synthetic_pdf import generate_pdf
+
+PROFILES = ["text", "tables", "scanned", "mixed"]
+SIZES = [10, 100, 1000]
+STAGES = [
+    "open", "extract_text", "extract_tables", "content_build", "dataframe_build",
+    "condition_matching", "section_search"
+]
+PDF_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".pdfs")
+
+
+def peak_rss_mb():
+    """このプロセスのピークRSS（MB）"""
+    # Linuxの ru_maxrss は fork/exec 前の親プロセスの値を引き継ぐので、VmHWM を優先する
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linuxは KB、macOSは バイト単位
+    if sys.platform == "darwin":
+        return round(peak / (1024 * 1024), 1)
+    return round(peak / 1024, 1)
+
+
+def synthetic_pdf_path(profile, pages, seed=0):
+    """合成PDFを生成（生成済みなら再利用）してパスを返す"""
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    path = os.path.join(PDF_CACHE_DIR, f"{profile}_{pages}_{seed}.pdf")
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            f.write(generate_pdf(pages, profile, seed))
+    return path
+
+
+def run_stages(pdf_path):
+    """工程ごとに処理時間を計測（別プロセスで実行）"""
+    # pandas の読み込み時間は dataframe_build に含めない
+    import pandas  # noqa: F401
+    import pdfplumber
+    from extraction import (
+        PARTICIPATION_KEYWORDS, ConditionScanner, KeywordAutomaton, build_content, find_sections,
+        needs_table_scan
+    )
+    
+    timings = dict.fromkeys(STAGES, 0.0)
+    
+    started = time.perf_counter()
+    pdf = pdfplumber.open(pdf_path)
+    pages = pdf.pages
+    timings["open"] = time.perf_counter() - started
+    
+    page_results = []
+    table_pages_skipped = 0
+    for page in pages:
+        started = time.perf_counter()
+        text = page.extract_text()
+        timings["extract_text"] += time.perf_counter() - started
+        
+        # アプリと同じく、罫線の判定を含めて表の検出時間とする
+        started = time.perf_counter()
+        tables = []
+        if needs_table_scan(page):
+            tables = page.extract_tables() or []
+        else:
+            table_pages_skipped += 1
+        timings["extract_tables"] += time.perf_counter() - started
+        
+        page_results.append({
+            'page': page.page_number, 'text': text, 'tables': tables,
+            'warnings': [], 'error': None
+        })
+    pdf.close()
+    
+    started = time.perf_counter()
+    full_text, page_contents, all_tables = build_content(page_results)
+    timings["content_build"] = time.perf_counter() - started
+    
+    # 表の表示・CSV出力と同じく、表ごとにDataFrameを作る
+    started = time.perf_counter()
+    for record in all_tables:
+        record.to_dataframe()
+    timings["dataframe_build"] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    scanner = ConditionScanner()
+    for page_data in page_contents:
+        scanner.feed(page_data['text'])
+    timings["condition_matching"] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    sections = find_sections(full_text, KeywordAutomaton(PARTICIPATION_KEYWORDS))
+    timings["section_search"] = time.perf_counter() - started
+    
+    return {
+        'stages': {name: round(seconds, 4) for name, seconds in timings.items()},
+        'counts': {
+            'pages': len(page_contents),
+            'chars': len(full_text),
+            'tables': len(all_tables),
+            'conditions': len(scanner.conditions),
+            'sections': len(sections),
+            'table_pages_skipped': table_pages_skipped
+        },
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def run_end_to_end(pdf_path, single_pass=False, low_memory=False):
+    """アプリと同じ extract_all_content を通しで計測（別プロセスで実行）"""
+    from extraction import extract_all_content
+    
+    started = time.perf_counter()
+    full_text, page_contents, all_tables = extract_all_content(
+        pdf_path, single_pass=single_pass, low_memory=low_memory
+    )
+    return {
+        'seconds': round(time.perf_counter() - started, 4),
+        'chars': len(full_text),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def _in_fresh_process(func, *args):
+    # メモリを他のケースと分けて測るため、ケースごとに新しいプロセスで実行
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(func, *args).result()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _package_version(name):
+    try:
+        return __import__(name).__version__
+    except Exception:
+        return None
+
+
+def run_benchmarks(profiles=PROFILES, sizes=SIZES, seed=0, on_case=None, single_pass=False,
+                   low_memory=False):
+    """全ケースを実行して結果を返す"""
+    from extraction import EXTRACTOR_VERSION
+    
+    results = {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pdfplumber': _package_version("pdfplumber"),
+            'pandas': _package_version("pandas"),
+            'extractor_version': EXTRACTOR_VERSION,
+            'seed': seed,
+            'single_pass': single_pass,
+            'low_memory': low_memory
+        },
+        'cases': {}
+    }
+    
+    for profile in profiles:
+        for pages in sizes:
+            pdf_path = synthetic_pdf_path(profile, pages, seed)
+            case = _in_fresh_process(run_stages, pdf_path)
+            case['end_to_end'] = _in_fresh_process(run_end_to_end, pdf_path, single_pass, low_memory)
+            case['file_size'] = os.path.getsize(pdf_path)
+            name = f"{profile}/{pages}"
+            results['cases'][name] = case
+            if on_case:
+                on_case(name, case)
+    
+    return results
+
+
+def compare(old, new):
+    """2つの結果を比較した行のリストを返す（(ケース, 項目, 旧, 新, 変化率)）"""
+    rows = []
+    for name, new_case in new['cases'].items():
+        old_case = old['cases'].get(name)
+        if old_case is None:
+            continue
+        items = [(f"stage:{stage}", old_case['stages'].get(stage), new_case['stages'].get(stage))
+                 for stage in STAGES]
+        items.append(("end_to_end", old_case['end_to_end']['seconds'],
+                      new_case['end_to_end']['seconds']))
+        items.append(("end_to_end_rss_mb", old_case['end_to_end']['peak_rss_mb'],
+                      new_case['end_to_end']['peak_rss_mb']))
+        for item, before, after in items:
+            change = None
+            if before and after is not None:
+                change = (after - before) / before * 100
+            rows.append((name, item, before, after, change))
+    return rows
+
+
+def _print_case(name, case):
+    stages = " ".join(f"{stage}={seconds:.3f}s" for stage, seconds in case['stages'].items())
+    print(f"{name:<14} {stages}")
+    print(f"{'':<14} end_to_end={case['end_to_end']['seconds']:.3f}s "
+          f"peak_rss={case['end_to_end']['peak_rss_mb']}MB counts={case['counts']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run_benchmarks",
+        description="PDF抽出パイプラインのベンチマーク"
+    )
+    parser.add_argument("--profiles", nargs="+", default=PROFILES, choices=PROFILES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--single-pass", action="store_true",
+                        help="通しの計測で表の文字を本文から除くモードを使う")
+    parser.add_argument("--low-memory", action="store_true",
+                        help="通しの計測で省メモリモードを使う")
+    parser.add_argument("-o", "--output", help="結果を保存するJSONファイル")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="2つの結果JSONを比較する")
+    args = parser.parse_args(argv)
+    
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f:
+            new = json.load(f)
+        print(f"{'ケース':<14}{'項目':<28}{'旧':>10}{'新':>10}{'変化':>9}")
+        for name, item, before, after, change in compare(old, new):
+            change_text = f"{change:+.1f}%" if change is not None else "-"
+            print(f"{name:<14}{item:<28}{before!s:>10}{after!s:>10}{change_text:>9}")
+        return 0
+    
+    results = run_benchmarks(args.profiles, args.sizes, args.seed, on_case=_print_case,
+                             single_pass=args.single_pass, low_memory=args.low_memory)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n結果を保存しました: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
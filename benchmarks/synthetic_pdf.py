@@ -0,0 +1,236 @@
+"""
+ベンチマーク用の合成PDF（入札説明書風）を生成する
+
+外部ライブラリを使わずにPDFを直接書き出します。
+日本語はIdentity-HエンコーディングのCIDフォントで書き込み、
+ToUnicodeを付けているのでpdfplumberでそのまま抽出できます
+
+ページの種類:
+    text     本文のみ（参加資格などの条件文を含む）
+    tables   罫線つきの表が中心のページ
+    scanned  スキャン画像のみでテキストのないページ
+"""
+
+import random
+import zlib
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+FONT_SIZE = 10.5
+LINE_HEIGHT = 16
+
+SENTENCES = [
+    "本業務は、{org}が発注する{work}に関する業務である。",
+    "受注者は、仕様書に基づき誠実に業務を履行しなければならない。",
+    "業務の実施にあたっては、関係法令を遵守すること。",
+    "提出された書類は返却しないものとする。",
+    "質問がある場合は、指定の期日までに書面で提出すること。",
+    "契約締結後、速やかに業務計画書を提出すること。",
+    "本件に関する問い合わせは、{org}契約担当まで。",
+    "成果品は電子データにより納品するものとする。",
+]
+
+CONDITIONS = [
+    "（{n}）建設業法に基づく許可を有していること",
+    "（{n}）過去5年間に同種業務の実績があること",
+    "（{n}）資本金1000万円以上であること",
+    "（{n}）主任技術者を配置できること",
+    "（{n}）{org}内に本店又は支店を有すること",
+    "（{n}）ISO9001の認証を取得していること",
+    "（{n}）会社更生法に基づく更生手続開始の申立てがなされていない者であること",
+]
+
+ORGS = ["国土交通省", "○○市", "△△県", "□□町"]
+WORKS = ["道路設計", "橋梁点検", "河川測量", "庁舎清掃", "システム開発"]
+
+
+def _hex(text):
+    return text.encode("utf-16-be").hex().upper()
+
+
+class _Writer:
+    """PDFオブジェクトを順に書き出す"""
+
+    def __init__(self):
+        self.objects = []
+
+    def add(self, body):
+        self.objects.append(body)
+        return len(self.objects)
+
+    def reserve(self):
+        self.objects.append(None)
+        return len(self.objects)
+
+    def set(self, number, body):
+        self.objects[number - 1] = body
+
+    def stream(self, data, compress=True):
+        if compress:
+            data = zlib.compress(data)
+            header = f"<< /Length {len(data)} /Filter /FlateDecode >>".encode()
+        else:
+            header = f"<< /Length {len(data)} >>".encode()
+        return self.add(header + b"\nstream\n" + data + b"\nendstream")
+
+    def build(self, root):
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(self.objects, start=1):
+            offsets.append(len(out))
+            if isinstance(body, str):
+                body = body.encode()
+            out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+        xref = len(out)
+        out += f"xref\n0 {len(self.objects) + 1}\n0000000000 65535 f \n".encode()
+        for offset in offsets:
+            out += f"{offset:010d} 00000 n \n".encode()
+        out += (f"trailer\n<< /Size {len(self.objects) + 1} /Root {root} 0 R >>\n"
+                f"startxref\n{xref}\n%%EOF\n").encode()
+        return bytes(out)
+
+
+def _text_ops(lines, x, y):
+    ops = []
+    for line in lines:
+        ops.append(f"BT /F1 {FONT_SIZE} Tf 1 0 0 1 {x} {y} Tm <{_hex(line)}> Tj ET")
+        y -= LINE_HEIGHT
+    return ops, y
+
+
+def _table_ops(rng, x, y, rows, cols):
+    """罫線つきの表（セルにテキスト）"""
+    cell_w = (PAGE_WIDTH - 2 * x) / cols
+    cell_h = 20
+    ops = ["0.5 w"]
+    for r in range(rows + 1):
+        ops.append(f"{x} {y - r * cell_h} m {PAGE_WIDTH - x} {y - r * cell_h} l S")
+    for c in range(cols + 1):
+        ops.append(f"{x + c * cell_w:.2f} {y} m {x + c * cell_w:.2f} {y - rows * cell_h} l S")
+    texts = []
+    for r in range(rows):
+        for c in range(cols):
+            label = ["項目", "数量", "単位", "備考", "金額", "期日"][c % 6] if r == 0 \
+                else f"{rng.choice(WORKS)}{rng.randint(1, 999)}"
+            texts.append(
+                f"BT /F1 9 Tf 1 0 0 1 {x + c * cell_w + 3:.2f} {y - (r + 1) * cell_h + 6} Tm "
+                f"<{_hex(label)}> Tj ET"
+            )
+    return ops + texts, y - rows * cell_h
+
+
+def _page_content(rng, kind, page_number):
+    """1ページ分のコンテンツストリーム"""
+    org = rng.choice(ORGS)
+    if kind == "scanned":
+        # スキャン画像の代わりにインライン画像だけを置く
+        pixels = "".join(rng.choice("89ABCDEF") + "0" for _ in range(64))
+        return (f"q {PAGE_WIDTH - 60} 0 0 {PAGE_HEIGHT - 60} 30 30 cm "
+                f"BI /W 8 /H 8 /BPC 8 /CS /G /F /AHx ID {pixels}> EI Q").encode()
+
+    ops = []
+    y = PAGE_HEIGHT - 60
+    heading = [f"第{page_number}章 {rng.choice(WORKS)}に関する事項"]
+    text_ops, y = _text_ops(heading, 50, y)
+    ops += text_ops
+    
+    if kind == "tables":
+        for _ in range(rng.randint(2, 3)):
+            table_ops, y = _table_ops(rng, 50, y - 10, rng.randint(4, 8), rng.randint(3, 5))
+            ops += table_ops
+            y -= 20
+        lines = [rng.choice(SENTENCES).format(org=org, work=rng.choice(WORKS))
+                 for _ in range(max(0, int((y - 60) / LINE_HEIGHT)))]
+    else:
+        lines = []
+        while len(lines) < 44:
+            if rng.random() < 0.15:
+                lines.append("入札参加資格")
+                lines += [c.format(n=i + 1, org=org)
+                          for i, c in enumerate(rng.sample(CONDITIONS, rng.randint(3, 6)))]
+            else:
+                lines.append(rng.choice(SENTENCES).format(org=org, work=rng.choice(WORKS)))
+        lines = lines[:44]
+    text_ops, y = _text_ops(lines, 50, y)
+    ops += text_ops
+    return "\n".join(ops).encode()
+
+
+def _to_unicode_cmap(chars):
+    """Identity-Hのコード（= Unicode）をそのまま文字に対応づけるToUnicode CMap"""
+    lines = [
+        "/CIDInit /ProcSet findresource begin",
+        "12 dict begin",
+        "begincmap",
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+        "/CMapName /Adobe-Identity-UCS def",
+        "/CMapType 2 def",
+        "1 begincodespacerange <0000> <FFFF> endcodespacerange",
+    ]
+    codes = sorted(ord(ch) for ch in chars if ord(ch) <= 0xFFFF)
+    for start in range(0, len(codes), 100):
+        block = codes[start:start + 100]
+        lines.append(f"{len(block)} beginbfchar")
+        lines += [f"<{code:04X}> <{code:04X}>" for code in block]
+        lines.append("endbfchar")
+    lines += ["endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end"]
+    return "\n".join(lines).encode()
+
+
+def page_kinds(profile, pages, seed=0):
+    """プロファイルに応じたページ種類の並び"""
+    rng = random.Random(seed)
+    if profile == "mixed":
+        return [rng.choice(["text", "text", "tables", "scanned"]) for _ in range(pages)]
+    return [profile] * pages
+
+
+def generate_pdf(pages, profile="text", seed=0):
+    """合成PDFのバイト列を生成
+
+    profile は text / tables / scanned / mixed のいずれか
+    """
+    rng = random.Random(seed)
+    writer = _Writer()
+    catalog = writer.reserve()
+    pages_root = writer.reserve()
+    font = writer.reserve()
+    
+    kinds = page_kinds(profile, pages, seed)
+    page_numbers = []
+    used_chars = set()
+    for i, kind in enumerate(kinds):
+        content = _page_content(rng, kind, i + 1)
+        # <...> 内の16進文字列から使われている文字を集める
+        for chunk in content.split(b"<")[1:]:
+            hex_text = chunk.split(b">")[0]
+            if hex_text and len(hex_text) % 4 == 0:
+                try:
+                    used_chars.update(bytes.fromhex(hex_text.decode()).decode("utf-16-be"))
+                except ValueError:
+                    pass
+        content_number = writer.stream(content)
+        page_numbers.append(writer.add(
+            f"<< /Type /Page /Parent {pages_root} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> /Contents {content_number} 0 R >>"
+        ))
+    
+    to_unicode = writer.stream(_to_unicode_cmap(used_chars))
+    descriptor = writer.add(
+        "<< /Type /FontDescriptor /FontName /HeiseiMin-W3 /Flags 6 "
+        "/FontBBox [-123 -257 1001 910] /ItalicAngle 0 /Ascent 723 /Descent -241 "
+        "/CapHeight 709 /StemV 69 >>"
+    )
+    cid_font = writer.add(
+        "<< /Type /Font /Subtype /CIDFontType0 /BaseFont /HeiseiMin-W3 "
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+        f"/FontDescriptor {descriptor} 0 R /DW 1000 >>"
+    )
+    writer.set(font, (
+        "<< /Type /Font /Subtype /Type0 /BaseFont /HeiseiMin-W3 /Encoding /Identity-H "
+        f"/DescendantFonts [{cid_font} 0 R] /ToUnicode {to_unicode} 0 R >>"
+    ))
+    kids = " ".join(f"{n} 0 R" for n in page_numbers)
+    writer.set(pages_root, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_numbers)} >>")
+    writer.set(catalog, f"<< /Type /Catalog /Pages {pages_root} 0 R >>")
+    return writer.build(catalog)
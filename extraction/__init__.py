@@ -0,0 +1,101 @@
+"""
+入札説明書PDFの抽出処理を共通化したパッケージ
+Streamlitに依存しないので、ワーカープロセスやバッチ・ベンチマークからも使えます
+
+各モジュールは最初に使われたときに読み込むので、
+`import extraction.pages` のように一部だけを使う場合は他のモジュールを読み込みません
+"""
+
+import importlib
+
+# 公開する名前 → 定義しているモジュール
+_EXPORTS = {
+    'process_pdf': 'batch',
+    'run_batch': 'batch',
+    'write_common_conditions': 'batch',
+    'ExtractionCache': 'cache',
+    'InFlightExtractions': 'cache',
+    'cache_key_hash': 'cache',
+    'compute_file_hash': 'cache',
+    'compute_path_hash': 'cache',
+    'get_or_extract': 'cache',
+    'lookup': 'cache',
+    'make_cache_key': 'cache',
+    'ConditionMatcher': 'conditions',
+    'ConditionScanner': 'conditions',
+    'extract_conditions': 'conditions',
+    'extract_conditions_with_category': 'conditions',
+    'extract_page_conditions': 'conditions',
+    'BATCH_OUTPUT_DIR': 'config',
+    'EXTRACTOR_VERSION': 'config',
+    'MinHasher': 'dedup',
+    'NearDuplicateIndex': 'dedup',
+    'near_duplicate_groups': 'dedup',
+    'shingle_hashes': 'dedup',
+    'ContentBuilder': 'document',
+    'build_content': 'document',
+    'consume_page_results': 'document',
+    'extract_all_content': 'document',
+    'iter_page_results': 'document',
+    'table_scan_stats': 'document',
+    'JobQueue': 'jobs',
+    'JobWorkerPool': 'jobs',
+    'load_job_content': 'jobs',
+    'KeywordAutomaton': 'keywords',
+    'extract_page': 'pages',
+    'format_table': 'pages',
+    'needs_table_scan': 'pages',
+    'default_workers': 'parallel',
+    'extract_all_content_parallel': 'parallel',
+    'iter_page_results_parallel': 'parallel',
+    'PROJECT_ORDERS': 'projects',
+    'ProjectRegistry': 'projects',
+    'TableProfileStore': 'profiles',
+    'layout_fingerprint': 'profiles',
+    'resolve_table_settings': 'profiles',
+    'tune_table_settings': 'profiles',
+    'CollectingReporter': 'progress',
+    'ExtractionReporter': 'progress',
+    'PageResultStore': 'revisions',
+    'compare_with_previous': 'revisions',
+    'diff_contents': 'revisions',
+    'diff_with_previous': 'revisions',
+    'extract_all_content_incremental': 'revisions',
+    'iter_page_results_incremental': 'revisions',
+    'page_fingerprint': 'revisions',
+    'record_version': 'revisions',
+    'PARTICIPATION_KEYWORDS': 'sections',
+    'SectionSpan': 'sections',
+    'find_keyword_lines': 'sections',
+    'find_sections': 'sections',
+    'UploadSpool': 'source',
+    'iter_pages': 'source',
+    'open_pdf': 'source',
+    'FullTextIndex': 'search_index',
+    'page_search_text': 'search_index',
+    'ConditionIndex': 'similarity',
+    'condition_key': 'similarity',
+    'ExtractionStore': 'store',
+    'TableRecord': 'tables',
+    'table_to_dataframe': 'tables',
+    'write_tables_zip': 'tables',
+    'TextBuilder': 'text',
+    'extract_text_from_pdf': 'text',
+    'iter_text_pages': 'text',
+    'TextPager': 'viewer',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return __all__
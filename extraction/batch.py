@@ -0,0 +1,320 @@
+"""
+フォルダ内の入札説明書PDFを一括処理するバッチ
+
+使い方:
+    python -m extraction 入札説明書/ -o 抽出結果/ -w 8
+    python -m extraction "入札説明書/**/*.pdf" --no-tables
+    python -m extraction 入札説明書/ --index
+    python -m extraction 入札説明書/ --similarity 0.7
+
+ドキュメントごとに 参加条件（CSV/JSON）と表（CSV）を出力し、
+処理済みのファイルはハッシュで判定して次回以降スキップします
+最後に、複数のドキュメントに出てくる参加条件の一覧（common_conditions.csv）を出力します
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .cache import compute_path_hash
+from .conditions import extract_page_conditions
+from .config import EXTRACTOR_VERSION
+from .document import extract_all_content
+from .parallel import get_mp_context
+from .profiles import TableProfileStore, resolve_table_settings
+from .progress import CollectingReporter
+from .search_index import DEFAULT_INDEX_PATH, FullTextIndex
+from .similarity import DEFAULT_GROUP_THRESHOLD, ConditionIndex
+
+MANIFEST_NAME = "manifest.json"
+COMMON_CONDITIONS_NAME = "common_conditions.csv"
+
+
+def find_pdfs(inputs):
+    """ディレクトリまたはglobパターンからPDFファイルを列挙"""
+    paths = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*.pdf")
+        for path in glob.glob(pattern, recursive=True):
+            if path.lower().endswith(".pdf") and os.path.isfile(path):
+                paths.append(os.path.abspath(path))
+    # 重複を除き、順番を固定する
+    return sorted(set(paths))
+
+
+def _write_csv(path, header, rows):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _write_json(path, data):
+    # 途中で落ちても壊れたファイルが残らないよう、一時ファイルから置き換える
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def process_pdf(pdf_path, output_dir, file_hash=None, extract_tables=True,
+                auto_table_settings=False, low_memory=False, index_path=None):
+    """1つのPDFから参加条件と表を抽出して output_dir に書き出す
+
+    auto_table_settings を指定すると、表抽出の設定をレイアウトごとに調整・記憶します
+    low_memory を指定すると、ページ数によらずメモリ使用量を一定に保ちます
+    index_path を指定すると、ページの本文をその全文検索インデックスに登録します
+
+    出力:
+        conditions.csv / conditions.json  参加条件（ページ・分類つき）
+        tables/P{ページ}_T{番号}.csv      検出された表
+        result.json                       処理結果のサマリー
+    """
+    started = time.perf_counter()
+    file_hash = file_hash or compute_path_hash(pdf_path)
+    reporter = CollectingReporter()
+    
+    table_settings, table_profile = None, None
+    if extract_tables and auto_table_settings:
+        table_settings, table_profile = resolve_table_settings(pdf_path, store=TableProfileStore())
+    
+    full_text, page_contents, all_tables = extract_all_content(
+        pdf_path,
+        extract_tables=extract_tables,
+        table_settings=table_settings,
+        reporter=reporter,
+        low_memory=low_memory
+    )
+    
+    # ページごとに条件を検出し、どのページの条件かを記録
+    conditions = extract_page_conditions(page_contents)
+    
+    os.makedirs(output_dir, exist_ok=True)
+    _write_csv(
+        os.path.join(output_dir, "conditions.csv"),
+        ['No.', 'ページ', '分類', '参加条件'],
+        [(i + 1, c['page'], c['category'], c['condition']) for i, c in enumerate(conditions)]
+    )
+    _write_json(os.path.join(output_dir, "conditions.json"), conditions)
+    
+    if index_path:
+        FullTextIndex(index_path).add_document(file_hash, os.path.basename(pdf_path), page_contents)
+    
+    tables = []
+    if all_tables:
+        table_dir = os.path.join(output_dir, "tables")
+        os.makedirs(table_dir, exist_ok=True)
+        for record in all_tables:
+            file_name = f"P{record.page}_T{record.index}.csv"
+            try:
+                record.to_dataframe().to_csv(
+                    os.path.join(table_dir, file_name), index=False, encoding='utf-8-sig'
+                )
+            except Exception as e:
+                reporter.warning(f"ページ{record.page} 表{record.index}のCSV出力エラー: {str(e)}")
+                continue
+            tables.append({
+                'page': record.page,
+                'table_index': record.index,
+                'file': os.path.join("tables", file_name)
+            })
+    
+    result = {
+        'file': pdf_path,
+        'hash': file_hash,
+        'extractor_version': EXTRACTOR_VERSION,
+        'pages': len(page_contents),
+        'char_count': len(full_text),
+        'condition_count': len(conditions),
+        'table_count': len(tables),
+        'tables': tables,
+        'table_profile': table_profile,
+        'warnings': reporter.warnings,
+        'elapsed': round(time.perf_counter() - started, 3)
+    }
+    _write_json(os.path.join(output_dir, "result.json"), result)
+    return result
+
+
+def _document_dir(output_root, pdf_path, file_hash):
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    return os.path.join(output_root, f"{stem}_{file_hash[:8]}")
+
+
+def load_manifest(output_root):
+    """処理済みドキュメントの一覧（ハッシュ → 出力先）を読み込む"""
+    path = os.path.join(output_root, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_common_conditions(output_root, threshold=DEFAULT_GROUP_THRESHOLD):
+    """出力済みの全ドキュメントの参加条件から、複数のドキュメントに出てくるものを書き出す
+
+    番号の違いやほぼ同じ言い回し（ConditionIndex.grouped の類似度 threshold 以上）は1つにまとめ、
+    出てくるドキュメントの多い順に common_conditions.csv に書き出して、その件数を返します
+    """
+    conditions, documents = [], []
+    for entry in load_manifest(output_root).values():
+        output = entry.get('output', "")
+        if not os.path.isdir(output):
+            # 出力先ディレクトリごと移動された場合
+            output = os.path.join(output_root, os.path.basename(output))
+        path = os.path.join(output, "conditions.json")
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding='utf-8') as f:
+            for condition in json.load(f):
+                conditions.append(condition['condition'])
+                documents.append(os.path.basename(entry['file']))
+    
+    rows = []
+    for group in ConditionIndex(conditions).grouped(threshold):
+        names = list(dict.fromkeys(documents[i] for i in group['members']))
+        if len(names) < 2:
+            continue
+        rows.append((group['text'], group['count'], len(names), " / ".join(names)))
+    rows.sort(key=lambda row: (-row[2], -row[1]))
+    
+    _write_csv(
+        os.path.join(output_root, COMMON_CONDITIONS_NAME),
+        ['No.', '参加条件', '出現回数', 'ドキュメント数', 'ドキュメント'],
+        [(i + 1,) + row for i, row in enumerate(rows)]
+    )
+    return len(rows)
+
+
+def run_batch(inputs, output_root, workers=None, extract_tables=True, force=False,
+              on_result=None, auto_table_settings=False, low_memory=False, index_path=None,
+              similarity=DEFAULT_GROUP_THRESHOLD):
+    """複数のPDFを並列に処理し、処理件数やスループットのサマリーを返す
+
+    on_result(結果, エラー) はドキュメントが終わるたびに呼ばれます
+    最後に common_conditions.csv（similarity 以上の言い回しをまとめる）を出力します
+    """
+    started = time.perf_counter()
+    os.makedirs(output_root, exist_ok=True)
+    manifest = load_manifest(output_root)
+    
+    summary = {
+        'found': 0, 'processed': 0, 'skipped': 0, 'failed': 0,
+        'pages': 0, 'elapsed': 0.0, 'pages_per_sec': 0.0, 'docs_per_sec': 0.0,
+        'common_conditions': 0
+    }
+    
+    # ハッシュで処理済みかを判定（同じ内容のファイルは1回だけ処理）
+    jobs = {}
+    for pdf_path in find_pdfs(inputs):
+        summary['found'] += 1
+        file_hash = compute_path_hash(pdf_path)
+        entry = manifest.get(file_hash)
+        if not force and entry and entry.get('extractor_version') == EXTRACTOR_VERSION:
+            summary['skipped'] += 1
+            continue
+        if file_hash in jobs:
+            summary['skipped'] += 1
+            continue
+        jobs[file_hash] = pdf_path
+    
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                 mp_context=get_mp_context()) as executor:
+            futures = {
+                executor.submit(process_pdf, pdf_path,
+                                _document_dir(output_root, pdf_path, file_hash),
+                                file_hash, extract_tables,
+                                auto_table_settings, low_memory,
+                                index_path): (file_hash, pdf_path)
+                for file_hash, pdf_path in jobs.items()
+            }
+            for future in as_completed(futures):
+                file_hash, pdf_path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    summary['failed'] += 1
+                    if on_result:
+                        on_result({'file': pdf_path, 'hash': file_hash}, e)
+                    continue
+                
+                summary['processed'] += 1
+                summary['pages'] += result['pages']
+                manifest[file_hash] = {
+                    'file': pdf_path,
+                    'output': _document_dir(output_root, pdf_path, file_hash),
+                    'extractor_version': EXTRACTOR_VERSION
+                }
+                # 途中で止めても処理済みの分はスキップできるよう都度保存
+                _write_json(os.path.join(output_root, MANIFEST_NAME), manifest)
+                if on_result:
+                    on_result(result, None)
+    
+    summary['common_conditions'] = write_common_conditions(output_root, similarity)
+    
+    elapsed = time.perf_counter() - started
+    summary['elapsed'] = round(elapsed, 3)
+    if elapsed > 0:
+        summary['pages_per_sec'] = round(summary['pages'] / elapsed, 2)
+        summary['docs_per_sec'] = round(summary['processed'] / elapsed, 3)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m extraction",
+        description="入札説明書PDFから参加条件と表を一括抽出します"
+    )
+    parser.add_argument("inputs", nargs="+", help="PDFのあるディレクトリ、またはglobパターン")
+    parser.add_argument("-o", "--output", default="抽出結果", help="出力先ディレクトリ")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="並列ワーカー数（既定: CPUコア数）")
+    parser.add_argument("--no-tables", action="store_true", help="表を抽出しない")
+    parser.add_argument("--auto-table-settings", action="store_true",
+                        help="表抽出の設定を発注者のレイアウトごとに自動調整する")
+    parser.add_argument("--low-memory", action="store_true",
+                        help="省メモリモード（ワーカー数が多い・PDFが大きい場合に）")
+    parser.add_argument("--index", action="store_true",
+                        help=f"全文検索インデックス（{DEFAULT_INDEX_PATH}）に登録する")
+    parser.add_argument("--similarity", type=float, default=DEFAULT_GROUP_THRESHOLD,
+                        help="共通の参加条件でほぼ同じ言い回しとみなす類似度（0〜1）")
+    parser.add_argument("--force", action="store_true", help="処理済みのファイルも再処理する")
+    args = parser.parse_args(argv)
+    
+    def on_result(result, error):
+        if error is not None:
+            print(f"✗ {result['file']}: {error}", file=sys.stderr)
+        else:
+            print(f"✓ {result['file']} ({result['pages']}ページ, "
+                  f"条件{result['condition_count']}件, 表{result['table_count']}件, "
+                  f"{result['elapsed']:.1f}秒)")
+    
+    summary = run_batch(
+        args.inputs,
+        args.output,
+        workers=args.workers,
+        extract_tables=not args.no_tables,
+        force=args.force,
+        on_result=on_result,
+        auto_table_settings=args.auto_table_settings,
+        low_memory=args.low_memory,
+        index_path=DEFAULT_INDEX_PATH if args.index else None,
+        similarity=args.similarity
+    )
+    
+    print("\n=== 処理結果 ===")
+    print(f"対象: {summary['found']}件 / 処理: {summary['processed']}件 / "
+          f"スキップ: {summary['skipped']}件 / 失敗: {summary['failed']}件")
+    print(f"ページ数: {summary['pages']} / 経過時間: {summary['elapsed']:.1f}秒")
+    print(f"スループット: {summary['pages_per_sec']:.1f} ページ/秒, "
+          f"{summary['docs_per_sec']:.2f} 件/秒")
+    print(f"共通の参加条件: {summary['common_conditions']}件 "
+          f"（{os.path.join(args.output, COMMON_CONDITIONS_NAME)}）")
+    return 1 if summary['failed'] else 0
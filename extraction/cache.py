@@ -0,0 +1,177 @@
+"""
+抽出結果のキャッシュ
+アップロードされたPDFのSHA-256と抽出設定をキーに、
+extract_all_content の結果を再利用します
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+
+def compute_file_hash(data):
+    """PDFのバイト列からSHA-256ハッシュを計算"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def compute_path_hash(path, chunk_size=1024 * 1024):
+    """ファイルを少しずつ読みながらSHA-256ハッシュを計算"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(file_hash, **settings):
+    """ファイルハッシュと抽出設定からキャッシュキーを作成"""
+    # 設定は順序に依存しないようにソートしてシリアライズ
+    settings_json = json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{file_hash}:{hashlib.sha256(settings_json.encode('utf-8')).hexdigest()[:16]}"
+
+
+def cache_key_hash(cache_key):
+    """キャッシュキーのファイルハッシュの部分（抽出設定によらずドキュメントを表す）"""
+    return cache_key.split(":", 1)[0]
+
+
+class ExtractionCache:
+    """件数上限付きのLRUキャッシュ（スレッドセーフ）"""
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """キャッシュから取得（なければNone）"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            # 最近使ったものとして末尾へ移動
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key, value):
+        """キャッシュに保存し、上限を超えたら古いものから削除"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """キャッシュを空にする"""
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def lookup(key, cache=None, store=None):
+    """メモリキャッシュ → ディスクストア の順に結果を探す
+
+    戻り値は (結果, 取得元) で、見つからなければ (None, None)
+    """
+    if cache is not None:
+        result = cache.get(key)
+        if result is not None:
+            return result, 'memory'
+
+    if store is not None:
+        result = store.get(key)
+        if result is not None:
+            if cache is not None:
+                cache.put(key, result)
+            return result, 'disk'
+
+    return None, None
+
+
+class InFlightExtractions:
+    """実行中の抽出をキーごとに1つにまとめる（スレッドセーフ）
+
+    同じドキュメントを複数のセッションが同時に開いた場合、
+    後から来たセッションは先に始まった抽出の終了を待って同じ結果を受け取ります
+    """
+
+    def __init__(self):
+        self._running = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.joined = 0
+
+    def run(self, key, extract):
+        """抽出を実行（または実行中の抽出を待つ）して (結果, 合流したか) を返す"""
+        with self._lock:
+            entry = self._running.get(key)
+            owner = entry is None
+            if owner:
+                entry = {'done': threading.Event(), 'result': None, 'failed': False}
+                self._running[key] = entry
+                self.started += 1
+            else:
+                self.joined += 1
+
+        if not owner:
+            entry['done'].wait()
+            if entry['failed']:
+                # 先の抽出が失敗・中断した場合は自分で抽出し直す
+                return self.run(key, extract)
+            return entry['result'], True
+
+        try:
+            entry['result'] = extract()
+        except BaseException:
+            entry['failed'] = True
+            raise
+        finally:
+            with self._lock:
+                del self._running[key]
+            entry['done'].set()
+        return entry['result'], False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._running)
+
+
+def get_or_extract(key, extract, cache=None, store=None, is_valid=bool, inflight=None):
+    """メモリキャッシュ → ディスクストア → 抽出 の順に結果を取得
+
+    inflight（InFlightExtractions）を指定すると、同じキーの抽出が実行中ならその結果を待ちます
+    戻り値は (結果, 取得元) で、取得元は 'memory' / 'disk' / 'extracted' / 'joined'
+    """
+    result, source = lookup(key, cache, store)
+    if result is not None:
+        return result, source
+
+    def extract_and_save():
+        # 待っている間に他の抽出が終わって保存されていればそれを使う
+        result, _ = lookup(key, cache, store)
+        if result is not None:
+            return result
+        result = extract()
+        # 読み込みに失敗した結果は保存しない
+        if is_valid(result):
+            if cache is not None:
+                cache.put(key, result)
+            if store is not None:
+                store.put(key, result)
+        return result
+
+    if inflight is None:
+        return extract_and_save(), 'extracted'
+    result, joined = inflight.run(key, extract_and_save)
+    return result, 'joined' if joined else 'extracted'
@@ -0,0 +1,190 @@
+"""
+参加条件の抽出
+"""
+
+import re
+
+# 参加条件のカテゴリ（名前, 先頭キーワード, 後続キーワード）
+# 先頭キーワードの後ろに後続キーワードがある行をそのカテゴリとみなします
+CONDITION_CATEGORIES = [
+    # 資格関連
+    ('資格', ['資格', '免許', '許可', '認定', '登録'], ['を有する', 'している', '保有', '取得']),
+    # 実績関連
+    ('実績', ['実績', '経験', '履行', '完了'], ['があること', 'を有する', '以上']),
+    # 財務関連
+    ('財務', ['資本金', '売上高', '純資産'], ['以上', 'を超える']),
+    # 人員関連
+    ('人員', ['技術者', '従業員', '職員', 'スタッフ'], ['配置', '常駐', '以上']),
+    # 地域要件
+    ('地域', ['本店', '支店', '営業所', '事業所'], ['を有する', '設置', '所在']),
+    # ISO等
+    ('ISO等', ['ISO', 'JIS', '認証'], ['取得', '認定']),
+    # その他の条件（キーワードを含むだけでよい）
+    ('その他', ['であること', 'とする', '必要がある', '条件とする'], None),
+]
+
+# 参加資格のセクション見出し
+SECTION_KEYWORDS = ['参加資格', '入札参加資格', '応募資格', '資格要件', '参加条件']
+
+# セクション内の項目と判断するキーワード
+SECTION_ITEM_KEYWORDS = ['資格', '条件', '要件']
+
+# 参加資格セクション内の行でパターンに該当しないもの
+SECTION_CATEGORY = 'セクション内'
+
+SECTION_START_RE = re.compile('|'.join(map(re.escape, SECTION_KEYWORDS)))
+SECTION_ITEM_RE = re.compile('|'.join(map(re.escape, SECTION_ITEM_KEYWORDS)))
+SECTION_END_RE = re.compile(r'^\d+[\.\s]|^第\d+|^（\d+）')
+NUMBERED_PAREN_RE = re.compile(r'^[（\(]\d+[）\)]')
+NUMBERED_RE = re.compile(r'^\d+[\.\s]')
+
+
+class ConditionMatcher:
+    """参加条件パターンを事前にまとめ、1行を1回の走査で分類する
+
+    全カテゴリのキーワードを1つの正規表現にまとめて重なりも含めて走査し、
+    「先頭キーワードの後ろに後続キーワードがある」かをカテゴリごとに判定します。
+    先頭の .* による後戻りがないので、行の長さに対して線形時間で処理できます
+    """
+
+    def __init__(self, categories=CONDITION_CATEGORIES):
+        self.names = [name for name, _, _ in categories]
+        
+        # キーワード → (先頭として使うカテゴリ, 後続として使うカテゴリ)
+        roles = {}
+        for index, (_, heads, tails) in enumerate(categories):
+            for keyword in heads:
+                roles.setdefault(keyword, ([], []))[0].append(index)
+            for keyword in tails or []:
+                roles.setdefault(keyword, ([], []))[1].append(index)
+        # 後続キーワードがないカテゴリは先頭キーワードだけで成立
+        self._head_only = [tails is None for _, _, tails in categories]
+        
+        # 長いキーワードを優先し、その先頭部分に一致する短いキーワードも同時に数える
+        keywords = sorted(roles, key=len, reverse=True)
+        self._implied = {
+            keyword: [(other, len(other)) for other in keywords if keyword.startswith(other)]
+            for keyword in keywords
+        }
+        self._roles = roles
+        # 先読みで重なったキーワードも漏らさず拾う
+        self._scanner = re.compile(
+            '(?=(' + '|'.join(map(re.escape, keywords)) + '))'
+        )
+
+    def classify(self, line):
+        """該当するカテゴリ名を返す（該当なしはNone）"""
+        count = len(self.names)
+        # カテゴリごとに、最初に見つかった先頭キーワードの終了位置
+        head_end = [None] * count
+        matched = [False] * count
+        
+        for m in self._scanner.finditer(line):
+            pos = m.start()
+            for keyword, length in self._implied[m.group(1)]:
+                heads, tails = self._roles[keyword]
+                for index in tails:
+                    if head_end[index] is not None and head_end[index] <= pos:
+                        matched[index] = True
+                for index in heads:
+                    if self._head_only[index]:
+                        matched[index] = True
+                    elif head_end[index] is None:
+                        head_end[index] = pos + length
+        
+        # 定義順で最初に該当したカテゴリを返す
+        for index in range(count):
+            if matched[index]:
+                return self.names[index]
+        return None
+
+    def matches(self, line):
+        """いずれかのカテゴリに該当するか"""
+        return self.classify(line) is not None
+
+
+DEFAULT_MATCHER = ConditionMatcher()
+
+
+class ConditionScanner:
+    """テキストを順に受け取り参加条件を抽出する
+
+    セクションの状態を持ち越すので、ページごとに feed しても
+    全文をまとめて処理した場合と同じ結果になります
+    """
+
+    def __init__(self, matcher=DEFAULT_MATCHER):
+        self.matcher = matcher
+        self.in_condition_section = False
+        self.conditions = []
+        # conditions と同じ順番で、各条件のカテゴリ
+        self.categories = []
+
+    def feed(self, text):
+        """テキストを追加し、新しく見つかった条件を返す"""
+        found = []
+        
+        for line in text.split('\n'):
+            # セクションの開始を検出
+            if SECTION_START_RE.search(line):
+                self.in_condition_section = True
+                continue
+                
+            # セクションの終了を検出
+            if self.in_condition_section and SECTION_END_RE.match(line):
+                if not SECTION_ITEM_RE.search(line):
+                    self.in_condition_section = False
+            
+            # 条件の抽出
+            line_clean = line.strip()
+            if not (10 < len(line_clean) < 200):  # 適切な長さ
+                continue
+            category = self.matcher.classify(line_clean)
+            if not self.in_condition_section and category is None:
+                continue
+            
+            # 条件番号を付与
+            if NUMBERED_PAREN_RE.match(line_clean) or NUMBERED_RE.match(line_clean):
+                condition = line_clean
+            elif not line_clean.endswith('。'):
+                # 番号がない場合は追加
+                condition = f"・ {line_clean}"
+            else:
+                continue
+            
+            found.append(condition)
+            self.categories.append(category or SECTION_CATEGORY)
+        
+        self.conditions.extend(found)
+        return found
+
+
+def extract_conditions(text):
+    """テキストから参加条件を抽出"""
+    return ConditionScanner().feed(text)
+
+
+def extract_conditions_with_category(text):
+    """テキストから参加条件を抽出し、(条件, カテゴリ) のリストを返す"""
+    scanner = ConditionScanner()
+    scanner.feed(text)
+    return list(zip(scanner.conditions, scanner.categories))
+
+
+def extract_page_conditions(page_contents):
+    """ページ情報から参加条件を抽出し、どのページの条件かを記録して返す
+
+    戻り値は {'page', 'category', 'condition'} のリストです
+    """
+    scanner = ConditionScanner()
+    conditions = []
+    for page_data in page_contents:
+        start = len(scanner.conditions)
+        scanner.feed(page_data['text'])
+        for index in range(start, len(scanner.conditions)):
+            conditions.append({
+                'page': page_data['page'],
+                'category': scanner.categories[index],
+                'condition': scanner.conditions[index]
+            })
+    return conditions
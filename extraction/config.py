@@ -0,0 +1,14 @@
+"""
+抽出処理の共通設定
+"""
+
+import os
+
+# 抽出ロジックを変更したら上げる（保存済みの結果が自動的に無効化されます）
+EXTRACTOR_VERSION = "3"
+
+# 抽出結果などを保存するディレクトリ
+DATA_DIR = os.environ.get("PROPOSAL_DATA_DIR", os.path.join(os.getcwd(), ".proposal_data"))
+
+# 画面から取り込める一括処理の出力の場所（この下のディレクトリだけ取り込める）
+BATCH_OUTPUT_DIR = os.environ.get("PROPOSAL_BATCH_OUTPUT_DIR", os.path.join(os.getcwd(), "抽出結果"))
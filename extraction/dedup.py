@@ -0,0 +1,224 @@
+"""
+ほぼ同じテキスト（セクション・参加条件）の検出
+文字のn-gram（shingle）の集合をMinHashの署名にし、署名を帯（band）に分けたLSHで候補を探します
+1件あたりの処理は署名の計算とバケットの参照だけなので、件数に対して線形時間で処理できます
+ドキュメント内やコーパス全体のセクションの重複除去に使います
+（短い参加条件のまとめは、番号を除いて比べる similarity.ConditionIndex.grouped を使います）
+"""
+
+import functools
+
+import numpy as np
+
+from .search_index import normalize_text
+
+# 既定の類似度（shingleの集合のJaccard係数）
+DEFAULT_THRESHOLD = 0.8
+# 署名の長さ（長いほど類似度の推定が正確になる）
+DEFAULT_NUM_PERM = 128
+# shingleの文字数
+DEFAULT_SHINGLE_SIZE = 3
+# まとめて署名を計算するときの一時配列の要素数の上限
+SIGNATURE_BLOCK = 1 << 22
+
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def _mix(values):
+    """64bitのハッシュ値をかき混ぜる（splitmix64）"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def text_key(text):
+    """比較用のテキスト（全角・半角、英字の大文字・小文字、空白・改行の違いをなくしたもの）"""
+    return "".join(normalize_text(text).split())
+
+
+def shingle_hashes(text, size=DEFAULT_SHINGLE_SIZE):
+    """テキストの文字n-gramのハッシュ値（重複なし）
+
+    全角・半角、英字の大文字・小文字、空白・改行の違いは無視します
+    """
+    key = text_key(text)
+    if not key:
+        return np.zeros(0, dtype=np.uint64)
+    codes = np.frombuffer(key.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    size = min(size, len(codes))
+    count = len(codes) - size + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for i in range(size):
+        hashes = hashes * np.uint64(1000003) + codes[i:i + count]
+    return np.unique(_mix(hashes))
+
+
+@functools.lru_cache(maxsize=None)
+def lsh_params(threshold, num_perm):
+    """類似度 threshold の組を見逃しにくい (帯の数, 帯あたりの行数)
+
+    候補は署名で類似度を確かめるので、誤検出より見逃しを重く見て選びます
+    """
+    similarity = np.linspace(0, 1, 201)
+    below = similarity < threshold
+    best, best_error = None, None
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        # 類似度 s の組が少なくとも1つの帯で一致する確率
+        probability = 1 - (1 - similarity ** rows) ** bands
+        false_positive = probability[below].mean() if below.any() else 0.0
+        false_negative = (1 - probability[~below]).mean()
+        error = 0.2 * false_positive + 0.8 * false_negative
+        if best_error is None or error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHasher:
+    """テキストのMinHash署名（num_perm 個のハッシュ関数ごとのshingleのハッシュの最小値）"""
+
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, shingle_size=DEFAULT_SHINGLE_SIZE, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # ハッシュ関数 ((a * x + b) mod 2^64) >> 32（a は奇数）
+        self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        """署名（uint32の配列。空のテキストはNone）"""
+        return self.signatures([text])[0]
+
+    def signatures(self, texts):
+        """複数のテキストの署名をまとめて計算する（空のテキストはNone）"""
+        hashes = [shingle_hashes(text, self.shingle_size) for text in texts]
+        lengths = np.array([len(h) for h in hashes], dtype=np.int64)
+        signatures = [None] * len(texts)
+        nonempty = np.flatnonzero(lengths)
+        if not len(nonempty):
+            return signatures
+
+        # 全テキストのshingleを1つの配列にし、ハッシュ関数ごとにテキストの区切りで最小値をとる
+        flat = np.concatenate([hashes[i] for i in nonempty])
+        starts = np.concatenate(([0], np.cumsum(lengths[nonempty])[:-1]))
+        matrix = np.empty((len(nonempty), self.num_perm), dtype=np.uint32)
+        # 一時配列が大きくならないよう、ハッシュ関数を分けて計算
+        step = max(1, SIGNATURE_BLOCK // len(flat))
+        for start in range(0, self.num_perm, step):
+            a = self._a[start:start + step, None]
+            b = self._b[start:start + step, None]
+            values = ((a * flat[None, :] + b) >> np.uint64(32)) & _MASK32
+            matrix[:, start:start + step] = np.minimum.reduceat(values, starts, axis=1).T
+        for row, i in enumerate(nonempty):
+            signatures[i] = matrix[row]
+        return signatures
+
+
+def signature_similarity(signature, other):
+    """2つの署名から推定した類似度（Jaccard係数）"""
+    return float(np.mean(signature == other))
+
+
+class NearDuplicateIndex:
+    """ほぼ同じテキストを探すためのLSHインデックス
+
+    add() で登録したテキストのうち、類似度（推定）が threshold 以上のものを query() で返します
+    署名を帯に分け、どれかの帯が一致したものだけを署名で確かめます
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                 shingle_size=DEFAULT_SHINGLE_SIZE, seed=1):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self._buckets = [{} for _ in range(self.bands)]
+        self._keys = []
+        self._signatures = []
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _band_keys(self, signature):
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def signature(self, text):
+        return self.hasher.signature(text)
+
+    def query(self, text=None, signature=None):
+        """類似度が threshold 以上の登録済みのテキスト [(キー, 類似度)]（類似度の高い順）"""
+        if signature is None and text is not None:
+            signature = self.signature(text)
+        if signature is None:
+            return []
+        candidates = set()
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(buckets.get(band_key, ()))
+        if not candidates:
+            return []
+        candidates = sorted(candidates)
+        similarities = np.mean(np.stack([self._signatures[i] for i in candidates]) == signature, axis=1)
+        found = [
+            (self._keys[i], float(similarity))
+            for i, similarity in zip(candidates, similarities)
+            if similarity >= self.threshold
+        ]
+        found.sort(key=lambda item: -item[1])
+        return found
+
+    def add(self, key, text=None, signature=None):
+        """テキストを登録（空のテキストは登録せずFalse）"""
+        if signature is None and text is not None:
+            signature = self.signature(text)
+        if signature is None:
+            return False
+        position = len(self._keys)
+        self._keys.append(key)
+        self._signatures.append(signature)
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band_key, []).append(position)
+        return True
+
+
+def near_duplicate_groups(texts, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                          shingle_size=DEFAULT_SHINGLE_SIZE):
+    """ほぼ同じテキストをまとめたグループ（texts の位置のリスト）を最初に出てきた順に返す
+
+    各グループの先頭が代表で、後から出てきたテキストは一番似ている代表のグループに入ります
+    インデックスには代表だけを登録するので、同じテキストが多くても候補は増えません
+    空白・全角半角の違いだけのテキストは署名を計算せずに同じグループにします
+    """
+    index = NearDuplicateIndex(threshold, num_perm, shingle_size)
+
+    # 比較用のテキストごとに最初の位置
+    first = {}
+    keys = []
+    for position, text in enumerate(texts):
+        key = text_key(text)
+        keys.append(key)
+        first.setdefault(key, position)
+
+    # 比較用のテキストの最初の位置 → 代表の位置
+    representatives = {}
+    unique = list(first.values())
+    for start in range(0, len(unique), 4096):
+        chunk = unique[start:start + 4096]
+        signatures = index.hasher.signatures([keys[position] for position in chunk])
+        for position, signature in zip(chunk, signatures):
+            found = index.query(signature=signature) if signature is not None else []
+            if found:
+                representatives[position] = found[0][0]
+            else:
+                # 空のテキストは自分だけのグループにする（インデックスには登録しない）
+                representatives[position] = position
+                if signature is not None:
+                    index.add(position, signature=signature)
+
+    groups = {}
+    for position, key in enumerate(keys):
+        groups.setdefault(representatives[first[key]], []).append(position)
+    return list(groups.values())
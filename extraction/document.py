@@ -0,0 +1,152 @@
+"""
+ドキュメント全体の抽出処理
+ページごとの抽出結果から 全文・ページ情報・表一覧 を組み立てます
+"""
+
+from .pages import extract_page
+from .progress import NULL_REPORTER, run_reported
+from .source import iter_pages, open_pdf, page_count
+from .tables import TableRecord
+
+
+class ContentBuilder:
+    """ページごとの抽出結果を順に受け取り、全文・ページ情報・表一覧を組み立てる"""
+
+    def __init__(self, reporter=None):
+        self.reporter = reporter or NULL_REPORTER
+        self.all_text = []
+        self.page_contents = []
+        self.all_tables = []
+
+    def _warn(self, message, level="warning"):
+        self.reporter.warning(message, level)
+
+    def add(self, result):
+        """1ページ分の抽出結果を追加し、そのページの情報を返す"""
+        i = result['page']
+        
+        if result['error'] is not None:
+            self._warn(f"ページ {i} の処理中にエラー: {result['error']}")
+            page_data = {
+                'page': i,
+                'text': f"エラー: {result['error']}",
+                'tables': [],
+                'char_count': 0,
+                'table_count': 0,
+                'table_scan': None,
+                'table_seconds': 0.0,
+                'fingerprint': result.get('fingerprint'),
+                'reused': False
+            }
+            self.page_contents.append(page_data)
+            return page_data
+        
+        for message in result['warnings']:
+            self._warn(message, "debug")
+        
+        page_text = result['text']
+        tables = result['tables']
+        page_data = {
+            'page': i,
+            'text': "",
+            'tables': [],
+            'char_count': 0,
+            'table_count': len(tables),
+            'table_scan': result.get('table_scan'),
+            'table_seconds': result.get('table_seconds', 0.0),
+            # 改訂版の差分抽出（revisions）で使うページの指紋と、前の版の結果を再利用したか
+            'fingerprint': result.get('fingerprint'),
+            'reused': result.get('reused', False)
+        }
+        
+        # 表はセルのまま1つのレコードにまとめ、ページ情報と表一覧で共有する
+        table_texts = []
+        for j, table in enumerate(tables):
+            if not table:  # 空の表をチェック
+                continue
+            record = TableRecord(i, j + 1, table)
+            table_texts.append(record.text)
+            page_data['tables'].append(record)
+            self.all_tables.append(record)
+        
+        # ページコンテンツの結合
+        if page_text:
+            self.all_text.append(f"\n--- ページ {i} ---\n")
+            self.all_text.append(page_text)
+            page_data['text'] = page_text
+            page_data['char_count'] = len(page_text)
+        elif tables:
+            # テキストはないが表がある場合
+            self.all_text.append(f"\n--- ページ {i} (表のみ) ---\n")
+        else:
+            self.all_text.append(f"\n--- ページ {i} (コンテンツなし) ---\n")
+        
+        # 表がある場合は追加
+        for table_text in table_texts:
+            self.all_text.append(table_text)
+            page_data['char_count'] += len(table_text)
+        
+        self.page_contents.append(page_data)
+        return page_data
+
+    def build(self):
+        """(全文, ページ情報, 表一覧) を返す"""
+        return "\n".join(self.all_text), self.page_contents, self.all_tables
+
+
+def table_scan_stats(page_contents):
+    """表の検出を省略したページ数と、省略で短縮できた推定時間
+
+    短縮時間は、検出を実行したページの平均時間 × 省略したページ数で見積もります
+    """
+    scanned = [p['table_seconds'] for p in page_contents if p.get('table_scan') == 'scanned']
+    skipped = sum(1 for p in page_contents if p.get('table_scan') == 'skipped')
+    seconds = sum(scanned)
+    return {
+        'scanned': len(scanned),
+        'skipped': skipped,
+        'seconds': seconds,
+        'saved_seconds': seconds / len(scanned) * skipped if scanned else 0.0
+    }
+
+
+def build_content(page_results, reporter=None):
+    """ページごとの抽出結果から (全文, ページ情報, 表一覧) を組み立てる"""
+    builder = ContentBuilder(reporter)
+    for result in page_results:
+        builder.add(result)
+    return builder.build()
+
+
+def iter_page_results(pdf_file, extract_tables=True, table_settings=None, single_pass=False,
+                      low_memory=False):
+    """ページごとの抽出結果を処理した順に返すジェネレーター
+
+    各結果の 'total_pages' に総ページ数が入ります
+    処理の済んだページはキャッシュを解放します（low_memory は iter_pages を参照）
+    """
+    with open_pdf(pdf_file) as pdf:
+        total = page_count(pdf, low_memory)
+        for page in iter_pages(pdf, low_memory=low_memory):
+            result = extract_page(page, extract_tables, table_settings, single_pass)
+            result['total_pages'] = total
+            yield result
+
+
+def consume_page_results(page_results, reporter=None):
+    """ページごとの抽出結果を受け取りながら全体を組み立てる"""
+    return run_reported(page_results, ContentBuilder(reporter), reporter)
+
+
+def extract_all_content(pdf_file, extract_tables=True, table_settings=None, reporter=None,
+                        single_pass=False, low_memory=False):
+    """PDFから全コンテンツ（テキスト＋表）を抽出
+
+    進捗・ページごとの途中結果・警告は reporter（ExtractionReporter）に通知します
+    single_pass を指定すると表の文字を本文に含めません（extract_page を参照）
+    low_memory を指定するとページ数によらずメモリ使用量が一定になります（iter_pages を参照）
+    """
+    return consume_page_results(
+        iter_page_results(pdf_file, extract_tables, table_settings, single_pass, low_memory),
+        reporter
+    )
@@ -0,0 +1,456 @@
+"""
+バックグラウンドの抽出ジョブ
+SQLiteのキューにジョブを登録し、ワーカープロセスがページごとの結果を書き込みながら処理します
+画面はジョブIDで進捗と途中結果を読み出すので、再実行やページの再読み込みで抽出がやり直しになりません
+"""
+
+import json
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from .config import DATA_DIR
+from .cache import cache_key_hash
+from .document import ContentBuilder, build_content, iter_page_results
+from .parallel import default_workers, get_mp_context
+from .revisions import PageResultStore, iter_page_results_incremental
+from .search_index import FullTextIndex
+from .store import DEFAULT_STORE_PATH, ExtractionStore
+
+DEFAULT_JOBS_PATH = os.path.join(DATA_DIR, "jobs.sqlite3")
+# 終わったジョブを残しておく期間
+DEFAULT_JOB_MAX_AGE = 7 * 24 * 60 * 60
+
+# 処理中とみなす状態
+ACTIVE_STATUSES = ('queued', 'running')
+# 処理中のジョブの生存を記録する間隔と、途絶えたら中断したとみなすまでの時間（秒）
+HEARTBEAT_INTERVAL = 15
+HEARTBEAT_TIMEOUT = 60
+
+# プロセスIDごとの、ジョブを取り出したプロセスを表す値
+_owners = {}
+
+
+def process_owner():
+    """このプロセスを表す値（ホスト名:プロセスID:起動ごとの乱数）"""
+    pid = os.getpid()
+    if pid not in _owners:
+        _owners[pid] = f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}"
+    return _owners[pid]
+
+
+def _owner_gone(owner):
+    """ジョブを取り出したプロセスが終了しているか（同じホストのプロセスだけ判定できる）"""
+    try:
+        host, pid, _ = owner.rsplit(":", 2)
+        pid = int(pid)
+    except (AttributeError, ValueError):
+        return False
+    if host != socket.gethostname():
+        return False
+    if pid == os.getpid():
+        # 同じプロセスIDで起動し直した（コンテナの再起動など）
+        return owner != process_owner()
+    # Windowsの os.kill はプロセスを終了させてしまうので、生存時間だけで判定する
+    if os.name != 'posix':
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return False
+    return False
+
+
+def _dumps(value):
+    return sqlite3.Binary(zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+
+
+def _loads(payload):
+    return pickle.loads(zlib.decompress(payload))
+
+
+class JobQueue:
+    """抽出ジョブのキュー（ジョブの状態とページごとの結果を保存）"""
+
+    def __init__(self, path=DEFAULT_JOBS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    name TEXT,
+                    pdf_path TEXT NOT NULL,
+                    cache_key TEXT,
+                    options TEXT NOT NULL,
+                    total_pages INTEGER,
+                    done_pages INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    owner TEXT,
+                    heartbeat_at REAL
+                )
+            """)
+            # 生存確認の列がない古いキュー
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (('owner', 'TEXT'), ('heartbeat_at', 'REAL')):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_cache_key ON jobs(cache_key, status)"
+            )
+            # 重複を避けられた抽出の数など
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_pages (
+                    job_id TEXT NOT NULL,
+                    page INTEGER NOT NULL,
+                    payload BLOB NOT NULL,
+                    PRIMARY KEY (job_id, page)
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def submit(self, pdf_path, name=None, cache_key=None, **options):
+        """ジョブを登録してジョブIDを返す
+
+        options は iter_page_results の引数（extract_tables, table_settings など）です
+        同じ cache_key のジョブが待機中・処理中なら、新しく登録せずにそのジョブIDを返します
+        """
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock, self._connect() as conn:
+            if cache_key is not None:
+                row = conn.execute(
+                    "SELECT job_id FROM jobs WHERE cache_key = ? AND status IN (?, ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (cache_key,) + ACTIVE_STATUSES
+                ).fetchone()
+                if row is not None:
+                    self._increment(conn, 'joined')
+                    return row['job_id']
+            self._increment(conn, 'submitted')
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, name, pdf_path, cache_key, options, created_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, name, pdf_path, cache_key, json.dumps(options), time.time())
+            )
+        return job_id
+
+    def _increment(self, conn, name, amount=1):
+        conn.execute(
+            "INSERT INTO job_counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def count(self, name, amount=1):
+        """カウンターを増やす（キャッシュから返せた件数など）"""
+        with self._lock, self._connect() as conn:
+            self._increment(conn, name, amount)
+
+    def counters(self):
+        """カウンターの値（submitted: 登録したジョブ、joined: 処理中のジョブに合流した件数 など）"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT name, value FROM job_counters").fetchall()
+        return {row['name']: row['value'] for row in rows}
+
+    def claim(self, owner=None):
+        """待機中のジョブを1つ取り出して処理中にする（なければNone）
+
+        owner（既定はこのプロセス）と生存を記録し、requeue_running が処理中のジョブをやり直さないようにします
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            # 他のプロセスが先に取り出していないかを状態で確認する
+            now = time.time()
+            claimed = conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, owner = ?, heartbeat_at = ? "
+                "WHERE job_id = ? AND status = 'queued'",
+                (now, owner or process_owner(), now, row['job_id'])
+            ).rowcount
+        return row['job_id'] if claimed else None
+
+    def get(self, job_id):
+        """ジョブの状態（なければNone）"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['options'] = json.loads(job['options'])
+        return job
+
+    def add_page(self, job_id, result):
+        """ページの結果を保存して進捗を進める"""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_pages (job_id, page, payload) VALUES (?, ?, ?)",
+                (job_id, result['page'], _dumps(result))
+            )
+            conn.execute(
+                "UPDATE jobs SET done_pages = done_pages + 1, total_pages = ?, heartbeat_at = ? "
+                "WHERE job_id = ?",
+                (result.get('total_pages'), time.time(), job_id)
+            )
+
+    def heartbeat(self, job_ids):
+        """処理中のジョブがまだ動いていることを記録"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' "
+                f"AND job_id IN ({','.join('?' * len(job_ids))})",
+                [time.time()] + job_ids
+            )
+
+    def page_results(self, job_id, start_page=1):
+        """保存済みのページの結果をページ順に返す"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT payload FROM job_pages WHERE job_id = ? AND page >= ? ORDER BY page",
+                (job_id, start_page)
+            ).fetchall()
+        return [_loads(row['payload']) for row in rows]
+
+    def finish(self, job_id):
+        """ジョブを完了にする"""
+        self._set_status(job_id, 'done')
+
+    def fail(self, job_id, error):
+        """ジョブを失敗にする"""
+        self._set_status(job_id, 'failed', error)
+
+    def _set_status(self, job_id, status, error=None):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                (status, error, time.time(), job_id)
+            )
+
+    def requeue_running(self, timeout=HEARTBEAT_TIMEOUT):
+        """中断した処理中のジョブ（サーバーの再起動など）を最初からやり直す
+
+        取り出したプロセスが終了しているか、生存の記録が timeout 秒以上途絶えたジョブだけをやり直します
+        （同じキューを使う他のサーバーが処理中のジョブはそのまま）
+        """
+        cutoff = time.time() - timeout
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT job_id, owner, heartbeat_at FROM jobs WHERE status = 'running'"
+            ).fetchall()
+            job_ids = [
+                row['job_id'] for row in rows
+                if row['heartbeat_at'] is None or row['heartbeat_at'] < cutoff
+                or _owner_gone(row['owner'])
+            ]
+            if not job_ids:
+                return 0
+            placeholders = ','.join('?' * len(job_ids))
+            conn.execute(f"DELETE FROM job_pages WHERE job_id IN ({placeholders})", job_ids)
+            return conn.execute(
+                f"UPDATE jobs SET status = 'queued', done_pages = 0, started_at = NULL, "
+                f"owner = NULL, heartbeat_at = NULL "
+                f"WHERE status = 'running' AND job_id IN ({placeholders})",
+                job_ids
+            ).rowcount
+
+    def prune(self, max_age=DEFAULT_JOB_MAX_AGE):
+        """終わってから max_age 以上たったジョブを削除"""
+        cutoff = time.time() - max_age
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "DELETE FROM job_pages WHERE job_id IN "
+                "(SELECT job_id FROM jobs WHERE finished_at < ?)",
+                (cutoff,)
+            )
+            conn.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+
+    def stats(self):
+        """状態ごとのジョブ数"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+
+def run_job(queue_path, job_id, store_path=DEFAULT_STORE_PATH, index_path=None,
+            page_store_path=None):
+    """ジョブを1つ処理する（ワーカープロセスで実行）
+
+    ページの結果をキューに書き込みながら抽出し、終わったら全体の結果を抽出ストアにも保存します
+    index_path を指定すると、ページの本文をその全文検索インデックスに登録します
+    page_store_path を指定すると、そのストアに保存済みのページ（改訂前の版など）は解析せずに再利用します
+    """
+    queue = JobQueue(queue_path)
+    job = queue.get(job_id)
+    try:
+        builder = ContentBuilder()
+        if page_store_path:
+            results = iter_page_results_incremental(
+                job['pdf_path'], PageResultStore(page_store_path), **job['options']
+            )
+        else:
+            results = iter_page_results(job['pdf_path'], **job['options'])
+        for result in results:
+            queue.add_page(job_id, result)
+            builder.add(result)
+
+        content = builder.build()
+        # 読み込みに失敗した結果は保存しない
+        if job['cache_key'] and content[1]:
+            ExtractionStore(store_path).put(job['cache_key'], content)
+            if index_path:
+                FullTextIndex(index_path).add_document(
+                    cache_key_hash(job['cache_key']), job['name'], content[1]
+                )
+        queue.finish(job_id)
+    except Exception as e:
+        queue.fail(job_id, f"{e}\n{traceback.format_exc(limit=3)}")
+
+
+def load_job_content(queue, job_id):
+    """完了したジョブの結果を (全文, ページ情報, 表一覧) として組み立てる"""
+    return build_content(queue.page_results(job_id))
+
+
+class JobWorkerPool:
+    """キューのジョブをワーカープロセスで処理する
+
+    start() するとディスパッチ用のスレッドが待機中のジョブを取り出し、
+    同時に最大 workers 件まで処理します
+    処理中のジョブの生存を定期的に記録し、他のサーバーが中断したジョブはやり直します
+    """
+
+    def __init__(self, queue, workers=None, store_path=DEFAULT_STORE_PATH, poll_interval=0.5,
+                 index_path=None, page_store_path=None):
+        self.queue = queue
+        self.workers = workers or default_workers()
+        self.store_path = store_path
+        self.index_path = index_path
+        self.page_store_path = page_store_path
+        self.poll_interval = poll_interval
+        self._slots = threading.Semaphore(self.workers)
+        self._executor = None
+        self._thread = None
+        self._stopped = threading.Event()
+        # このプールで処理中のジョブ
+        self._running = set()
+        self._last_heartbeat = 0.0
+
+    def start(self):
+        """ディスパッチを開始（前回処理中のまま残ったジョブはやり直す）"""
+        if self._thread is not None:
+            return self
+        self.queue.requeue_running()
+        self.queue.prune()
+        self._executor = self._new_executor()
+        self._thread = threading.Thread(target=self._dispatch, name="extraction-jobs", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ディスパッチを止め、処理中のジョブが終わるのを待つ"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=get_mp_context())
+
+    def _submit(self, job_id):
+        args = (
+            run_job, self.queue.path, job_id, self.store_path, self.index_path,
+            self.page_store_path
+        )
+        try:
+            return self._executor.submit(*args)
+        except BrokenProcessPool:
+            # ワーカーが異常終了したプールは作り直す
+            self._executor = self._new_executor()
+            return self._executor.submit(*args)
+
+    def _on_done(self, job_id, future):
+        self._running.discard(job_id)
+        self._slots.release()
+        error = future.exception()
+        if error is not None:
+            # run_job の外で落ちた（ワーカープロセスの異常終了など）
+            self.queue.fail(job_id, f"ワーカーが異常終了しました: {error}")
+
+    def _heartbeat(self):
+        """処理中のジョブの生存を記録し、中断したジョブをやり直す（HEARTBEAT_INTERVAL ごと）"""
+        now = time.time()
+        if now - self._last_heartbeat < HEARTBEAT_INTERVAL:
+            return
+        self._last_heartbeat = now
+        try:
+            self.queue.heartbeat(list(self._running))
+            self.queue.requeue_running()
+        except sqlite3.Error:
+            # 書き込みが混んでいれば次の間隔でやり直す
+            pass
+
+    def _dispatch(self):
+        while not self._stopped.is_set():
+            self._heartbeat()
+            # 空きがなければ処理中のジョブが終わるまで待つ
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue
+            job_id = self.queue.claim()
+            if job_id is None:
+                self._slots.release()
+                self._stopped.wait(self.poll_interval)
+                continue
+            self._running.add(job_id)
+            try:
+                future = self._submit(job_id)
+            except Exception as e:
+                self._running.discard(job_id)
+                self._slots.release()
+                self.queue.fail(job_id, str(e))
+                continue
+            future.add_done_callback(lambda done, job_id=job_id: self._on_done(job_id, done))
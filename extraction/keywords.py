@@ -0,0 +1,101 @@
+"""
+複数キーワードの一括検索
+Aho–Corasick法のオートマトンで、テキストを1回走査するだけで全キーワードを検出します
+"""
+
+import re
+
+
+class KeywordAutomaton:
+    """Aho–Corasick法による複数キーワード検索"""
+
+    def __init__(self, keywords):
+        # 重複と空文字を除き、指定順を保つ
+        self.keywords = list(dict.fromkeys(k for k in keywords if k))
+        
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        
+        for keyword in self.keywords:
+            state = 0
+            for ch in keyword:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(keyword)
+        
+        # 幅優先で失敗遷移を作り、出力を引き継ぐ
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(ch, 0)
+                if self._fail[next_state] == next_state:
+                    self._fail[next_state] = 0
+                self._output[next_state] = (
+                    self._output[next_state] + self._output[self._fail[next_state]]
+                )
+        
+        # 初期状態では、キーワードの先頭文字まで正規表現で読み飛ばす
+        first_chars = sorted({keyword[0] for keyword in self.keywords})
+        self._skip = re.compile(
+            '[' + ''.join(re.escape(ch) for ch in first_chars) + ']'
+        ) if first_chars else None
+
+    def iter_matches(self, text):
+        """(開始位置, 終了位置, キーワード) を出現順に返す（重なりも含む）"""
+        if self._skip is None:
+            return
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        i = 0
+        n = len(text)
+        
+        while i < n:
+            if state == 0:
+                m = self._skip.search(text, i)
+                if m is None:
+                    return
+                i = m.start()
+            ch = text[i]
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for keyword in output[state]:
+                yield i + 1 - len(keyword), i + 1, keyword
+            i += 1
+
+    def find_all(self, text, collapse=True):
+        """キーワードの出現を (開始位置, 終了位置, キーワード) のリストで返す
+
+        collapse=True の場合、重なった出現は最も長いものだけを残します
+        （「入札参加資格」の中の「参加資格」は数えない）
+        """
+        matches = sorted(self.iter_matches(text), key=lambda m: (m[0], m[0] - m[1]))
+        if not collapse:
+            return matches
+        
+        collapsed = []
+        for match in matches:
+            if collapsed and match[0] < collapsed[-1][1]:
+                # 重なっていれば、より長い方を残す
+                if match[1] - match[0] > collapsed[-1][1] - collapsed[-1][0]:
+                    collapsed[-1] = match
+                continue
+            collapsed.append(match)
+        return collapsed
+
+    def contains(self, text):
+        """いずれかのキーワードを含むか"""
+        for _ in self.iter_matches(text):
+            return True
+        return False
@@ -0,0 +1,148 @@
+"""
+ページ単位の抽出処理
+結果はプロセス間で受け渡せるよう、文字列とリストだけで構成します
+"""
+
+import time
+
+from pdfplumber.table import TableSettings
+
+# 罫線から表を検出する戦略（罫線が足りなければ表は見つからない）
+LINE_STRATEGIES = ("lines", "lines_strict")
+
+
+def format_table(table):
+    """表データを読みやすく整形"""
+    if not table:
+        return ""
+    
+    formatted_rows = []
+    for row in table:
+        # None値を空文字に変換
+        cleaned_row = [str(cell).strip() if cell else "" for cell in row]
+        # 空行をスキップ
+        if any(cleaned_row):
+            formatted_rows.append(" | ".join(cleaned_row))
+    
+    return "\n".join(formatted_rows)
+
+
+def needs_table_scan(page, table_settings=None):
+    """表の検出（extract_tables）を実行する必要があるかを罫線の数で判定
+
+    罫線ベースの設定では、縦・横の罫線がそれぞれ2本以上ないと表（セル）ができないので、
+    足りないページは検出を省略しても結果は変わりません
+    片方の向きだけ罫線を使う設定（横罫線だけの表など）は、その向きの罫線だけを数えます
+    """
+    settings = table_settings or {}
+    # 文字の並びや指定した線で区切る向きは、罫線がなくても区切りができる
+    need_vertical = (settings.get('vertical_strategy', 'lines') in LINE_STRATEGIES
+                     and not settings.get('explicit_vertical_lines'))
+    need_horizontal = (settings.get('horizontal_strategy', 'lines') in LINE_STRATEGIES
+                       and not settings.get('explicit_horizontal_lines'))
+    if not (need_vertical or need_horizontal):
+        return True
+    
+    # 曲線は多数の辺に分解されるので判定せずに検出する
+    if page.curves:
+        return True
+    
+    # 矩形は縦・横2本ずつの罫線になる（pdfplumberと同じく上下が一致する線を横線とする）
+    rects = len(page.rects)
+    horizontal = sum(1 for line in page.lines if line['top'] == line['bottom'])
+    vertical = len(page.lines) - horizontal
+    return ((not need_horizontal or horizontal + 2 * rects >= 2)
+            and (not need_vertical or vertical + 2 * rects >= 2))
+
+
+def _outside_tables(bboxes):
+    """表の範囲にない文字だけを残すフィルター（文字の中心で判定）"""
+    def test(obj):
+        if obj.get('object_type') != "char":
+            return True
+        x = (obj['x0'] + obj['x1']) / 2
+        y = (obj['top'] + obj['bottom']) / 2
+        return not any(x0 <= x <= x1 and top <= y <= bottom for x0, top, x1, bottom in bboxes)
+    return test
+
+
+def _extract_single_pass(page, extract_tables, table_settings, result):
+    """表を先に検出し、表の範囲を除いた文字から本文を作る
+
+    ページのオブジェクトは1回だけ読み込まれ、表の文字は全文に重複して入りません
+    """
+    found = []
+    if extract_tables:
+        if needs_table_scan(page, table_settings):
+            started = time.perf_counter()
+            try:
+                settings = TableSettings.resolve(table_settings)
+                found = page.find_tables(settings)
+                result['tables'] = [table.extract(**(settings.text_settings or {})) for table in found]
+                result['table_scan'] = 'scanned'
+            except Exception as e:
+                found = []
+                result['warnings'].append(f"ページ{page.page_number}の表抽出エラー: {str(e)}")
+            result['table_seconds'] = time.perf_counter() - started
+        else:
+            result['table_scan'] = 'skipped'
+    
+    body = page.filter(_outside_tables([table.bbox for table in found])) if found else page
+    result['text'] = body.extract_text()
+
+
+def extract_page(page, extract_tables=True, table_settings=None, single_pass=False):
+    """1ページ分のテキストと表を抽出
+
+    single_pass を指定すると、表の範囲の文字を本文から除きます（表は全文に1回だけ入ります）
+    """
+    result = {
+        'page': page.page_number,
+        'text': None,
+        'tables': [],
+        'warnings': [],
+        'table_scan': None,
+        'table_seconds': 0.0,
+        'error': None
+    }
+    
+    try:
+        if single_pass:
+            _extract_single_pass(page, extract_tables, table_settings, result)
+            return result
+        
+        # テキスト抽出
+        result['text'] = page.extract_text()
+        
+        # 表の抽出（extract_tablesオプションが有効な場合）
+        # 罫線が足りないページは表の検出を省略
+        if extract_tables and not needs_table_scan(page, table_settings):
+            result['table_scan'] = 'skipped'
+        elif extract_tables:
+            started = time.perf_counter()
+            try:
+                if table_settings:
+                    result['tables'] = page.extract_tables(table_settings) or []
+                else:
+                    result['tables'] = page.extract_tables() or []
+                result['table_scan'] = 'scanned'
+            except Exception as e:
+                result['warnings'].append(f"ページ{page.page_number}の表抽出エラー: {str(e)}")
+            result['table_seconds'] = time.perf_counter() - started
+    except Exception as e:
+        result['error'] = str(e)
+    
+    return result
+
+
+def error_page(page_number, message):
+    """処理できなかったページの結果"""
+    return {
+        'page': page_number,
+        'text': None,
+        'tables': [],
+        'warnings': [],
+        'table_scan': None,
+        'table_seconds': 0.0,
+        'error': message
+    }
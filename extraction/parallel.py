@@ -0,0 +1,140 @@
+"""
+ページ並列の抽出エンジン
+ページ範囲をプロセスプールに分配し、各ワーカーが自分でPDFを開いて処理します
+"""
+
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from .document import consume_page_results, iter_page_results
+from .pages import error_page, extract_page
+from .source import iter_pages, open_pdf, page_count
+
+# これより少ないページ数ならプロセス起動のコストの方が大きい
+PARALLEL_MIN_PAGES = 20
+# forkserver のサーバーで先に読み込んでおくモジュール
+# （__main__ も読み込んでおくと、ワーカーごとに読み込み直さずに済む）
+FORKSERVER_PRELOAD = [
+    "__main__", "pdfplumber", "extraction.document", "extraction.pages", "extraction.source"
+]
+
+
+def get_mp_context():
+    """ワーカープロセスの起動方式
+
+    Streamlitのサーバーはスレッドで動くため、forkすると他のスレッドが持っていたロックごと複製され、
+    ワーカーが固まることがあります。使える環境ではforkserverで、抽出に使うモジュールを読み込んだ
+    サーバー（スレッドを持たない）からワーカーをforkし、それ以外はspawnで起動します
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # サーバーの起動前にだけ効く（起動後の呼び出しは何もしない）
+        context.set_forkserver_preload(FORKSERVER_PRELOAD)
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def default_workers():
+    """利用できるCPUコア数"""
+    return os.cpu_count() or 1
+
+
+def split_page_ranges(total_pages, workers, chunk_size=None):
+    """ページを (開始, 終了) の範囲に分割
+
+    最初の結果をすぐ返せるよう、先頭は1ページだけの範囲にします
+    """
+    if total_pages <= 0:
+        return []
+    if chunk_size is None:
+        # ワーカーあたり4チャンク程度にして負荷の偏りを抑える
+        chunk_size = max(1, -(-total_pages // (workers * 4)))
+    ranges = [(0, 1)]
+    ranges.extend((start, min(start + chunk_size, total_pages))
+                  for start in range(1, total_pages, chunk_size))
+    return ranges
+
+
+def _extract_page_range(pdf_path, start, end, extract_tables, table_settings, single_pass,
+                        low_memory):
+    """ワーカープロセスで指定範囲のページを抽出"""
+    with open_pdf(pdf_path) as pdf:
+        return [extract_page(page, extract_tables, table_settings, single_pass)
+                for page in iter_pages(pdf, start, end, low_memory)]
+
+
+def iter_page_results_parallel(source, extract_tables=True, table_settings=None,
+                               workers=None, chunk_size=None,
+                               min_pages=PARALLEL_MIN_PAGES, single_pass=False,
+                               low_memory=False):
+    """複数プロセスで抽出し、ページごとの結果をページ順に返すジェネレーター
+
+    source にはファイルパスまたはPDFのバイト列を指定します。
+    ページ数が min_pages 未満の場合は現在のプロセスで順番に処理します
+    """
+    workers = workers or default_workers()
+    temp_path = None
+    
+    if isinstance(source, (bytes, bytearray)):
+        # ワーカーが各自で開けるように一時ファイルへ書き出す
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(source)
+            temp_path = f.name
+        pdf_path = temp_path
+    else:
+        pdf_path = os.fspath(source)
+    
+    try:
+        with open_pdf(pdf_path) as pdf:
+            total = page_count(pdf, low_memory)
+        
+        if workers <= 1 or total < min_pages:
+            yield from iter_page_results(pdf_path, extract_tables, table_settings, single_pass,
+                                         low_memory)
+            return
+        
+        ranges = split_page_ranges(total, workers, chunk_size)
+        
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges)),
+                                 mp_context=get_mp_context()) as executor:
+            futures = [
+                (executor.submit(_extract_page_range, pdf_path, start, end,
+                                 extract_tables, table_settings, single_pass, low_memory),
+                 start, end)
+                for start, end in ranges
+            ]
+            try:
+                # 投入順に待つことでページ順を保ったまま返す
+                for future, start, end in futures:
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        # ワーカーが落ちた範囲はページ単位のエラーとして扱う
+                        results = [error_page(i + 1, str(e)) for i in range(start, end)]
+                    for result in results:
+                        result['total_pages'] = total
+                        yield result
+            finally:
+                # 途中で打ち切られた場合は未着手の範囲を取り消す
+                for future, _, _ in futures:
+                    future.cancel()
+    finally:
+        if temp_path:
+            os.unlink(temp_path)
+
+
+def extract_all_content_parallel(source, extract_tables=True, table_settings=None,
+                                 workers=None, chunk_size=None,
+                                 min_pages=PARALLEL_MIN_PAGES, reporter=None, single_pass=False,
+                                 low_memory=False):
+    """複数プロセスでPDFから全コンテンツ（テキスト＋表）を抽出
+
+    戻り値は extract_all_content と同じ (全文, ページ情報, 表一覧) です
+    """
+    return consume_page_results(
+        iter_page_results_parallel(source, extract_tables, table_settings,
+                                   workers, chunk_size, min_pages, single_pass, low_memory),
+        reporter
+    )
@@ -0,0 +1,267 @@
+"""
+表抽出設定（table_settings）の自動調整
+数ページのサンプルで候補の設定を試して表の出来を採点し、
+一番よかった設定をレイアウトの指紋（ページサイズ・フォント・作成ソフト）ごとに保存します
+同じ発注者のテンプレートで作られた次のドキュメントは、保存済みの設定をそのまま使います
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from .config import DATA_DIR
+from .pages import needs_table_scan
+from .source import open_pdf
+
+DEFAULT_PROFILE_PATH = os.path.join(DATA_DIR, "table_profiles.sqlite3")
+
+# 試す設定（同点なら先にあるものを選ぶ）
+CANDIDATE_SETTINGS = [
+    ('default', None),
+    ('lines_snap3', {
+        "vertical_strategy": "lines",
+        "horizontal_strategy": "lines",
+        "snap_tolerance": 3,
+        "join_tolerance": 3,
+        "edge_min_length": 3,
+        "min_words_vertical": 1,
+        "min_words_horizontal": 1,
+    }),
+    ('lines_loose', {
+        "vertical_strategy": "lines",
+        "horizontal_strategy": "lines",
+        "snap_tolerance": 6,
+        "join_tolerance": 6,
+        "intersection_tolerance": 6,
+        "edge_min_length": 3,
+    }),
+    ('lines_strict', {
+        "vertical_strategy": "lines_strict",
+        "horizontal_strategy": "lines_strict",
+    }),
+    # 横罫線だけの表（縦の区切りは文字の並びから判定）
+    ('lines_text', {
+        "vertical_strategy": "text",
+        "horizontal_strategy": "lines",
+    }),
+]
+
+# サブセットフォントの接頭辞（例: "ABCDEF+MS-Mincho"）
+SUBSET_PREFIX_RE = re.compile(r'^[A-Z]{6}\+')
+
+
+def layout_fingerprint(pdf, font_pages=3):
+    """ページサイズ・フォント・作成ソフトからレイアウトの指紋を作る"""
+    metadata = pdf.metadata or {}
+    first = pdf.pages[0] if pdf.pages else None
+    fonts = set()
+    for page in pdf.pages[:font_pages]:
+        for char in page.chars:
+            fonts.add(SUBSET_PREFIX_RE.sub("", char.get('fontname', "")))
+        page.close()
+
+    layout = {
+        'size': [round(first.width), round(first.height)] if first else None,
+        'fonts': sorted(fonts),
+        'producer': str(metadata.get('Producer', "")),
+        'creator': str(metadata.get('Creator', "")),
+    }
+    payload = json.dumps(layout, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def score_tables(tables):
+    """表の出来を採点（埋まったセルは加点、空のセルは減点）
+
+    1行・1列だけの「表」は本文の誤検出とみなして数えません
+    """
+    score = 0.0
+    for table in tables:
+        rows = len(table)
+        cols = max((len(row) for row in table), default=0)
+        if rows < 2 or cols < 2:
+            continue
+        filled = sum(1 for row in table for cell in row if cell and str(cell).strip())
+        score += filled - 0.5 * (rows * cols - filled)
+    return score
+
+
+def sample_pages(pdf, sample_size=5, probe_limit=40, candidates=CANDIDATE_SETTINGS):
+    """どれかの候補の設定で表ができうる（罫線のある）ページから均等にサンプルを選ぶ
+
+    横罫線だけのページも、横罫線だけを使う候補（lines_text）のためにサンプルにします
+    罫線を確認するのは全体から均等に選んだ最大 probe_limit ページだけで、
+    サンプルにしなかったページはキャッシュを解放します
+    """
+    total = len(pdf.pages)
+    step = max(1.0, total / probe_limit)
+    probes = sorted({int(i * step) for i in range(min(total, probe_limit))})
+    
+    pages = []
+    for index in probes:
+        page = pdf.pages[index]
+        if any(needs_table_scan(page, settings) for _, settings in candidates):
+            pages.append(page)
+        else:
+            page.close()
+    
+    if len(pages) <= sample_size:
+        return pages
+    step = len(pages) / sample_size
+    chosen = [pages[int(i * step)] for i in range(sample_size)]
+    for page in pages:
+        if page not in chosen:
+            page.close()
+    return chosen
+
+
+def tune_table_settings(pdf, candidates=CANDIDATE_SETTINGS, sample_size=5):
+    """サンプルページで候補を試し、(設定名, 設定, 採点) を返す
+
+    罫線のあるページがなければ (None, None, {}) を返します
+    """
+    pages = sample_pages(pdf, sample_size, candidates=candidates)
+    if not pages:
+        return None, None, {}
+
+    scores = {}
+    for name, settings in candidates:
+        score = 0.0
+        for page in pages:
+            try:
+                score += score_tables(page.extract_tables(settings) if settings else page.extract_tables())
+            except Exception:
+                # この設定では抽出できないページがある
+                score = float("-inf")
+                break
+        scores[name] = score
+    for page in pages:
+        page.close()
+
+    best = max(candidates, key=lambda candidate: scores[candidate[0]])
+    return best[0], best[1], scores
+
+
+class TableProfileStore:
+    """レイアウトの指紋ごとに最適な表抽出設定を保存するストア"""
+
+    def __init__(self, path=DEFAULT_PROFILE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS table_profiles (
+                    fingerprint TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    settings TEXT NOT NULL,
+                    scores TEXT NOT NULL,
+                    documents INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, fingerprint):
+        """保存済みの設定を取得し、利用回数を数える（なければNone）"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT name, settings, scores, documents FROM table_profiles WHERE fingerprint = ?",
+                (fingerprint,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE table_profiles SET documents = documents + 1, last_used = ? "
+                "WHERE fingerprint = ?",
+                (time.time(), fingerprint)
+            )
+        return {
+            'name': row[0],
+            'settings': json.loads(row[1]),
+            'scores': json.loads(row[2]),
+            'documents': row[3] + 1
+        }
+
+    def put(self, fingerprint, name, settings, scores):
+        """調整した設定を保存"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO table_profiles "
+                "(fingerprint, name, settings, scores, documents, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, 1, ?, ?)",
+                (fingerprint, name, json.dumps(settings), json.dumps(scores), now, now)
+            )
+
+    def delete(self, fingerprint):
+        """設定を削除（次のドキュメントで調整し直す）"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM table_profiles WHERE fingerprint = ?", (fingerprint,))
+
+    def stats(self):
+        """保存しているレイアウトの数"""
+        with self._connect() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM table_profiles").fetchone()[0]
+        return {'profiles': count}
+
+
+def resolve_table_settings(pdf_file, store=None, fallback=None,
+                           candidates=CANDIDATE_SETTINGS, sample_size=5):
+    """ドキュメントに使う表抽出設定を決める
+
+    保存済みのレイアウトならその設定を、初めてのレイアウトならサンプルで調整した設定を返します
+    戻り値: (設定, 情報)  情報の 'source' は 'stored'（保存済み）/'tuned'（調整）/'fallback'（表なし）
+    """
+    if isinstance(pdf_file, (bytes, bytearray)):
+        pdf_file = io.BytesIO(pdf_file)
+
+    with open_pdf(pdf_file) as pdf:
+        fingerprint = layout_fingerprint(pdf)
+        profile = store.get(fingerprint) if store else None
+        if profile is not None:
+            return profile['settings'], {
+                'fingerprint': fingerprint,
+                'name': profile['name'],
+                'scores': profile['scores'],
+                'documents': profile['documents'],
+                'source': 'stored'
+            }
+
+        started = time.perf_counter()
+        name, settings, scores = tune_table_settings(pdf, candidates, sample_size)
+        elapsed = time.perf_counter() - started
+
+    if name is None:
+        # 罫線のあるページがない（このドキュメントでは決められないので保存しない）
+        return fallback, {
+            'fingerprint': fingerprint, 'name': None, 'scores': {},
+            'documents': 0, 'source': 'fallback', 'elapsed': elapsed
+        }
+
+    if store:
+        store.put(fingerprint, name, settings, scores)
+    return settings, {
+        'fingerprint': fingerprint, 'name': name, 'scores': scores,
+        'documents': 1, 'source': 'tuned', 'elapsed': elapsed
+    }
@@ -0,0 +1,62 @@
+"""
+抽出処理の進捗通知
+抽出処理はこのインターフェース経由で進捗・途中結果・警告を知らせるので、
+UI（Streamlit）やバッチ、ベンチマークがそれぞれの方法で受け取れます
+"""
+
+
+class ExtractionReporter:
+    """抽出処理の進捗を受け取るインターフェース
+
+    必要なメソッドだけを上書きして使います（既定では何もしません）
+    """
+
+    def start(self, total_pages):
+        """抽出を開始したとき（総ページ数が分かった時点）"""
+
+    def page(self, page_data):
+        """1ページ分の結果がそろったとき"""
+
+    def progress(self, done, total):
+        """処理済みページ数が増えたとき"""
+
+    def warning(self, message, level="warning"):
+        """警告があったとき（level は 'warning' または表単位の 'debug'）"""
+
+    def finish(self):
+        """抽出が終わったとき（途中で失敗した場合も呼ばれます）"""
+
+
+class CollectingReporter(ExtractionReporter):
+    """警告を記録するだけの通知先（バッチ処理やベンチマーク用）"""
+
+    def __init__(self):
+        self.total_pages = 0
+        self.warnings = []
+
+    def start(self, total_pages):
+        self.total_pages = total_pages
+
+    def warning(self, message, level="warning"):
+        self.warnings.append(message)
+
+
+NULL_REPORTER = ExtractionReporter()
+
+
+def run_reported(page_results, builder, reporter=None):
+    """ページごとの結果を builder に渡しながら reporter に進捗を通知する"""
+    reporter = reporter or NULL_REPORTER
+    done = 0
+    try:
+        for result in page_results:
+            total = result.get('total_pages')
+            if done == 0:
+                reporter.start(total)
+            page_data = builder.add(result)
+            done += 1
+            reporter.page(page_data)
+            reporter.progress(done, total)
+    finally:
+        reporter.finish()
+    return builder.build()
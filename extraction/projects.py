@@ -0,0 +1,422 @@
+"""
+案件の管理
+案件・案件ごとの入札説明書・抽出した参加条件と表をSQLiteに保存し、
+発注者・日付・条件の分類で絞り込めるようにします
+一括処理（python -m extraction）の出力はまとめて取り込めます
+"""
+
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from .config import DATA_DIR
+
+DEFAULT_PROJECTS_PATH = os.path.join(DATA_DIR, "projects.sqlite3")
+
+# list_projects の並べ替え（名前 → ORDER BY）
+PROJECT_ORDERS = {
+    'created': "p.created_at DESC",
+    'deadline': "p.deadline IS NULL, p.deadline",
+    'client': "p.client IS NULL, p.client, p.created_at DESC",
+    'name': "p.name",
+}
+
+
+def _is_within(path, root):
+    """path が root かその下を指すか（シンボリックリンク・.. を解決して比べる）"""
+    path, root = os.path.realpath(path), os.path.realpath(root)
+    try:
+        return os.path.commonpath([path, root]) == root
+    except ValueError:
+        # Windowsでドライブが違う
+        return False
+
+
+def _read_csv(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return [row for row in csv.reader(f)]
+
+
+class ProjectRegistry:
+    """案件・入札説明書・参加条件・表のストア"""
+
+    def __init__(self, path=DEFAULT_PROJECTS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS projects (
+                    project_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    client TEXT,
+                    deadline TEXT,
+                    notes TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_projects_client ON projects(client)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_projects_deadline ON projects(deadline)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_projects_created ON projects(created_at)")
+            # 案件の入札説明書（doc_key はファイルのハッシュ）
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS project_documents (
+                    document_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    project_id INTEGER NOT NULL REFERENCES projects(project_id) ON DELETE CASCADE,
+                    doc_key TEXT NOT NULL,
+                    name TEXT,
+                    pages INTEGER NOT NULL DEFAULT 0,
+                    char_count INTEGER NOT NULL DEFAULT 0,
+                    condition_count INTEGER NOT NULL DEFAULT 0,
+                    table_count INTEGER NOT NULL DEFAULT 0,
+                    added_at REAL NOT NULL,
+                    UNIQUE (project_id, doc_key)
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_documents_doc_key ON project_documents(doc_key)"
+            )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS document_conditions (
+                    document_id INTEGER NOT NULL
+                        REFERENCES project_documents(document_id) ON DELETE CASCADE,
+                    page INTEGER,
+                    category TEXT,
+                    condition TEXT NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conditions_category "
+                "ON document_conditions(category, document_id)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conditions_document "
+                "ON document_conditions(document_id)"
+            )
+            # 表はセルの2次元リストをJSONで保存
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS document_tables (
+                    document_id INTEGER NOT NULL
+                        REFERENCES project_documents(document_id) ON DELETE CASCADE,
+                    page INTEGER NOT NULL,
+                    table_index INTEGER NOT NULL,
+                    rows TEXT NOT NULL,
+                    PRIMARY KEY (document_id, page, table_index)
+                ) WITHOUT ROWID
+            """)
+            # 書き込みのたびに増える番号（検索用の索引などを作り直すかの判定に使う）
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS registry_revision (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    value INTEGER NOT NULL
+                )
+            """)
+            conn.execute("INSERT OR IGNORE INTO registry_revision (id, value) VALUES (1, 0)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _bump_revision(self, conn):
+        conn.execute("UPDATE registry_revision SET value = value + 1 WHERE id = 1")
+
+    def revision(self):
+        """書き込みのたびに増える番号（案件・入札説明書・参加条件・表のどれかが変わると変わる）"""
+        with self._connect() as conn:
+            return conn.execute("SELECT value FROM registry_revision WHERE id = 1").fetchone()[0]
+
+    # 案件
+
+    def create_project(self, name, client=None, deadline=None, notes=None, document=None):
+        """案件を登録して案件IDを返す（deadline は 'YYYY-MM-DD' または date）
+
+        document（add_document の引数の辞書）を指定すると、入札説明書も同じトランザクションで追加します
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            project_id = conn.execute(
+                "INSERT INTO projects (name, client, deadline, notes, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (name, client or None, str(deadline) if deadline else None, notes, now, now)
+            ).lastrowid
+            if document is not None:
+                self._add_document(
+                    conn, project_id, document['doc_key'], document.get('name'),
+                    document.get('pages', 0), document.get('char_count', 0),
+                    list(document.get('conditions', ())), list(document.get('tables', ()))
+                )
+            self._bump_revision(conn)
+            return project_id
+
+    def get_project(self, project_id):
+        """案件（なければNone）"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM projects WHERE project_id = ?", (project_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def delete_project(self, project_id):
+        """案件を入札説明書・参加条件・表ごと削除"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM projects WHERE project_id = ?", (project_id,))
+            self._bump_revision(conn)
+
+    def list_projects(self, client=None, category=None, since=None, until=None, name=None,
+                      order='created', limit=100, offset=0):
+        """条件で絞り込んだ案件を、入札説明書・参加条件・表の件数つきで返す
+
+        client: 発注者（完全一致）  category: この分類の参加条件がある案件
+        since/until: 提出期限の範囲（'YYYY-MM-DD'、両端を含む）  name: 案件名の部分一致
+        order: PROJECT_ORDERS のキー
+        """
+        where, params = [], []
+        if client:
+            where.append("p.client = ?")
+            params.append(client)
+        if since:
+            where.append("p.deadline >= ?")
+            params.append(str(since))
+        if until:
+            where.append("p.deadline <= ?")
+            params.append(str(until))
+        if name:
+            where.append("p.name LIKE ?")
+            params.append(f"%{name}%")
+        if category:
+            # 案件ごとに調べず、分類の索引から該当する案件をまとめて求める
+            where.append(
+                "p.project_id IN (SELECT d.project_id FROM project_documents d "
+                "WHERE d.document_id IN "
+                "(SELECT c.document_id FROM document_conditions c WHERE c.category = ?))"
+            )
+            params.append(category)
+
+        sql = (
+            "SELECT p.*, COUNT(d.document_id) AS document_count, "
+            "COALESCE(SUM(d.condition_count), 0) AS condition_count, "
+            "COALESCE(SUM(d.table_count), 0) AS table_count "
+            "FROM projects p LEFT JOIN project_documents d ON d.project_id = p.project_id "
+            + (f"WHERE {' AND '.join(where)} " if where else "")
+            + f"GROUP BY p.project_id ORDER BY {PROJECT_ORDERS[order]} LIMIT ? OFFSET ?"
+        )
+        with self._connect() as conn:
+            rows = conn.execute(sql, params + [limit, offset]).fetchall()
+        return [dict(row) for row in rows]
+
+    def clients(self):
+        """登録済みの発注者（案件の多い順）"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT client FROM projects WHERE client IS NOT NULL "
+                "GROUP BY client ORDER BY COUNT(*) DESC, client"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def categories(self):
+        """参加条件の分類（件数の多い順）"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT category FROM document_conditions WHERE category IS NOT NULL "
+                "GROUP BY category ORDER BY COUNT(*) DESC"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    # 入札説明書・参加条件・表
+
+    def _add_document(self, conn, project_id, doc_key, name, pages, char_count,
+                      conditions, tables):
+        # 同じ案件に同じドキュメントを追加した場合は置き換える
+        conn.execute(
+            "DELETE FROM project_documents WHERE project_id = ? AND doc_key = ?",
+            (project_id, doc_key)
+        )
+        document_id = conn.execute(
+            "INSERT INTO project_documents "
+            "(project_id, doc_key, name, pages, char_count, condition_count, table_count, added_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (project_id, doc_key, name, pages, char_count, len(conditions), len(tables), time.time())
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO document_conditions (document_id, page, category, condition) "
+            "VALUES (?, ?, ?, ?)",
+            ((document_id, c.get('page'), c.get('category'), c['condition']) for c in conditions)
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO document_tables (document_id, page, table_index, rows) "
+            "VALUES (?, ?, ?, ?)",
+            ((document_id, page, index, json.dumps(rows, ensure_ascii=False))
+             for page, index, rows in tables)
+        )
+        conn.execute(
+            "UPDATE projects SET updated_at = ? WHERE project_id = ?", (time.time(), project_id)
+        )
+        return document_id
+
+    def add_document(self, project_id, doc_key, name, pages=0, char_count=0,
+                     conditions=(), tables=()):
+        """案件に入札説明書と抽出結果を追加してドキュメントIDを返す
+
+        conditions: {'page', 'category', 'condition'} のリスト（extract_page_conditions の結果）
+        tables: (ページ, 表番号, セルの2次元リスト) のリスト
+        """
+        conditions, tables = list(conditions), list(tables)
+        with self._lock, self._connect() as conn:
+            document_id = self._add_document(
+                conn, project_id, doc_key, name, pages, char_count, conditions, tables
+            )
+            self._bump_revision(conn)
+            return document_id
+
+    def documents(self, project_id):
+        """案件の入札説明書"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM project_documents WHERE project_id = ? ORDER BY added_at",
+                (project_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def conditions(self, project_id, category=None):
+        """案件の参加条件（ドキュメント名・ページつき）"""
+        sql = (
+            "SELECT d.name AS document, c.page, c.category, c.condition "
+            "FROM document_conditions c JOIN project_documents d ON d.document_id = c.document_id "
+            "WHERE d.project_id = ?"
+        )
+        params = [project_id]
+        if category:
+            sql += " AND c.category = ?"
+            params.append(category)
+        with self._connect() as conn:
+            rows = conn.execute(sql + " ORDER BY d.added_at, c.rowid", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def all_conditions(self, category=None):
+        """全案件の参加条件（案件名・発注者・ドキュメント名・ページつき）"""
+        sql = (
+            "SELECT p.project_id, p.name AS project, p.client, d.name AS document, "
+            "c.page, c.category, c.condition "
+            "FROM document_conditions c "
+            "JOIN project_documents d ON d.document_id = c.document_id "
+            "JOIN projects p ON p.project_id = d.project_id"
+        )
+        params = []
+        if category:
+            sql += " WHERE c.category = ?"
+            params.append(category)
+        with self._connect() as conn:
+            rows = conn.execute(sql + " ORDER BY c.rowid", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def tables(self, document_id):
+        """入札説明書の表（(ページ, 表番号, セルの2次元リスト) のリスト）"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT page, table_index, rows FROM document_tables WHERE document_id = ? "
+                "ORDER BY page, table_index",
+                (document_id,)
+            ).fetchall()
+        return [(row[0], row[1], json.loads(row[2])) for row in rows]
+
+    def stats(self):
+        """案件・入札説明書・参加条件の件数"""
+        with self._connect() as conn:
+            return {
+                'projects': conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0],
+                'documents': conn.execute("SELECT COUNT(*) FROM project_documents").fetchone()[0],
+                'conditions': conn.execute(
+                    "SELECT COUNT(*) FROM document_conditions"
+                ).fetchone()[0],
+            }
+
+    # 一括処理の出力の取り込み
+
+    def import_batch_output(self, output_root, project_id=None, client=None, allowed_root=None):
+        """一括処理の出力（manifest.json のあるディレクトリ）を取り込む
+
+        project_id を指定するとその案件に、指定しなければドキュメントごとに案件を作って追加します
+        （同じドキュメントがすでにある案件には、案件を作らずに置き換えます）
+        allowed_root を指定すると、その下のディレクトリだけを取り込みます
+        （output_root は allowed_root からの相対パスで、外を指すとValueError）
+        戻り値: {'imported': 取り込んだ件数, 'skipped': 出力が見つからなかった件数}
+        """
+        # 一括処理はPDFの抽出一式を読み込むので、使うときだけ読み込む
+        from .batch import MANIFEST_NAME, load_manifest
+
+        if allowed_root is not None:
+            output_root = os.path.join(allowed_root, output_root)
+            if not _is_within(output_root, allowed_root):
+                raise ValueError("取り込めるのは一括処理の出力ディレクトリの下だけです")
+        manifest = load_manifest(output_root)
+        if not manifest and not os.path.exists(os.path.join(output_root, MANIFEST_NAME)):
+            raise FileNotFoundError(f"{output_root} に {MANIFEST_NAME} がありません")
+
+        # ファイルの読み込みはロックの外で済ませ、書き込みは1回のトランザクションで行う
+        documents = []
+        skipped = 0
+        for file_hash, entry in manifest.items():
+            output = entry.get('output', "")
+            if not os.path.isdir(output) or not _is_within(output, output_root):
+                # 一括処理を別のディレクトリから実行した場合（出力先の外は読まない）
+                output = os.path.join(output_root, os.path.basename(output))
+            result_path = os.path.join(output, "result.json")
+            if not os.path.exists(result_path):
+                skipped += 1
+                continue
+
+            with open(result_path, encoding='utf-8') as f:
+                result = json.load(f)
+            conditions = []
+            conditions_path = os.path.join(output, "conditions.json")
+            if os.path.exists(conditions_path):
+                with open(conditions_path, encoding='utf-8') as f:
+                    conditions = json.load(f)
+            tables = []
+            for table in result.get('tables', []):
+                table_path = os.path.join(output, table['file'])
+                if _is_within(table_path, output) and os.path.exists(table_path):
+                    tables.append((table['page'], table['table_index'], _read_csv(table_path)))
+            name = os.path.basename(result.get('file') or entry.get('file', ""))
+            documents.append((file_hash, name, result, conditions, tables))
+
+        with self._lock, self._connect() as conn:
+            now = time.time()
+            for file_hash, name, result, conditions, tables in documents:
+                target = project_id
+                if target is None:
+                    row = conn.execute(
+                        "SELECT project_id FROM project_documents WHERE doc_key = ? LIMIT 1",
+                        (file_hash,)
+                    ).fetchone()
+                    if row is not None:
+                        target = row[0]
+                    else:
+                        target = conn.execute(
+                            "INSERT INTO projects (name, client, created_at, updated_at) "
+                            "VALUES (?, ?, ?, ?)",
+                            (os.path.splitext(name)[0], client or None, now, now)
+                        ).lastrowid
+                self._add_document(
+                    conn, target, file_hash, name, result.get('pages', 0),
+                    result.get('char_count', 0), conditions, tables
+                )
+            self._bump_revision(conn)
+        return {'imported': len(documents), 'skipped': skipped}
@@ -0,0 +1,576 @@
+"""
+改訂版（訂正版）の入札説明書の差分抽出
+ページの内容（描画命令・フォントなど）から指紋を作り、ページごとの抽出結果を指紋をキーに保存します
+改訂版をアップロードすると、内容の変わったページだけを解析し直し、
+前の版とのページ・参加条件・表の差分を求めます
+"""
+
+import difflib
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+
+from pdfminer.pdfinterp import PDFContentParser, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import PDFObjRef, PDFStream, dict_value
+from pdfminer.psparser import PSEOF, PSKeyword, PSLiteral, literal_name
+
+from .conditions import extract_page_conditions
+from .config import DATA_DIR, EXTRACTOR_VERSION
+from .document import build_content, consume_page_results
+from .pages import extract_page
+from .profiles import SUBSET_PREFIX_RE
+from .source import iter_pages, open_pdf, page_count
+
+DEFAULT_PAGE_STORE_PATH = os.path.join(DATA_DIR, "page_results.sqlite3")
+DEFAULT_PAGE_STORE_MAX_BYTES = int(os.environ.get("PAGE_STORE_MAX_MB", "512")) * 1024 * 1024
+
+# 指紋に含めるページの属性（注釈やページツリー上の位置は抽出結果に影響しない）
+PAGE_KEYS = ('MediaBox', 'CropBox', 'Rotate', 'UserUnit')
+# 文字列を表示する演算子（文字列はフォントで文字と幅に変換してから指紋に含める）
+TEXT_OPERATORS = {b'Tj', b'TJ', b"'", b'"'}
+# 指紋に含めない辞書のキー（フォントのグリフは抽出結果に影響しない）
+SKIP_KEYS = {'Parent', 'Length', 'FontFile', 'FontFile2', 'FontFile3', 'CIDSet', 'CharSet'}
+# サブセットの接頭辞を除く名前
+FONT_NAME_KEYS = {'BaseFont', 'FontName'}
+# ページの結果を保存するまでにためる件数
+FLUSH_PAGES = 32
+# 前の版とみなすのに必要な共通のページの割合（白紙やスキャンだけのページが偶然一致しても前の版にしない）
+MIN_SHARED_RATIO = 0.5
+
+
+def _digest(obj, memo):
+    """PDFオブジェクトの内容のハッシュ（参照先も含む。同じ参照は memo で1回だけ計算）"""
+    if isinstance(obj, PDFObjRef):
+        if obj.objid in memo:
+            return memo[obj.objid]
+        # 循環参照の間は空のハッシュとして扱う
+        memo[obj.objid] = b""
+        memo[obj.objid] = _digest(obj.resolve(), memo)
+        return memo[obj.objid]
+
+    h = hashlib.sha256()
+    if isinstance(obj, PDFStream):
+        h.update(b"S")
+        h.update(_digest(obj.attrs, memo))
+        # 画像の中身は文字の抽出に影響しないので属性だけ使う
+        subtype = obj.attrs.get('Subtype')
+        if not (isinstance(subtype, PSLiteral) and subtype.name == 'Image'):
+            h.update(obj.get_data())
+    elif isinstance(obj, dict):
+        h.update(b"D")
+        for key in sorted(obj, key=str):
+            if key in SKIP_KEYS:
+                continue
+            h.update(str(key).encode("utf-8"))
+            value = obj[key]
+            if key in FONT_NAME_KEYS and isinstance(value, PSLiteral):
+                h.update(SUBSET_PREFIX_RE.sub("", str(value.name)).encode("utf-8"))
+            else:
+                h.update(_digest(value, memo))
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"L")
+        for value in obj:
+            h.update(_digest(value, memo))
+    elif isinstance(obj, PSLiteral):
+        h.update(b"N" + str(obj.name).encode("utf-8"))
+    else:
+        h.update(repr(obj).encode("utf-8"))
+    return h.digest()
+
+
+def _page_fonts(resources, rsrcmgr, memo):
+    """ページのリソース名 → (フォント, 変換済みの文字列の辞書)（同じフォントは memo で1回だけ読み込む）"""
+    fonts = {}
+    for name, spec in dict_value(resources.get('Font') or {}).items():
+        objid = spec.objid if isinstance(spec, PDFObjRef) else None
+        key = ('font', objid)
+        if objid is not None and key in memo:
+            fonts[name] = memo[key]
+            continue
+        font = rsrcmgr.get_font(objid, dict_value(spec))
+        # 文字の高さ・縦書きはフォントで決まる
+        metrics = repr((font.is_vertical(), font.get_descent(), font.bbox)).encode("utf-8")
+        fonts[name] = (font, metrics, {})
+        if objid is not None:
+            memo[key] = fonts[name]
+    return fonts
+
+
+def _decoded(font, decoded, data):
+    """文字列をフォントで (文字, 幅) の並びに変換（ToUnicodeにない文字はCIDのまま）"""
+    if data not in decoded:
+        glyphs = []
+        for cid in font.decode(data):
+            try:
+                char = font.to_unichr(cid)
+            except Exception:
+                char = cid
+            glyphs.append((char, font.char_width(cid)))
+        decoded[data] = repr(glyphs).encode("utf-8")
+    return decoded[data]
+
+
+def _content_digest(page_obj, resources, rsrcmgr, memo):
+    """描画命令のハッシュ（元のデータと、表示する文字列をフォントで変換した文字と幅）
+
+    ドキュメント全体で共有するフォントのToUnicodeや幅の表を丸ごと使うと、
+    改訂で1ページに文字を足しただけで全ページの指紋が変わるため、ページで使う分だけを含めます
+    """
+    fonts = _page_fonts(resources, rsrcmgr, memo)
+    h = hashlib.sha256()
+    for stream in page_obj.contents:
+        h.update(_digest(stream, memo))
+
+    parser = PDFContentParser(page_obj.contents)
+    args = []
+    font = None
+    while True:
+        try:
+            _, obj = parser.nextobject()
+        except PSEOF:
+            break
+        if not isinstance(obj, PSKeyword):
+            args.append(obj)
+            continue
+        operator = obj.name
+        if operator == b'Tf' and len(args) >= 2:
+            font = fonts.get(literal_name(args[-2]))
+            h.update(font[1] if font is not None else b"-")
+        elif operator in TEXT_OPERATORS and font is not None:
+            for arg in args:
+                for item in arg if isinstance(arg, list) else (arg,):
+                    if isinstance(item, bytes):
+                        h.update(_decoded(font[0], font[2], item))
+        args = []
+    return h.digest()
+
+
+def page_fingerprint(page_obj, memo=None, rsrcmgr=None):
+    """ページ（pdfminerのPDFPage）の内容の指紋（描画命令・表示する文字と幅・ページサイズなどから計算）
+
+    memo（辞書）をドキュメント内で共有すると、共通のフォントなどを1回だけ計算します
+    """
+    memo = {} if memo is None else memo
+    rsrcmgr = rsrcmgr or PDFResourceManager()
+    attrs = page_obj.attrs
+    h = hashlib.sha256()
+    for key in PAGE_KEYS:
+        if key in attrs:
+            h.update(key.encode("utf-8"))
+            h.update(_digest(attrs[key], memo))
+
+    resources = dict_value(attrs.get('Resources') or {})
+    # フォント以外のリソース（フォームXObject・画像の属性など）
+    h.update(_digest({k: v for k, v in resources.items() if k != 'Font'}, memo))
+    try:
+        h.update(_content_digest(page_obj, resources, rsrcmgr, memo))
+    except Exception:
+        # 読めない描画命令やフォントは、元のデータとフォント全体で指紋を作る
+        h.update(_digest(attrs.get('Contents'), memo))
+        h.update(_digest(resources.get('Font'), memo))
+    return h.hexdigest()[:32]
+
+
+def page_settings_key(extract_tables=True, table_settings=None, single_pass=False):
+    """ページの抽出結果に影響する設定のキー（抽出バージョンを含む）"""
+    settings = {
+        'version': EXTRACTOR_VERSION,
+        'extract_tables': extract_tables,
+        'table_settings': table_settings,
+        'single_pass': single_pass,
+    }
+    payload = json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class PageResultStore:
+    """ページの指紋ごとの抽出結果と、ドキュメントの版（ページの指紋の並び）のストア"""
+
+    def __init__(self, path=DEFAULT_PAGE_STORE_PATH, max_bytes=DEFAULT_PAGE_STORE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS page_results (
+                    settings_key TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (settings_key, fingerprint)
+                ) WITHOUT ROWID
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_page_results_last_access "
+                "ON page_results(last_access)"
+            )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS document_versions (
+                    doc_key TEXT NOT NULL,
+                    settings_key TEXT NOT NULL,
+                    name TEXT,
+                    fingerprints TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (doc_key, settings_key)
+                )
+            """)
+            # 指紋 → それを含むドキュメント（前の版を探すため）
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS version_pages (
+                    settings_key TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    doc_key TEXT NOT NULL,
+                    PRIMARY KEY (settings_key, fingerprint, doc_key)
+                ) WITHOUT ROWID
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, settings_key, fingerprints):
+        """保存済みのページの結果 {指紋: 結果}"""
+        fingerprints = list(dict.fromkeys(fingerprints))
+        results = {}
+        with self._lock, self._connect() as conn:
+            # SQLiteの変数の上限に収まるよう分けて読む
+            for start in range(0, len(fingerprints), 500):
+                chunk = fingerprints[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT fingerprint, payload FROM page_results WHERE settings_key = ? "
+                    f"AND fingerprint IN ({','.join('?' * len(chunk))})",
+                    [settings_key] + chunk
+                ).fetchall()
+                for fingerprint, payload in rows:
+                    try:
+                        results[fingerprint] = pickle.loads(zlib.decompress(payload))
+                    except Exception:
+                        # 壊れたデータは使わずに解析し直す
+                        continue
+            if results:
+                conn.executemany(
+                    "UPDATE page_results SET last_access = ? "
+                    "WHERE settings_key = ? AND fingerprint = ?",
+                    ((time.time(), settings_key, fingerprint) for fingerprint in results)
+                )
+        return results
+
+    def put_many(self, settings_key, results):
+        """ページの結果 {指紋: 結果} を保存し、容量上限を超えたら古いものから削除"""
+        now = time.time()
+        rows = []
+        for fingerprint, result in results.items():
+            payload = zlib.compress(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+            rows.append((settings_key, fingerprint, sqlite3.Binary(payload), len(payload), now))
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO page_results "
+                "(settings_key, fingerprint, payload, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM page_results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute(
+            "SELECT settings_key, fingerprint, size FROM page_results ORDER BY last_access ASC"
+        ).fetchall()
+        for settings_key, fingerprint, size in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute(
+                "DELETE FROM page_results WHERE settings_key = ? AND fingerprint = ?",
+                (settings_key, fingerprint)
+            )
+            total -= size
+
+    def put_version(self, doc_key, settings_key, name, fingerprints):
+        """ドキュメントの版（ページの指紋の並び）を記録"""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "DELETE FROM version_pages WHERE settings_key = ? AND doc_key = ?",
+                (settings_key, doc_key)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO document_versions "
+                "(doc_key, settings_key, name, fingerprints, created_at) VALUES (?, ?, ?, ?, ?)",
+                (doc_key, settings_key, name, json.dumps(fingerprints), time.time())
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO version_pages (settings_key, fingerprint, doc_key) "
+                "VALUES (?, ?, ?)",
+                ((settings_key, fingerprint, doc_key) for fingerprint in set(fingerprints) if fingerprint)
+            )
+
+    def get_version(self, doc_key, settings_key):
+        """記録済みの版（なければNone）"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT name, fingerprints, created_at FROM document_versions "
+                "WHERE doc_key = ? AND settings_key = ?",
+                (doc_key, settings_key)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'doc_key': doc_key,
+            'name': row[0],
+            'fingerprints': json.loads(row[1]),
+            'created_at': row[2]
+        }
+
+    def find_previous(self, settings_key, fingerprints, exclude=None, min_ratio=MIN_SHARED_RATIO):
+        """同じページを一番多く含む別のドキュメントの版（前の版の候補、なければNone）
+
+        共通のページ（指紋の種類）が、どちらの版のページの min_ratio 以上でもなければ前の版とみなしません
+        """
+        fingerprints = [fingerprint for fingerprint in set(fingerprints) if fingerprint]
+        if not fingerprints:
+            return None
+        shared = Counter()
+        with self._connect() as conn:
+            for start in range(0, len(fingerprints), 500):
+                chunk = fingerprints[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT doc_key, COUNT(*) FROM version_pages WHERE settings_key = ? "
+                    f"AND fingerprint IN ({','.join('?' * len(chunk))}) GROUP BY doc_key",
+                    [settings_key] + chunk
+                ).fetchall()
+                for doc_key, count in rows:
+                    if doc_key != exclude:
+                        shared[doc_key] += count
+        for doc_key, count in shared.most_common():
+            # 以降の候補は共通のページがもっと少ない
+            if count < min_ratio * len(fingerprints):
+                break
+            version = self.get_version(doc_key, settings_key)
+            if version is None:
+                continue
+            previous = {fingerprint for fingerprint in version['fingerprints'] if fingerprint}
+            if count >= min_ratio * len(previous):
+                version['shared_pages'] = count
+                return version
+        return None
+
+    def stats(self):
+        """保存しているページ数・合計サイズ・版の数"""
+        with self._connect() as conn:
+            pages, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM page_results"
+            ).fetchone()
+            versions = conn.execute("SELECT COUNT(*) FROM document_versions").fetchone()[0]
+        return {'pages': pages, 'bytes': size, 'versions': versions}
+
+
+def iter_page_results_incremental(pdf_file, store, extract_tables=True, table_settings=None,
+                                  single_pass=False, low_memory=False):
+    """iter_page_results と同じ結果を返すが、保存済みの指紋のページは解析せずに再利用する
+
+    各結果には 'fingerprint' と、再利用したかどうかの 'reused' が入ります
+    """
+    settings_key = page_settings_key(extract_tables, table_settings, single_pass)
+    pending = {}
+    with open_pdf(pdf_file) as pdf:
+        total = page_count(pdf, low_memory)
+        # 先に全ページの指紋を計算し、保存済みの結果をまとめて読む（ページの解析よりずっと速い）
+        memo = {}
+        rsrcmgr = PDFResourceManager()
+        fingerprints = [
+            page_fingerprint(page_obj, memo, rsrcmgr) for page_obj in PDFPage.create_pages(pdf.doc)
+        ]
+        if low_memory:
+            getattr(pdf.doc, '_cached_objs', {}).clear()
+        cached_results = store.get_many(settings_key, fingerprints)
+        
+        for page in iter_pages(pdf, low_memory=low_memory):
+            fingerprint = fingerprints[page.page_number - 1]
+            # 同じ指紋のページが複数あっても、結果は別々に持つ
+            cached = cached_results.get(fingerprint)
+            if cached is not None:
+                result = dict(cached)
+                # 前の版とページ番号が違う場合がある
+                result['page'] = page.page_number
+                result['reused'] = True
+            else:
+                result = extract_page(page, extract_tables, table_settings, single_pass)
+                result['reused'] = False
+                # 読み込みに失敗したページは保存しない
+                if result['error'] is None:
+                    pending[fingerprint] = result
+            result['fingerprint'] = fingerprint
+            result['total_pages'] = total
+            if len(pending) >= FLUSH_PAGES:
+                store.put_many(settings_key, pending)
+                pending = {}
+            yield result
+    if pending:
+        store.put_many(settings_key, pending)
+
+
+def extract_all_content_incremental(pdf_file, store, extract_tables=True, table_settings=None,
+                                    reporter=None, single_pass=False, low_memory=False):
+    """extract_all_content と同じ (全文, ページ情報, 表一覧) を、変わったページだけ解析して返す"""
+    return consume_page_results(
+        iter_page_results_incremental(
+            pdf_file, store, extract_tables, table_settings, single_pass, low_memory
+        ),
+        reporter
+    )
+
+
+def load_version_content(store, version, settings_key):
+    """記録済みの版の (全文, ページ情報, 表一覧) を保存済みのページから組み立てる
+
+    ページの結果が容量上限で削除されていればNone
+    """
+    fingerprints = version['fingerprints']
+    results = store.get_many(settings_key, fingerprints)
+    if any(fingerprint not in results for fingerprint in fingerprints):
+        return None
+    page_results = []
+    for number, fingerprint in enumerate(fingerprints, start=1):
+        result = dict(results[fingerprint])
+        result['page'] = number
+        result['fingerprint'] = fingerprint
+        page_results.append(result)
+    return build_content(page_results)
+
+
+def diff_contents(old_content, new_content):
+    """2つの版の (全文, ページ情報, 表一覧) のページ・参加条件・表の差分
+
+    pages:      変わったページ（'changed'/'added'/'removed' と、前の版・新しい版のページ番号）
+    conditions: 追加・削除された参加条件（extract_page_conditions の形式）
+    tables:     追加・削除された表（TableRecord）
+    """
+    old_pages, new_pages = old_content[1], new_content[1]
+    matcher = difflib.SequenceMatcher(
+        None,
+        [p.get('fingerprint') for p in old_pages],
+        [p.get('fingerprint') for p in new_pages],
+        autojunk=False
+    )
+    statuses = {'replace': 'changed', 'delete': 'removed', 'insert': 'added'}
+    pages = []
+    unchanged = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            unchanged += i2 - i1
+            continue
+        pages.append({
+            'status': statuses[tag],
+            'old_pages': [p['page'] for p in old_pages[i1:i2]],
+            'new_pages': [p['page'] for p in new_pages[j1:j2]]
+        })
+    old_changed = {page for change in pages for page in change['old_pages']}
+    new_changed = {page for change in pages for page in change['new_pages']}
+
+    # 参加条件・表は内容で比べる（ページがずれただけのものは差分にしない）
+    # 同じ内容が複数のページにある場合は、変わったページのものを差分として返す
+    old_conditions = extract_page_conditions(old_pages)
+    new_conditions = extract_page_conditions(new_pages)
+    old_counts = Counter(c['condition'] for c in old_conditions)
+    new_counts = Counter(c['condition'] for c in new_conditions)
+
+    old_tables = Counter(record.rows for record in old_content[2])
+    new_tables = Counter(record.rows for record in new_content[2])
+
+    return {
+        'pages': pages,
+        'unchanged_pages': unchanged,
+        'conditions': {
+            'added': _only_in(new_conditions, new_counts - old_counts,
+                              lambda c: c['condition'], lambda c: c['page'] in new_changed),
+            'removed': _only_in(old_conditions, old_counts - new_counts,
+                                lambda c: c['condition'], lambda c: c['page'] in old_changed),
+        },
+        'tables': {
+            'added': _only_in(new_content[2], new_tables - old_tables,
+                              lambda r: r.rows, lambda r: r.page in new_changed),
+            'removed': _only_in(old_content[2], old_tables - new_tables,
+                                lambda r: r.rows, lambda r: r.page in old_changed),
+        },
+    }
+
+
+def _only_in(items, remaining, key, preferred):
+    """remaining（Counter）に残った分だけ items から取り出す（preferred なものを先に、ページ順で返す）"""
+    remaining = Counter(remaining)
+    found = []
+    for item in sorted(items, key=lambda item: not preferred(item)):
+        if remaining[key(item)] > 0:
+            remaining[key(item)] -= 1
+            found.append(item)
+    return sorted(found, key=lambda item: item['page'] if isinstance(item, dict) else item.page)
+
+
+def _version_fingerprints(content):
+    """content のページの指紋（指紋のないページがあればNone）"""
+    fingerprints = [p.get('fingerprint') for p in content[1]]
+    if not fingerprints or not all(fingerprints):
+        return None
+    return fingerprints
+
+
+def record_version(store, doc_key, name, content, extract_tables=True, table_settings=None,
+                   single_pass=False):
+    """このドキュメントの版（ページの指紋の並び）を記録する（指紋がなければFalse）"""
+    fingerprints = _version_fingerprints(content)
+    if fingerprints is None:
+        return False
+    settings_key = page_settings_key(extract_tables, table_settings, single_pass)
+    store.put_version(doc_key, settings_key, name, fingerprints)
+    return True
+
+
+def diff_with_previous(store, doc_key, content, extract_tables=True, table_settings=None,
+                       single_pass=False):
+    """前の版が見つかれば差分を返す（ストアには書き込まない）
+
+    戻り値: (前の版, 差分)  前の版がない・前の版のページが残っていなければ (None, None)
+    """
+    fingerprints = _version_fingerprints(content)
+    if fingerprints is None:
+        return None, None
+    settings_key = page_settings_key(extract_tables, table_settings, single_pass)
+    previous = store.find_previous(settings_key, fingerprints, exclude=doc_key)
+    if previous is None:
+        return None, None
+    old_content = load_version_content(store, previous, settings_key)
+    if old_content is None:
+        return None, None
+    return previous, diff_contents(old_content, content)
+
+
+def compare_with_previous(store, doc_key, name, content, extract_tables=True,
+                          table_settings=None, single_pass=False):
+    """このドキュメントの版を記録し、前の版が見つかれば差分を返す
+
+    戻り値: (前の版, 差分)  前の版がない・前の版のページが残っていなければ (None, None)
+    content のページ情報に指紋（'fingerprint'）がなければ何もしません
+    """
+    if not record_version(store, doc_key, name, content, extract_tables, table_settings, single_pass):
+        return None, None
+    return diff_with_previous(store, doc_key, content, extract_tables, table_settings, single_pass)
@@ -0,0 +1,292 @@
+"""
+処理済みドキュメントの全文検索インデックス
+日本語は単語の区切りがないので、文字の2-gramごとにそれを含むページを記録します（SQLite）
+検索語の2-gramを全て含むページに絞り込んでから、ページの本文で一致を確かめて位置を返します
+"""
+
+import array
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from .config import DATA_DIR
+
+DEFAULT_INDEX_PATH = os.path.join(DATA_DIR, "search_index.sqlite3")
+
+
+def _build_normalize_table():
+    # 全角英数字・記号を半角に、英字を小文字にする（文字数は変わらないので位置は元のテキストと同じ）
+    table = {code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}
+    table[0x3000] = 0x20
+    for code in range(ord('A'), ord('Z') + 1):
+        table[code] = code + 0x20
+        table[code + 0xFEE0] = code + 0x20
+    return table
+
+
+_NORMALIZE_TABLE = _build_normalize_table()
+
+
+def normalize_text(text):
+    """検索用にテキストを正規化（全角英数字→半角、英字→小文字）"""
+    return text.translate(_NORMALIZE_TABLE)
+
+
+def text_ngrams(text):
+    """正規化済みのテキストの2-gram（空白・改行をまたぐものは除く）"""
+    grams = set()
+    for run in text.split():
+        grams.update(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+def page_search_text(page_data):
+    """ページの検索対象のテキスト（本文＋表）
+
+    検索結果の位置は、このテキストの中の位置です
+    """
+    return page_data['text'] + "".join(record.text for record in page_data['tables'])
+
+
+def _pages(payload):
+    pages = array.array('I')
+    pages.frombytes(payload)
+    return pages
+
+
+def _find_all(text, query):
+    positions = []
+    position = text.find(query)
+    while position != -1:
+        positions.append(position)
+        position = text.find(query, position + 1)
+    return positions
+
+
+class FullTextIndex:
+    """処理済みドキュメントのページ単位の全文検索インデックス
+
+    ドキュメントはファイルのハッシュ（doc_key）で区別し、同じドキュメントを追加すると置き換えます
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    doc_key TEXT NOT NULL UNIQUE,
+                    name TEXT,
+                    pages INTEGER NOT NULL,
+                    chars INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL
+                )
+            """)
+            # 2-gram → そのgramを含むページ番号の配列（ドキュメントごと）
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS postings (
+                    gram TEXT NOT NULL,
+                    doc_id INTEGER NOT NULL,
+                    pages BLOB NOT NULL,
+                    PRIMARY KEY (gram, doc_id)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings(doc_id)")
+            # 一致の確認と前後の表示に使うページの本文（圧縮）
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    doc_id INTEGER NOT NULL,
+                    page INTEGER NOT NULL,
+                    text BLOB NOT NULL,
+                    PRIMARY KEY (doc_id, page)
+                ) WITHOUT ROWID
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add_document(self, doc_key, name, page_contents):
+        """ドキュメントのページ情報（extract_all_content のページ情報）を登録"""
+        postings = {}
+        page_rows = []
+        chars = 0
+        for page_data in page_contents:
+            text = page_search_text(page_data)
+            # 読み込みに失敗したページ・空のページは登録しない
+            if not page_data['char_count'] or not text:
+                continue
+            page = page_data['page']
+            chars += len(text)
+            page_rows.append((page, sqlite3.Binary(zlib.compress(text.encode("utf-8")))))
+            for gram in text_ngrams(normalize_text(text)):
+                postings.setdefault(gram, array.array('I')).append(page)
+
+        with self._lock, self._connect() as conn:
+            self._delete(conn, doc_key)
+            doc_id = conn.execute(
+                "INSERT INTO documents (doc_key, name, pages, chars, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (doc_key, name, len(page_contents), chars, time.time())
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO pages (doc_id, page, text) VALUES (?, ?, ?)",
+                ((doc_id, page, text) for page, text in page_rows)
+            )
+            conn.executemany(
+                "INSERT INTO postings (gram, doc_id, pages) VALUES (?, ?, ?)",
+                ((gram, doc_id, sqlite3.Binary(pages.tobytes())) for gram, pages in postings.items())
+            )
+        return doc_id
+
+    def _delete(self, conn, doc_key):
+        row = conn.execute("SELECT doc_id FROM documents WHERE doc_key = ?", (doc_key,)).fetchone()
+        if row is None:
+            return False
+        conn.execute("DELETE FROM postings WHERE doc_id = ?", (row[0],))
+        conn.execute("DELETE FROM pages WHERE doc_id = ?", (row[0],))
+        conn.execute("DELETE FROM documents WHERE doc_id = ?", (row[0],))
+        return True
+
+    def remove_document(self, doc_key):
+        """ドキュメントを削除（なければFalse）"""
+        with self._lock, self._connect() as conn:
+            return self._delete(conn, doc_key)
+
+    def __contains__(self, doc_key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM documents WHERE doc_key = ?", (doc_key,)).fetchone()
+        return row is not None
+
+    def _gram_order(self, conn, grams):
+        """含むドキュメントの少ない順の2-gram（どれかが一度も出てこなければNone）"""
+        counts = dict(conn.execute(
+            f"SELECT gram, COUNT(*) FROM postings WHERE gram IN ({','.join('?' * len(grams))}) "
+            "GROUP BY gram",
+            list(grams)
+        ).fetchall())
+        if len(counts) < len(grams):
+            return None
+        return sorted(grams, key=counts.get)
+
+    def _candidate_batches(self, conn, grams, batch_size):
+        """全ての2-gramを含む {doc_id: ページ番号の集合} を、新しいドキュメントから順に少しずつ返す
+
+        一番少ないgramを含むドキュメントを batch_size 件ずつ読み、
+        残りのgramはその doc_id の範囲だけを読んで絞り込むので、
+        コーパスが大きくても読み出すのは結果に必要な分だけです
+        """
+        rarest, rest = grams[0], grams[1:]
+        last = None
+        while True:
+            if last is None:
+                rows = conn.execute(
+                    "SELECT doc_id, pages FROM postings WHERE gram = ? "
+                    "ORDER BY doc_id DESC LIMIT ?",
+                    (rarest, batch_size)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT doc_id, pages FROM postings WHERE gram = ? AND doc_id < ? "
+                    "ORDER BY doc_id DESC LIMIT ?",
+                    (rarest, last, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+
+            candidates = {doc_id: set(_pages(payload)) for doc_id, payload in rows}
+            for gram in rest:
+                found = {}
+                for doc_id, payload in conn.execute(
+                    "SELECT doc_id, pages FROM postings WHERE gram = ? AND doc_id BETWEEN ? AND ?",
+                    (gram, last, rows[0][0])
+                ):
+                    if doc_id in candidates:
+                        pages = candidates[doc_id].intersection(_pages(payload))
+                        if pages:
+                            found[doc_id] = pages
+                candidates = found
+                if not candidates:
+                    break
+            yield candidates
+
+    def search(self, query, limit=50, context=30, batch_size=200):
+        """検索語を含むページを新しく登録したドキュメントから順に返す
+
+        結果は {'doc_key', 'name', 'page', 'positions', 'snippet'} のリストで、
+        positions はページの検索対象のテキスト（page_search_text）の中の一致位置です
+        検索語は2文字以上（空白を除く）が必要です
+        """
+        needle = normalize_text(query.strip())
+        grams = text_ngrams(needle)
+        if not grams:
+            return []
+
+        hits = []
+        with self._connect() as conn:
+            grams = self._gram_order(conn, grams)
+            if grams is None:
+                return []
+            for candidates in self._candidate_batches(conn, grams, batch_size):
+                for doc_id in sorted(candidates, reverse=True):
+                    pages = sorted(candidates[doc_id])
+                    doc_key, name = conn.execute(
+                        "SELECT doc_key, name FROM documents WHERE doc_id = ?", (doc_id,)
+                    ).fetchone()
+                    rows = conn.execute(
+                        f"SELECT page, text FROM pages WHERE doc_id = ? "
+                        f"AND page IN ({','.join('?' * len(pages))}) ORDER BY page",
+                        [doc_id] + pages
+                    ).fetchall()
+                    for page, payload in rows:
+                        text = zlib.decompress(payload).decode("utf-8")
+                        # 2-gramが全てあっても、並びが検索語と同じとは限らない
+                        positions = _find_all(normalize_text(text), needle)
+                        if not positions:
+                            continue
+                        first = positions[0]
+                        snippet = text[max(0, first - context):first + len(needle) + context]
+                        hits.append({
+                            'doc_key': doc_key,
+                            'name': name,
+                            'page': page,
+                            'positions': positions,
+                            'snippet': snippet.replace('\n', ' ')
+                        })
+                        if len(hits) >= limit:
+                            return hits
+        return hits
+
+    def documents(self, limit=100):
+        """登録済みのドキュメント（新しい順）"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                "SELECT doc_key, name, pages, chars, indexed_at FROM documents "
+                "ORDER BY doc_id DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        """登録済みのドキュメント数・ページ数"""
+        with self._connect() as conn:
+            documents = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            pages = conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return {'documents': documents, 'pages': pages}
@@ -0,0 +1,125 @@
+"""
+参加条件セクションの検索
+"""
+
+from .keywords import KeywordAutomaton
+
+# 参加条件のキーワード
+PARTICIPATION_KEYWORDS = ["参加資格", "入札参加資格", "応募資格", "資格要件", "参加条件", "入札参加要件"]
+
+
+def find_keyword_lines(text, automaton):
+    """キーワードを含む行を検出し、行ごとにまとめて返す
+
+    重なったキーワード（「入札参加資格」と「参加資格」など）は1つにまとめ、
+    同じ行の複数ヒットも1件として数えます
+    """
+    hits = []
+    line_number = 1
+    scanned = 0
+    
+    for start, end, keyword in automaton.find_all(text):
+        line_number += text.count('\n', scanned, start)
+        scanned = start
+        
+        if hits and hits[-1]['line_number'] == line_number:
+            if keyword not in hits[-1]['keywords']:
+                hits[-1]['keywords'].append(keyword)
+            continue
+        
+        line_end = text.find('\n', end)
+        hits.append({
+            'keyword': keyword,
+            'keywords': [keyword],
+            'line_number': line_number,
+            'line_start': text.rfind('\n', 0, start) + 1,
+            'line_end': len(text) if line_end == -1 else line_end
+        })
+    
+    return hits
+
+
+def _back_lines(text, line_start, count):
+    """line_start の行から count 行さかのぼった行の先頭位置"""
+    for _ in range(count):
+        if line_start == 0:
+            break
+        line_start = text.rfind('\n', 0, line_start - 1) + 1
+    return line_start
+
+
+def _forward_lines(text, line_start, count):
+    """line_start の行から count 行分の末尾位置（最後の改行は含まない）"""
+    end = line_start - 1
+    for _ in range(count):
+        newline = text.find('\n', end + 1)
+        if newline == -1:
+            return len(text)
+        end = newline
+    return end
+
+
+class SectionSpan:
+    """参加条件のセクション（行範囲と文字位置）
+
+    テキストは表示するときに text() で切り出すので、
+    ヒット数が多くても文字列のコピーは作られません
+    """
+
+    __slots__ = ('start_line', 'end_line', 'start', 'end', 'hits')
+
+    def __init__(self, start_line, end_line, start, end, hit):
+        # start_line/end_line は0始まりの半開区間、start/end は全文中の文字位置
+        self.start_line = start_line
+        self.end_line = end_line
+        self.start = start
+        self.end = end
+        self.hits = [hit]
+
+    @property
+    def keyword(self):
+        return self.hits[0]['keyword']
+
+    @property
+    def keywords(self):
+        """セクション内で見つかったキーワード（重複なし）"""
+        return list(dict.fromkeys(k for hit in self.hits for k in hit['keywords']))
+
+    @property
+    def line_number(self):
+        """最初のヒットの行番号（1始まり）"""
+        return self.hits[0]['line_number']
+
+    def text(self, full_text):
+        """セクションのテキストを切り出す"""
+        return full_text[self.start:self.end]
+
+    def merge(self, other):
+        """重なった（または隣接する）セクションを結合"""
+        self.end_line = max(self.end_line, other.end_line)
+        self.end = max(self.end, other.end)
+        self.hits.extend(other.hits)
+
+
+def find_sections(full_text, automaton, before=3, after=15):
+    """キーワードを含む行の前後を参加条件のセクションとして抽出
+
+    重なったり隣接したりする範囲は1つのセクションにまとめます
+    """
+    sections = []
+    
+    for hit in find_keyword_lines(full_text, automaton):
+        i = hit['line_number'] - 1
+        span = SectionSpan(
+            max(0, i - before),
+            i + after,
+            _back_lines(full_text, hit['line_start'], before),
+            _forward_lines(full_text, hit['line_start'], after),
+            hit
+        )
+        if sections and span.start_line <= sections[-1].end_line:
+            sections[-1].merge(span)
+        else:
+            sections.append(span)
+    
+    return sections
@@ -0,0 +1,247 @@
+"""
+参加条件の類似検索とグループ分け
+参加条件を文字の2-gram・3-gramのTF-IDFベクトルにし、NumPyの配列（疎行列）で持ちます
+似た参加条件の検索は、検索語のgramを含む参加条件だけを足し合わせるので数ミリ秒で終わります
+"""
+
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+from .search_index import normalize_text
+
+# 参加条件の先頭の番号・記号（「（1）」「1.」「①」「ア」「・」など）
+LIST_MARKER_RE = re.compile(
+    r'^(?:[（\(]\s*[\dア-ン]+\s*[）\)]|\d+\s*[\.．、\s]|[①-⑳]|[ア-ン]\s*[\.．、\s]|[・●○■□\-])\s*'
+)
+# 使う文字のn-gramの長さ
+NGRAM_SIZES = (2, 3)
+# grouped() の既定の類似度（コサイン類似度）
+DEFAULT_GROUP_THRESHOLD = 0.8
+
+
+def condition_key(text):
+    """比較用の参加条件（番号・空白を除き、全角英数字を半角にしたもの）"""
+    text = normalize_text(text).strip()
+    text = LIST_MARKER_RE.sub("", text)
+    return "".join(text.split())
+
+
+def condition_ngrams(key):
+    """比較用の参加条件の文字n-gramの出現回数"""
+    grams = Counter()
+    for size in NGRAM_SIZES:
+        grams.update(key[i:i + size] for i in range(len(key) - size + 1))
+    # 1文字だけの参加条件
+    if not grams and key:
+        grams[key] += 1
+    return grams
+
+
+def _gather(indptr, rows):
+    """CSR形式の行（rows）の要素の位置と、各要素がどの行（rows の添字）のものか"""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    owners = np.repeat(np.arange(len(rows)), lengths)
+    # 各行の先頭からの連番に行の開始位置を足す
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return starts[owners] + offsets, owners
+
+
+def _components(n, left, right):
+    """辺 (left[i], right[i]) でつながった頂点に同じラベル（その中で一番小さい番号）をつける"""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        np.minimum.at(updated, left, low)
+        np.minimum.at(updated, right, low)
+        # ラベルの指す先のラベルをたどる（つながりが長くても数回で収束する）
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+class ConditionIndex:
+    """参加条件の類似検索
+
+    conditions は参加条件の文字列か、'condition' を含む辞書（ProjectRegistry.all_conditions など）のリストです
+    番号・空白を除いて同じになる参加条件は1つにまとめてベクトルにします
+    """
+
+    def __init__(self, conditions):
+        self.conditions = list(conditions)
+
+        # 比較用の参加条件（重複なし）と、各参加条件がどれにあたるか
+        key_ids = {}
+        owners = []
+        for item in self.conditions:
+            key = condition_key(item['condition'] if isinstance(item, dict) else item)
+            owners.append(key_ids.setdefault(key, len(key_ids)))
+        self.keys = list(key_ids)
+        self._owners = np.array(owners, dtype=np.int64)
+        self._members = None
+
+        # 比較用の参加条件 × gram のTF-IDF（CSR形式）
+        self._vocabulary = {}
+        rows, cols, counts = [], [], []
+        for row, key in enumerate(self.keys):
+            for gram, count in condition_ngrams(key).items():
+                rows.append(row)
+                cols.append(self._vocabulary.setdefault(gram, len(self._vocabulary)))
+                counts.append(count)
+        rows = np.array(rows, dtype=np.int64)
+        cols = np.array(cols, dtype=np.int64)
+        counts = np.array(counts, dtype=np.float64)
+
+        self._df = np.bincount(cols, minlength=len(self._vocabulary))
+        self._idf = np.log((1 + len(self.keys)) / (1 + self._df)) + 1
+        weights = (1 + np.log(counts)) * self._idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(self.keys)))
+        weights /= norms[rows]
+
+        self._indptr = np.zeros(len(self.keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(self.keys)), out=self._indptr[1:])
+        self._indices = cols
+        self._weights = weights
+
+        # gram → それを含む参加条件（CSC形式。検索で使う）
+        order = np.argsort(cols, kind='stable')
+        self._posting_ptr = np.zeros(len(self._vocabulary) + 1, dtype=np.int64)
+        np.cumsum(self._df, out=self._posting_ptr[1:])
+        self._posting_rows = rows[order]
+        self._posting_weights = weights[order]
+
+    def __len__(self):
+        return len(self.conditions)
+
+    def members(self, key_id):
+        """比較用の参加条件 key_id にあたる元の参加条件の位置"""
+        if self._members is None:
+            order = np.argsort(self._owners, kind='stable')
+            bounds = np.searchsorted(self._owners[order], np.arange(len(self.keys) + 1))
+            self._members = (order, bounds)
+        order, bounds = self._members
+        return order[bounds[key_id]:bounds[key_id + 1]].tolist()
+
+    def _query_vector(self, text):
+        """検索語のベクトル（索引にあるgramの番号と重み。重みは索引にないgramも含めて正規化）"""
+        grams = condition_ngrams(condition_key(text))
+        ids, weights = [], []
+        norm = 0.0
+        for gram, count in grams.items():
+            col = self._vocabulary.get(gram)
+            # 索引にないgramは一番珍しいgramとみなす
+            idf = self._idf[col] if col is not None else math.log(1 + len(self.keys)) + 1
+            weight = (1 + math.log(count)) * idf
+            norm += weight ** 2
+            if col is not None:
+                ids.append(col)
+                weights.append(weight)
+        if not ids:
+            return np.array(ids, dtype=np.int64), np.array(weights)
+        return np.array(ids, dtype=np.int64), np.array(weights) / math.sqrt(norm)
+
+    def similar(self, text, k=10, min_score=0.3):
+        """text に似た参加条件を類似度の高い順に返す
+
+        結果は {'score', 'text', 'count', 'members'} のリストで、
+        text は代表の参加条件（最初に出てきたもの）、members は元の参加条件の位置です
+        """
+        ids, weights = self._query_vector(text)
+        if not len(ids):
+            return []
+
+        positions, owners = _gather(self._posting_ptr, ids)
+        scores = np.bincount(
+            self._posting_rows[positions],
+            weights=self._posting_weights[positions] * weights[owners],
+            minlength=len(self.keys)
+        )
+        candidates = np.flatnonzero(scores >= min_score)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [self._result(key_id, float(scores[key_id])) for key_id in candidates]
+
+    def _result(self, key_id, score=None):
+        members = self.members(key_id)
+        item = self.conditions[members[0]]
+        text = item['condition'] if isinstance(item, dict) else item
+        return {
+            'score': score,
+            'text': LIST_MARKER_RE.sub("", text.strip()),
+            'count': len(members),
+            'members': members
+        }
+
+    def _similar_pairs(self, threshold):
+        """類似度が threshold 以上の比較用の参加条件の組（i < j の配列 (i, j)）
+
+        各参加条件のgramを珍しい順に並べ、残りのgramの重みの大きさが threshold 未満になるまでの
+        gram（先頭部分）を1つも共有しない組は類似度が threshold 未満なので、
+        先頭部分のgramを含むものだけを候補にして類似度を計算します
+        """
+        query = np.zeros(len(self._vocabulary))
+        left, right = [], []
+        for row in range(len(self.keys)):
+            start, end = self._indptr[row], self._indptr[row + 1]
+            cols = self._indices[start:end]
+            weights = self._weights[start:end]
+            order = np.argsort(self._df[cols], kind='stable')
+            # 後ろから累積した重みの2乗和（その位置以降のgramだけで得られる類似度の上限の2乗）
+            suffix = np.cumsum((weights[order] ** 2)[::-1])[::-1]
+            prefix = cols[order[suffix >= threshold ** 2 - 1e-12]]
+
+            positions, _ = _gather(self._posting_ptr, prefix)
+            candidates = np.unique(self._posting_rows[positions])
+            candidates = candidates[candidates > row]
+            if not len(candidates):
+                continue
+
+            query[cols] = weights
+            positions, owners = _gather(self._indptr, candidates)
+            scores = np.bincount(
+                owners,
+                weights=self._weights[positions] * query[self._indices[positions]],
+                minlength=len(candidates)
+            )
+            query[cols] = 0
+            matched = candidates[scores >= threshold - 1e-9]
+            left.append(np.full(len(matched), row, dtype=np.int64))
+            right.append(matched)
+        if not left:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(left), np.concatenate(right)
+
+    def grouped(self, threshold=DEFAULT_GROUP_THRESHOLD, min_count=2):
+        """ほぼ同じ参加条件（類似度 threshold 以上でつながるもの）のグループを件数の多い順に返す
+
+        結果は {'text', 'count', 'variants', 'members'} のリストで、
+        text は一番多く出てくる言い回し、variants は言い回しの数、members は元の参加条件の位置です
+        """
+        labels = _components(len(self.keys), *self._similar_pairs(threshold))
+        key_counts = np.bincount(self._owners, minlength=len(self.keys))
+        groups = {}
+        for key_id, label in enumerate(labels.tolist()):
+            groups.setdefault(label, []).append(key_id)
+
+        results = []
+        for key_ids in groups.values():
+            count = int(key_counts[key_ids].sum())
+            if count < min_count:
+                continue
+            representative = max(key_ids, key=lambda key_id: key_counts[key_id])
+            members = sorted(m for key_id in key_ids for m in self.members(key_id))
+            result = self._result(representative)
+            results.append({
+                'text': result['text'],
+                'count': count,
+                'variants': len(key_ids),
+                'members': members
+            })
+        results.sort(key=lambda group: -group['count'])
+        return results
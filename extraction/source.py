@@ -0,0 +1,166 @@
+"""
+PDFの入力
+アップロードはディスクに書き出してからメモリマップで開き、
+処理の済んだページはキャッシュを解放して、ドキュメントが大きくてもメモリが増えないようにします
+"""
+
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import pdfplumber
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import resolve1
+from pdfplumber.page import Page
+
+from .config import DATA_DIR
+
+DEFAULT_SPOOL_DIR = os.path.join(DATA_DIR, "uploads")
+DEFAULT_SPOOL_MAX_AGE = 24 * 60 * 60
+
+
+@contextmanager
+def open_pdf(source):
+    """PDFを開く（パスならメモリマップで開き、ファイル全体を読み込まない）"""
+    if not isinstance(source, (str, os.PathLike)):
+        with pdfplumber.open(source) as pdf:
+            yield pdf
+        return
+
+    with open(source, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空のファイルはマップできないので、そのまま開いてエラーにさせる
+            mapped = None
+        if mapped is None:
+            with pdfplumber.open(f) as pdf:
+                yield pdf
+            return
+        try:
+            with pdfplumber.open(mapped) as pdf:
+                yield pdf
+        finally:
+            mapped.close()
+
+
+def page_count(pdf, low_memory=False):
+    """総ページ数
+
+    low_memory の場合はページ一覧を作らず、ページツリーの /Count から数えます
+    """
+    if low_memory:
+        try:
+            return int(resolve1(resolve1(pdf.doc.catalog['Pages'])['Count']))
+        except Exception:
+            # /Count が読めない壊れたPDFは一覧を作って数える
+            pass
+    return len(pdf.pages)
+
+
+def _iter_page_objects(pdf):
+    """ページ一覧（pdf.pages）を作らずに、ページを1つずつ作って返す"""
+    doctop = 0
+    for number, page_obj in enumerate(PDFPage.create_pages(pdf.doc), start=1):
+        page = Page(pdf, page_obj, page_number=number, initial_doctop=doctop)
+        doctop += page.height
+        yield page
+
+
+def iter_pages(pdf, start=0, end=None, low_memory=False):
+    """ページを順に返し、使い終わったページのキャッシュ（文字・罫線など）を解放する
+
+    low_memory の場合は、ページ一覧を保持せず、pdfminerが解析済みのオブジェクト
+    （ページの内容ストリームなど）もページごとに捨てるので、
+    ページ数が増えてもメモリ使用量は一定になります（フォントなどの再解析で少し遅くなります）
+    """
+    if not low_memory:
+        for page in pdf.pages[start:end]:
+            try:
+                yield page
+            finally:
+                page.close()
+        return
+
+    cached_objs = getattr(pdf.doc, '_cached_objs', None)
+    for page in _iter_page_objects(pdf):
+        index = page.page_number - 1
+        if index < start:
+            continue
+        if end is not None and index >= end:
+            break
+        try:
+            yield page
+        finally:
+            page.close()
+            if cached_objs is not None:
+                cached_objs.clear()
+
+
+class UploadSpool:
+    """アップロードされたPDFをディスクに書き出して管理する
+
+    ファイル名は内容のハッシュなので、複数のセッションが同じPDFをアップロードしても1つだけ保存されます
+    古いファイルは書き出しのたびに削除します
+    """
+
+    def __init__(self, directory=DEFAULT_SPOOL_DIR, max_age=DEFAULT_SPOOL_MAX_AGE):
+        self.directory = directory
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._spooled = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def spool(self, fileobj, key=None, chunk_size=1024 * 1024):
+        """ファイルを書き出して (パス, ハッシュ) を返す
+
+        key（アップロードのIDなど）を指定すると、同じkeyは2回目以降書き出しません
+        """
+        with self._lock:
+            spooled = self._spooled.get(key) if key is not None else None
+        if spooled and os.path.exists(spooled[0]):
+            os.utime(spooled[0])
+            return spooled
+
+        self.prune()
+
+        # ハッシュを計算しながら少しずつ書き出す
+        if hasattr(fileobj, 'seek'):
+            fileobj.seek(0)
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".part", delete=False) as f:
+            temp_path = f.name
+            for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+                digest.update(chunk)
+                f.write(chunk)
+
+        file_hash = digest.hexdigest()
+        path = os.path.join(self.directory, f"{file_hash}.pdf")
+        os.replace(temp_path, path)
+
+        spooled = (path, file_hash)
+        if key is not None:
+            with self._lock:
+                self._spooled[key] = spooled
+        return spooled
+
+    def prune(self):
+        """max_age より古いファイルを削除"""
+        cutoff = time.time() - self.max_age
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                # 他のプロセスが先に削除した
+                pass
+        with self._lock:
+            self._spooled = {
+                key: spooled for key, spooled in self._spooled.items()
+                if os.path.exists(spooled[0])
+            }
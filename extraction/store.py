@@ -0,0 +1,121 @@
+"""
+抽出結果の永続ストア
+SQLiteに抽出結果を圧縮して保存し、サーバー再起動後も再利用します
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from .config import DATA_DIR, EXTRACTOR_VERSION
+
+DEFAULT_STORE_PATH = os.path.join(DATA_DIR, "extractions.sqlite3")
+DEFAULT_MAX_BYTES = int(os.environ.get("EXTRACTION_STORE_MAX_MB", "512")) * 1024 * 1024
+
+
+class ExtractionStore:
+    """ドキュメントハッシュと抽出バージョンをキーにしたディスクストア"""
+
+    def __init__(self, path=DEFAULT_STORE_PATH, max_bytes=DEFAULT_MAX_BYTES,
+                 version=EXTRACTOR_VERSION):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.version = version
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extractions (
+                    cache_key TEXT PRIMARY KEY,
+                    version TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_extractions_last_access "
+                "ON extractions(last_access)"
+            )
+            # 抽出ロジックが変わった古い結果は破棄
+            conn.execute("DELETE FROM extractions WHERE version != ?", (self.version,))
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """保存済みの結果を取得（なければNone）"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload FROM extractions WHERE cache_key = ? AND version = ?",
+                (key, self.version)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE extractions SET last_access = ? WHERE cache_key = ?",
+                (time.time(), key)
+            )
+        try:
+            return pickle.loads(zlib.decompress(row[0]))
+        except Exception:
+            # 壊れたデータは削除して再抽出させる
+            self.delete(key)
+            return None
+
+    def put(self, key, value):
+        """結果を保存し、容量上限を超えたら古いものから削除"""
+        payload = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if len(payload) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO extractions "
+                "(cache_key, version, payload, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, self.version, sqlite3.Binary(payload), len(payload), now, now)
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute(
+            "SELECT cache_key, size FROM extractions ORDER BY last_access ASC"
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM extractions WHERE cache_key = ?", (key,))
+            total -= size
+
+    def delete(self, key):
+        """結果を削除"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM extractions WHERE cache_key = ?", (key,))
+
+    def stats(self):
+        """保存件数と合計サイズ"""
+        with self._connect() as conn:
+            count, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions"
+            ).fetchone()
+        return {'entries': count, 'bytes': size}
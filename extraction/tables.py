@@ -0,0 +1,73 @@
+"""
+抽出した表のデータ
+セルは文字列のタプルのまま持ち、DataFrameは表示・保存するときに作ります
+"""
+
+import io
+import zipfile
+
+from .pages import format_table
+
+
+def table_to_dataframe(table):
+    """表データをDataFrameに変換"""
+    import pandas as pd
+    
+    if len(table) > 1 and len(table[0]) > 0:
+        # ヘッダーありの場合
+        return pd.DataFrame(list(table[1:]), columns=list(table[0]))
+    # ヘッダーなしの場合
+    return pd.DataFrame(list(table))
+
+
+class TableRecord:
+    """1つの表（ページ情報と表一覧で同じものを共有）
+
+    表が数千個あってもDataFrameは作らないので、
+    表一覧を開かなければpandasの処理は発生しません
+    """
+
+    __slots__ = ('page', 'index', 'rows')
+
+    def __init__(self, page, index, rows):
+        self.page = page
+        self.index = index
+        self.rows = tuple(tuple(row) for row in rows)
+
+    @property
+    def table_index(self):
+        return self.index
+
+    @property
+    def shape(self):
+        """(行数, 列数)"""
+        return len(self.rows), max((len(row) for row in self.rows), default=0)
+
+    @property
+    def text(self):
+        """全文に埋め込む表のテキスト"""
+        return f"\n[表{self.index}]\n" + format_table(self.rows)
+
+    def to_dataframe(self):
+        """DataFrameを作って返す（保持はしない）"""
+        return table_to_dataframe(self.rows)
+
+    @property
+    def file_name(self):
+        return f"表_P{self.page}_T{self.index}.csv"
+
+    def to_csv(self):
+        """CSV（Excelで開けるようBOM付き）のバイト列を返す"""
+        return self.to_dataframe().to_csv(index=False).encode('utf-8-sig')
+
+
+def write_tables_zip(records, fileobj):
+    """表を1つずつCSVにしてZIPに書き込む
+
+    作成中に持つDataFrameとCSVは1表分だけです（ZIP全体は fileobj に書き込まれます）
+    """
+    with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for record in records:
+            with io.TextIOWrapper(zf.open(record.file_name, 'w'), encoding='utf-8-sig', newline='') as f:
+                record.to_dataframe().to_csv(f, index=False)
+    return fileobj
@@ -0,0 +1,96 @@
+"""
+テキストのみの抽出処理
+テキストが取れないページは表として読み取り、それもなければ空ページとして記録します
+"""
+
+from .progress import NULL_REPORTER, run_reported
+from .source import iter_pages, open_pdf
+
+
+def extract_page_text(page):
+    """1ページ分のテキストを抽出（テキストがなければ表から読み取る）"""
+    result = {
+        'page': page.page_number,
+        'text': "",
+        'kind': "text",
+        'error': None
+    }
+    
+    try:
+        page_text = page.extract_text()
+        if page_text:
+            result['text'] = page_text
+            return result
+        
+        # 文字がなければ表も空なので、表の検出はしない
+        if not page.chars:
+            result['kind'] = "empty"
+            return result
+        
+        # テキストが抽出できない場合の代替手段
+        # テーブルとして抽出を試みる
+        tables = page.extract_tables()
+        if tables:
+            result['text'] = "\n".join([
+                "\n".join([str(cell) if cell else "" for cell in row])
+                for table in tables for row in table
+            ])
+            result['kind'] = "table"
+        else:
+            result['kind'] = "empty"
+    except Exception as e:
+        result['kind'] = "error"
+        result['error'] = str(e)
+    
+    return result
+
+
+def iter_text_pages(pdf_file):
+    """ページごとのテキスト抽出結果を順に返すジェネレーター"""
+    with open_pdf(pdf_file) as pdf:
+        total = len(pdf.pages)
+        for page in iter_pages(pdf):
+            result = extract_page_text(page)
+            result['total_pages'] = total
+            yield result
+
+
+class TextBuilder:
+    """ページごとのテキスト抽出結果から 全文・ページ情報 を組み立てる"""
+
+    def __init__(self, reporter=None):
+        self.reporter = reporter or NULL_REPORTER
+        self.all_text = []
+        self.page_texts = []
+
+    def add(self, result):
+        """1ページ分の結果を追加し、そのページの情報を返す"""
+        i = result['page']
+        kind = result['kind']
+        
+        if kind == "error":
+            self.reporter.warning(f"ページ {i} の処理中にエラー: {result['error']}")
+            page_info = {'page': i, 'text': f"エラー: {result['error']}", 'char_count': 0}
+        elif kind == "empty":
+            self.all_text.append(f"\n--- ページ {i} (テキストなし) ---\n")
+            page_info = {'page': i, 'text': "（テキストを抽出できませんでした）", 'char_count': 0}
+        else:
+            label = " (表形式)" if kind == "table" else ""
+            self.all_text.append(f"\n--- ページ {i}{label} ---\n")
+            self.all_text.append(result['text'])
+            page_info = {'page': i, 'text': result['text'], 'char_count': len(result['text'])}
+        
+        self.page_texts.append(page_info)
+        return page_info
+
+    def build(self):
+        """(全文, ページ情報) を返す"""
+        return "\n".join(self.all_text), self.page_texts
+
+
+def extract_text_from_pdf(pdf_file, reporter=None):
+    """PDFから全テキストを確実に抽出
+
+    進捗・ページごとの途中結果・警告は reporter（ExtractionReporter）に通知します
+    """
+    return run_reported(iter_text_pages(pdf_file), TextBuilder(reporter), reporter)
@@ -0,0 +1,102 @@
+"""
+全文のページ送り表示と検索
+全文をページ単位の表示範囲に分け、画面には表示中の範囲だけを送ります
+検索はサーバー側で行い、一致した範囲とその前後だけを返します
+"""
+
+import bisect
+import re
+
+# ContentBuilder が全文に入れるページの区切り（"--- ページ 3 ---" / "--- ページ 3 (表のみ) ---" など）
+PAGE_MARKER_RE = re.compile(r'^--- ページ (\d+)(?: \([^)\n]*\))? ---$', re.MULTILINE)
+
+# 1つの表示範囲の最大文字数
+DEFAULT_WINDOW_CHARS = 5000
+
+
+class TextPager:
+    """全文を表示範囲（PDFのページ単位、長いページはさらに行の区切りで分割）に分ける
+
+    範囲は全文中の位置だけを持ち、表示するときに window() で切り出します
+    """
+
+    def __init__(self, full_text, max_chars=DEFAULT_WINDOW_CHARS):
+        self.text = full_text
+        self.max_chars = max_chars
+        # 各範囲の (開始位置, 終了位置, PDFのページ番号)
+        self.windows = []
+
+        markers = list(PAGE_MARKER_RE.finditer(full_text))
+        if not markers:
+            self._split(0, len(full_text), None)
+        for i, marker in enumerate(markers):
+            # 最初の区切りより前（先頭の改行）は1ページ目に含める
+            start = marker.start() if i else 0
+            end = markers[i + 1].start() if i + 1 < len(markers) else len(full_text)
+            self._split(start, end, int(marker.group(1)))
+
+        self._starts = [start for start, _, _ in self.windows]
+
+    def _split(self, start, end, page):
+        """max_chars を超える範囲は、なるべく改行の位置で分割する"""
+        while end - start > self.max_chars:
+            cut = self.text.rfind('\n', start + self.max_chars // 2, start + self.max_chars)
+            cut = cut + 1 if cut != -1 else start + self.max_chars
+            self.windows.append((start, cut, page))
+            start = cut
+        if end > start or not self.windows:
+            self.windows.append((start, end, page))
+
+    def __len__(self):
+        return len(self.windows)
+
+    def window(self, index):
+        """表示範囲の情報とテキスト"""
+        start, end, page = self.windows[index]
+        return {
+            'index': index,
+            'page': page,
+            'start': start,
+            'end': end,
+            'text': self.text[start:end]
+        }
+
+    def window_at(self, position):
+        """全文中の位置を含む表示範囲の番号"""
+        return max(0, bisect.bisect_right(self._starts, position) - 1)
+
+    def window_of_page(self, page):
+        """PDFのページの最初の表示範囲の番号（なければNone）"""
+        for index, (_, _, window_page) in enumerate(self.windows):
+            if window_page == page:
+                return index
+        return None
+
+    def search(self, query, max_results=200, context=20):
+        """全文を検索し、一致した表示範囲ごとに件数と最初の一致の前後を返す
+
+        戻り値: (一致の総数, 範囲ごとの結果のリスト)  結果は max_results 件まで
+        """
+        if not query:
+            return 0, []
+
+        text = self.text
+        results = []
+        total = 0
+        position = text.find(query)
+        while position != -1:
+            total += 1
+            index = self.window_at(position)
+            if results and results[-1]['window'] == index:
+                results[-1]['count'] += 1
+            elif len(results) < max_results:
+                snippet = text[max(0, position - context):position + len(query) + context]
+                results.append({
+                    'window': index,
+                    'page': self.windows[index][2],
+                    'position': position,
+                    'count': 1,
+                    'snippet': snippet.replace('\n', ' ')
+                })
+            position = text.find(query, position + len(query))
+        return total, results
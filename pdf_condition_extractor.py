@@ -1,9 +1,9 @@
 import streamlit as st
-import pdfplumber
-import re
 import pandas as pd
 from io import StringIO
 
+from extraction import ConditionScanner, UploadSpool, iter_page_results
+
 st.set_page_config(
     page_title="入札参加条件抽出システム",
     page_icon="📄",
@@ -23,6 +23,11 @@ with st.sidebar:
         "4. 結果をダウンロード"
     )
 
+# アップロードの書き出し先（セッションをまたいで共有）
+@st.cache_resource
+def get_upload_spool():
+    return UploadSpool()
+
 # メインエリア
 col1, col2 = st.columns([1, 1])
 
@@ -34,72 +39,40 @@ with col1:
         help="入札説明書、仕様書などのPDFファイル"
     )
 
-# 参加条件を抽出する関数
-def extract_conditions(text):
-    """テキストから参加条件を抽出"""
-    conditions = []
-    
-    # 参加条件のキーワードパターン
-    patterns = [
-        # 資格関連
-        r'.*(?:資格|免許|許可|認定|登録).*(?:を有する|している|保有|取得)',
-        # 実績関連
-        r'.*(?:実績|経験|履行|完了).*(?:があること|を有する|以上)',
-        # 財務関連
-        r'.*(?:資本金|売上高|純資産).*(?:以上|を超える)',
-        # 人員関連
-        r'.*(?:技術者|従業員|職員|スタッフ).*(?:配置|常駐|以上)',
-        # 地域要件
-        r'.*(?:本店|支店|営業所|事業所).*(?:を有する|設置|所在)',
-        # ISO等
-        r'.*(?:ISO|JIS|認証).*(?:取得|認定)',
-        # その他の条件
-        r'.*(?:であること|とする|必要がある|条件とする).*'
-    ]
-    
-    lines = text.split('\n')
-    
-    # 参加資格のセクションを探す
-    in_condition_section = False
-    section_keywords = ['参加資格', '入札参加資格', '応募資格', '資格要件', '参加条件']
-    
-    for i, line in enumerate(lines):
-        # セクションの開始を検出
-        if any(keyword in line for keyword in section_keywords):
-            in_condition_section = True
-            continue
-            
-        # セクションの終了を検出
-        if in_condition_section and re.match(r'^\d+[\.\s]|^第\d+|^（\d+）', line):
-            if not any(keyword in line for keyword in ['資格', '条件', '要件']):
-                in_condition_section = False
-        
-        # 条件の抽出
-        if in_condition_section or any(re.match(pattern, line.strip()) for pattern in patterns):
-            line_clean = line.strip()
-            if len(line_clean) > 10 and len(line_clean) < 200:  # 適切な長さ
-                # 条件番号を付与
-                if re.match(r'^[（\(]\d+[）\)]', line_clean):
-                    conditions.append(line_clean)
-                elif re.match(r'^\d+[\.\s]', line_clean):
-                    conditions.append(line_clean)
-                elif line_clean and not line_clean.endswith('。'):
-                    # 番号がない場合は追加
-                    conditions.append(f"・ {line_clean}")
-    
-    return conditions
-
 # PDFが アップロードされた場合
 if uploaded_file is not None:
     with st.spinner('PDFを処理中...'):
         try:
-            # PDFからテキストを抽出
-            pdf_text = ""
-            with pdfplumber.open(uploaded_file) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        pdf_text += page_text + "\n"
+            # PDFからテキストを抽出（ページごとに参加条件を検出して逐次表示）
+            page_texts = []
+            scanner = ConditionScanner()
+            progress_bar = st.progress(0)
+            live_area = st.empty()
+            
+            # アップロードはディスクに書き出してメモリマップで読む
+            pdf_path, _ = get_upload_spool().spool(
+                uploaded_file, key=getattr(uploaded_file, 'file_id', None)
+            )
+            for result in iter_page_results(pdf_path, extract_tables=False):
+                if result['error'] is not None:
+                    st.warning(f"ページ {result['page']} の処理中にエラー: {result['error']}")
+                page_text = result['text']
+                if page_text:
+                    page_texts.append(page_text + "\n")
+                    scanner.feed(page_text)
+                
+                progress_bar.progress(result['page'] / result['total_pages'])
+                with live_area.container():
+                    st.caption(
+                        f"📄 {result['page']}/{result['total_pages']} ページ処理済み"
+                        f" - 参加条件 {len(scanner.conditions)} 件"
+                    )
+                    for condition in scanner.conditions[-5:]:
+                        st.text(condition)
+            
+            progress_bar.empty()
+            live_area.empty()
+            pdf_text = "".join(page_texts)
             
             # 結果表示
             with col2:
@@ -119,11 +92,14 @@ if uploaded_file is not None:
             st.markdown("---")
             st.subheader("🔍 抽出された参加条件")
             
-            conditions = extract_conditions(pdf_text)
+            conditions = scanner.conditions
             
             if conditions:
                 # 条件を表示
-                condition_df = pd.DataFrame(conditions, columns=['参加条件'])
+                condition_df = pd.DataFrame({
+                    '参加条件': conditions,
+                    '分類': scanner.categories
+                })
                 condition_df.index = condition_df.index + 1
                 condition_df.index.name = 'No.'
                 
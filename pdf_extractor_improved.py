@@ -1,7 +1,13 @@
 import streamlit as st
-import pdfplumber
 import pandas as pd
-import io
+
+from extraction import (
+    ExtractionCache, ExtractionStore, InFlightExtractions, KeywordAutomaton, UploadSpool,
+    find_sections, get_or_extract, make_cache_key
+)
+from extraction import extract_text_from_pdf as core_extract_text_from_pdf
+from streamlit_reporter import StreamlitReporter
+from streamlit_viewer import render_text_viewer
 
 st.set_page_config(
     page_title="入札参加条件抽出システム",
@@ -24,6 +30,13 @@ with st.sidebar:
     
     # デバッグモード
     debug_mode = st.checkbox("デバッグモード", value=True)
+    
+    # 参加条件の検索キーワード（標準のキーワードに追加）
+    extra_keywords = st.text_area(
+        "追加の検索キーワード",
+        value="",
+        help="1行に1つ入力してください。数百語まで登録できます"
+    ).splitlines()
 
 # メインエリア
 uploaded_file = st.file_uploader(
@@ -32,82 +45,78 @@ uploaded_file = st.file_uploader(
     help="入札説明書、仕様書などのPDFファイル"
 )
 
+# 参加条件のキーワード
+KEYWORDS = ["参加資格", "入札参加資格", "応募資格", "資格要件", "参加条件"]
+
 # PDFからテキストを抽出する改善版関数
 def extract_text_from_pdf(pdf_file):
     """PDFから全テキストを確実に抽出"""
-    all_text = []
-    page_texts = []
-    
     try:
-        with pdfplumber.open(pdf_file) as pdf:
-            st.write(f"📄 総ページ数: {len(pdf.pages)}")
-            
-            # プログレスバー
-            progress_bar = st.progress(0)
-            
-            for i, page in enumerate(pdf.pages):
-                try:
-                    # ページごとのテキスト抽出
-                    page_text = page.extract_text()
-                    
-                    if page_text:
-                        all_text.append(f"\n--- ページ {i+1} ---\n")
-                        all_text.append(page_text)
-                        page_texts.append({
-                            'page': i+1,
-                            'text': page_text,
-                            'char_count': len(page_text)
-                        })
-                    else:
-                        # テキストが抽出できない場合の代替手段
-                        # テーブルとして抽出を試みる
-                        tables = page.extract_tables()
-                        if tables:
-                            table_text = "\n".join([
-                                "\n".join([str(cell) if cell else "" for cell in row])
-                                for table in tables for row in table
-                            ])
-                            all_text.append(f"\n--- ページ {i+1} (表形式) ---\n")
-                            all_text.append(table_text)
-                            page_texts.append({
-                                'page': i+1,
-                                'text': table_text,
-                                'char_count': len(table_text)
-                            })
-                        else:
-                            all_text.append(f"\n--- ページ {i+1} (テキストなし) ---\n")
-                            page_texts.append({
-                                'page': i+1,
-                                'text': "（テキストを抽出できませんでした）",
-                                'char_count': 0
-                            })
-                    
-                    # プログレスバー更新
-                    progress_bar.progress((i + 1) / len(pdf.pages))
-                    
-                except Exception as e:
-                    st.warning(f"ページ {i+1} の処理中にエラー: {str(e)}")
-                    page_texts.append({
-                        'page': i+1,
-                        'text': f"エラー: {str(e)}",
-                        'char_count': 0
-                    })
-            
-            progress_bar.empty()
-            
+        return core_extract_text_from_pdf(
+            pdf_file,
+            reporter=StreamlitReporter(
+                debug_mode,
+                get_keyword_automaton(keywords),
+                show_tables=False
+            )
+        )
     except Exception as e:
         st.error(f"PDF読み込みエラー: {str(e)}")
         return "", []
-    
-    return "\n".join(all_text), page_texts
+
+# アップロードの書き出し先（セッションをまたいで共有）
+@st.cache_resource
+def get_upload_spool():
+    return UploadSpool()
+
+# 抽出結果のキャッシュ（再実行やセッションをまたいで共有）
+@st.cache_resource
+def get_extraction_cache():
+    return ExtractionCache(max_entries=16)
+
+# 抽出結果の永続ストア（サーバー再起動後も再利用）
+@st.cache_resource
+def get_extraction_store():
+    return ExtractionStore()
+
+# 実行中の抽出（同じPDFを同時に開いたセッションは1回の抽出を待つ）
+@st.cache_resource
+def get_inflight_extractions():
+    return InFlightExtractions()
+
+# キーワード検索のオートマトン（キーワードの組み合わせごとに共有）
+@st.cache_resource
+def get_keyword_automaton(keywords):
+    return KeywordAutomaton(keywords)
+
+# 標準キーワード＋追加キーワード
+keywords = tuple(KEYWORDS + [k.strip() for k in extra_keywords if k.strip()])
 
 # PDFがアップロードされた場合
 if uploaded_file is not None:
     st.subheader("📊 PDF解析結果")
     
-    # テキスト抽出
+    # テキスト抽出（同じPDFならキャッシュを再利用）
+    # アップロードはディスクに書き出してメモリマップで読む（同じアップロードは1回だけ書き出す）
+    pdf_path, file_hash = get_upload_spool().spool(
+        uploaded_file, key=getattr(uploaded_file, 'file_id', None)
+    )
+    cache_key = make_cache_key(file_hash, extractor="text")
+    
     with st.spinner('PDFを解析中...'):
-        full_text, page_info = extract_text_from_pdf(uploaded_file)
+        (full_text, page_info), source = get_or_extract(
+            cache_key,
+            lambda: extract_text_from_pdf(pdf_path),
+            cache=get_extraction_cache(),
+            store=get_extraction_store(),
+            is_valid=lambda result: bool(result[1]),
+            inflight=get_inflight_extractions()
+        )
+    
+    if debug_mode and source in ('memory', 'disk'):
+        st.caption("⚡ キャッシュ済みの抽出結果を表示しています")
+    elif debug_mode and source == 'joined':
+        st.caption("🔁 他のセッションが実行中だった抽出の結果を表示しています")
     
     # 抽出統計
     col1, col2, col3 = st.columns(3)
@@ -125,25 +134,8 @@ if uploaded_file is not None:
     with tab1:
         st.subheader("抽出されたテキスト（全文）")
         
-        # 表示オプション
-        show_all = st.checkbox("全文を表示", value=False)
-        
-        if show_all:
-            # 全文表示
-            st.text_area(
-                "PDF全文",
-                full_text,
-                height=600,
-                help="Ctrl+Fで検索できます"
-            )
-        else:
-            # 最初の5000文字のみ表示
-            display_text = full_text[:5000] + "..." if len(full_text) > 5000 else full_text
-            st.text_area(
-                "PDF全文（最初の5000文字）",
-                display_text,
-                height=400
-            )
+        # 表示中の範囲だけを画面に送る（検索はサーバー側で行う）
+        render_text_viewer(full_text, cache_key)
         
         # ダウンロードボタン
         st.download_button(
@@ -176,30 +168,18 @@ if uploaded_file is not None:
         st.info("この機能は次のステップで実装します。まずはPDFテキスト抽出が正しく動作することを確認してください。")
         
         # 参加条件キーワードの検索（簡易版）
-        keywords = ["参加資格", "入札参加資格", "応募資格", "資格要件", "参加条件"]
-        
-        found_sections = []
-        lines = full_text.split('\n')
-        
-        for i, line in enumerate(lines):
-            for keyword in keywords:
-                if keyword in line:
-                    # 前後の文脈を含めて抽出
-                    start = max(0, i - 2)
-                    end = min(len(lines), i + 10)
-                    context = '\n'.join(lines[start:end])
-                    found_sections.append({
-                        'keyword': keyword,
-                        'line_number': i + 1,
-                        'context': context
-                    })
+        found_sections = find_sections(full_text, get_keyword_automaton(keywords), before=2, after=10)
         
         if found_sections:
-            st.success(f"✅ {len(found_sections)}箇所で参加条件関連のキーワードを発見")
+            hit_count = sum(len(section.hits) for section in found_sections)
+            st.success(
+                f"✅ {hit_count}箇所で参加条件関連のキーワードを発見"
+                f"（{len(found_sections)}セクション）"
+            )
             
             for section in found_sections[:5]:  # 最初の5件のみ表示
-                with st.expander(f"📍 {section['keyword']} (行 {section['line_number']})"):
-                    st.text(section['context'])
+                with st.expander(f"📍 {'・'.join(section.keywords)} (行 {section.line_number})"):
+                    st.text(section.text(full_text))
         else:
             st.warning("参加条件に関するキーワードが見つかりませんでした")
 
@@ -222,6 +202,6 @@ else:
     
     3. **使いやすい表示**
        - タブで情報を整理
-       - 全文/要約の切り替え
+       - 全文のページ送り表示と検索
        - ダウンロード機能
     """)
\ No newline at end of file
@@ -1,7 +1,17 @@
 import streamlit as st
-import pdfplumber
 import pandas as pd
-import io
+import tempfile
+import time
+
+from extraction import (
+    PARTICIPATION_KEYWORDS, ExtractionCache, ExtractionStore, FullTextIndex, InFlightExtractions,
+    JobQueue, JobWorkerPool, KeywordAutomaton, PageResultStore, UploadSpool, cache_key_hash,
+    default_workers, diff_with_previous, extract_all_content_incremental,
+    extract_all_content_parallel, find_sections, get_or_extract, load_job_content, lookup,
+    make_cache_key, near_duplicate_groups, record_version, table_scan_stats, write_tables_zip
+)
+from streamlit_reporter import StreamlitReporter
+from streamlit_viewer import render_index_search, render_text_viewer
 
 st.set_page_config(
     page_title="入札参加条件抽出システム",
@@ -25,7 +35,48 @@ with st.sidebar:
     # 設定オプション
     st.subheader("⚙️ 抽出設定")
     extract_tables = st.checkbox("表を抽出", value=True)
+    single_pass = st.checkbox(
+        "表の文字を本文から除く",
+        value=True,
+        help="表を先に検出し、表の範囲にない文字だけで本文を作ります（表の内容が全文に重複しません）"
+    )
+    low_memory = st.checkbox(
+        "省メモリモード",
+        value=False,
+        help="ページごとに解析データを破棄し、大きなPDFでもメモリ使用量を一定に保ちます（少し遅くなります）"
+    )
+    background = st.checkbox(
+        "バックグラウンドで抽出",
+        value=True,
+        help="抽出中も画面が固まらず、ページを再読み込みしてもURLから結果を表示できます"
+    )
     debug_mode = st.checkbox("デバッグモード", value=True)
+    dedup_threshold = st.slider(
+        "ほぼ同じセクションをまとめる類似度",
+        min_value=0.5,
+        max_value=1.0,
+        value=0.8,
+        step=0.05,
+        help="公告文と説明書の両方にある参加資格など、内容がほぼ同じセクションを1つにまとめて表示します"
+    )
+    
+    # 参加条件の検索キーワード（標準のキーワードに追加）
+    extra_keywords = st.text_area(
+        "追加の検索キーワード",
+        value="",
+        help="1行に1つ入力してください。数百語まで登録できます"
+    ).splitlines()
+    
+    # 並列処理（1コアの環境では使わない。バックグラウンド抽出ではジョブ単位で並列）
+    workers = 1
+    if default_workers() > 1 and not background:
+        workers = st.slider(
+            "並列ワーカー数",
+            min_value=1,
+            max_value=default_workers(),
+            value=default_workers(),
+            help="ページを複数プロセスに分けて抽出します（短いPDFは1プロセスで処理）"
+        )
 
 # メインエリア
 uploaded_file = st.file_uploader(
@@ -34,147 +85,320 @@ uploaded_file = st.file_uploader(
     help="入札説明書、仕様書などのPDFファイル"
 )
 
-# 表データを整形する関数
-def format_table(table):
-    """表データを読みやすく整形"""
-    if not table:
-        return ""
-    
-    formatted_rows = []
-    for row in table:
-        # None値を空文字に変換
-        cleaned_row = [str(cell).strip() if cell else "" for cell in row]
-        # 空行をスキップ
-        if any(cleaned_row):
-            formatted_rows.append(" | ".join(cleaned_row))
-    
-    return "\n".join(formatted_rows)
-
 # PDFからテキストと表を抽出する関数
-def extract_all_content(pdf_file):
+def extract_all_content(pdf_path):
     """PDFから全コンテンツ（テキスト＋表）を抽出"""
-    all_text = []
-    page_contents = []
-    all_tables = []
-    
     try:
-        with pdfplumber.open(pdf_file) as pdf:
-            st.write(f"📄 総ページ数: {len(pdf.pages)}")
-            
-            # プログレスバー
-            progress_bar = st.progress(0)
-            
-            for i, page in enumerate(pdf.pages):
-                page_data = {
-                    'page': i + 1,
-                    'text': "",
-                    'tables': [],
-                    'char_count': 0,
-                    'table_count': 0
-                }
-                
-                try:
-                    # テキスト抽出
-                    page_text = page.extract_text()
-                    
-                    # 表の抽出（extract_tablesオプションが有効な場合）
-                    tables = []
-                    if extract_tables:
-                        try:
-                            # シンプルな設定で表を抽出
-                            extracted_tables = page.extract_tables()
-                            if extracted_tables:
-                                tables = extracted_tables
-                                page_data['table_count'] = len(tables)
-                                
-                                # 表をテキストに変換
-                                table_texts = []
-                                for j, table in enumerate(tables):
-                                    if table and len(table) > 0:  # 空の表をチェック
-                                        table_text = f"\n[表{j+1}]\n"
-                                        table_text += format_table(table)
-                                        table_texts.append(table_text)
-                                        
-                                        # DataFrameとしても保存
-                                        try:
-                                            # 表が有効かチェック
-                                            if len(table) > 1 and len(table[0]) > 0:
-                                                # ヘッダーありの場合
-                                                df = pd.DataFrame(table[1:], columns=table[0])
-                                            else:
-                                                # ヘッダーなしの場合
-                                                df = pd.DataFrame(table)
-                                            
-                                            page_data['tables'].append({
-                                                'index': j + 1,
-                                                'dataframe': df,
-                                                'text': table_text
-                                            })
-                                            
-                                            all_tables.append({
-                                                'page': i + 1,
-                                                'table_index': j + 1,
-                                                'dataframe': df
-                                            })
-                                        except Exception as e:
-                                            if debug_mode:
-                                                st.warning(f"表{j+1}のDataFrame変換エラー: {str(e)}")
-                        except Exception as e:
-                            if debug_mode:
-                                st.warning(f"ページ{i+1}の表抽出エラー: {str(e)}")
-                    
-                    # ページコンテンツの結合
-                    if page_text:
-                        all_text.append(f"\n--- ページ {i+1} ---\n")
-                        all_text.append(page_text)
-                        page_data['text'] = page_text
-                        page_data['char_count'] = len(page_text)
-                        
-                        # 表がある場合は追加
-                        if 'table_texts' in locals() and table_texts:
-                            for table_text in table_texts:
-                                all_text.append(table_text)
-                                page_data['char_count'] += len(table_text)
-                    elif tables:
-                        # テキストはないが表がある場合
-                        all_text.append(f"\n--- ページ {i+1} (表のみ) ---\n")
-                        if 'table_texts' in locals() and table_texts:
-                            for table_text in table_texts:
-                                all_text.append(table_text)
-                                page_data['char_count'] += len(table_text)
-                    else:
-                        all_text.append(f"\n--- ページ {i+1} (コンテンツなし) ---\n")
-                    
-                    page_contents.append(page_data)
-                    
-                    # プログレスバー更新
-                    progress_bar.progress((i + 1) / len(pdf.pages))
-                    
-                except Exception as e:
-                    st.warning(f"ページ {i+1} の処理中にエラー: {str(e)}")
-                    page_contents.append({
-                        'page': i + 1,
-                        'text': f"エラー: {str(e)}",
-                        'tables': [],
-                        'char_count': 0,
-                        'table_count': 0
-                    })
-            
-            progress_bar.empty()
-            
+        if workers == 1:
+            # 1プロセスのときは、保存済みのページ（改訂前の版など）を解析せずに再利用する
+            return extract_all_content_incremental(
+                pdf_path,
+                get_page_store(),
+                extract_tables=extract_tables,
+                reporter=StreamlitReporter(debug_mode, get_keyword_automaton(keywords)),
+                single_pass=single_pass,
+                low_memory=low_memory
+            )
+        return extract_all_content_parallel(
+            pdf_path,
+            extract_tables=extract_tables,
+            workers=workers,
+            reporter=StreamlitReporter(debug_mode, get_keyword_automaton(keywords)),
+            single_pass=single_pass,
+            low_memory=low_memory
+        )
     except Exception as e:
         st.error(f"PDF読み込みエラー: {str(e)}")
         return "", [], []
+
+# アップロードの書き出し先（セッションをまたいで共有）
+@st.cache_resource
+def get_upload_spool():
+    return UploadSpool()
+
+# 抽出結果のキャッシュ（再実行やセッションをまたいで共有）
+@st.cache_resource
+def get_extraction_cache():
+    return ExtractionCache(max_entries=16)
+
+# 抽出結果の永続ストア（サーバー再起動後も再利用）
+@st.cache_resource
+def get_extraction_store():
+    return ExtractionStore()
+
+# ページごとの抽出結果と版の記録（改訂版は変わったページだけ解析する）
+@st.cache_resource
+def get_page_store():
+    return PageResultStore()
+
+# 前の版との差分（ドキュメント・設定ごとに1回だけ求める。ストアには書き込まない）
+@st.cache_data(max_entries=16)
+def get_revision_diff(cache_key, extract_tables, single_pass, _content):
+    return diff_with_previous(
+        get_page_store(),
+        cache_key_hash(cache_key),
+        _content,
+        extract_tables=extract_tables,
+        single_pass=single_pass
+    )
+
+# 実行中の抽出（同じPDFを同時に開いたセッションは1回の抽出を待つ）
+@st.cache_resource
+def get_inflight_extractions():
+    return InFlightExtractions()
+
+# 表のCSV（選択された表だけ作り、表ごとにキャッシュ）
+@st.cache_data(max_entries=256)
+def get_table_csv(cache_key, page, index, _record):
+    return _record.to_csv()
+
+# 全ての表のZIP（押されたときだけ作り、ドキュメントごとにキャッシュ）
+# 作成中は1表分ずつ一時ファイルに書き出すが、ダウンロードにはできたZIP全体を読み込んで渡す
+@st.cache_data(max_entries=4)
+def get_tables_zip(cache_key, _records):
+    with tempfile.TemporaryFile() as f:
+        write_tables_zip(_records, f)
+        f.seek(0)
+        return f.read()
+
+# 抽出ジョブのキューとワーカー（サーバー全体で共有）
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+@st.cache_resource
+def get_job_pool():
+    # ジョブのワーカーが抽出を終えたら全文検索インデックスにも登録する
+    return JobWorkerPool(
+        get_job_queue(),
+        index_path=get_search_index().path,
+        page_store_path=get_page_store().path
+    ).start()
+
+# 処理済みドキュメントの全文検索インデックス
+@st.cache_resource
+def get_search_index():
+    return FullTextIndex()
+
+def wait_for_job(job_id):
+    """ジョブの進捗と途中結果を表示し、完了したら (結果, ジョブ) を返す
+
+    処理中の場合は少し待ってから再実行するので、ここから先は表示されません
+    """
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    if job is None:
+        st.error(f"ジョブ {job_id} が見つかりません（保存期間を過ぎた可能性があります）")
+        st.stop()
+    if job['status'] == 'failed':
+        st.error(f"PDF読み込みエラー: {job['error'].splitlines()[0]}")
+        st.stop()
     
-    return "\n".join(all_text), page_contents, all_tables
+    if job['status'] != 'done':
+        done, total = job['done_pages'], job['total_pages']
+        st.progress(
+            done / total if total else 0.0,
+            text=f"📄 {done}/{total or '?'} ページ処理済み（ジョブ {job_id}）"
+        )
+        st.caption("このページを再読み込みしても、同じURLで結果を表示できます")
+        
+        # 途中結果（直近のページ）
+        for result in queue.page_results(job_id, start_page=max(1, done - 2)):
+            with st.expander(f"ページ {result['page']}"):
+                st.text((result['text'] or "（テキストなし）")[:1000])
+        
+        time.sleep(1)
+        st.rerun()
+    
+    content, _ = lookup(job['cache_key'], get_extraction_cache(), get_extraction_store())
+    if content is None:
+        # 抽出ストアの容量を超えた大きな結果はジョブのページから組み立てる
+        content = load_job_content(queue, job_id)
+        get_extraction_cache().put(job['cache_key'], content)
+    return content, job
+
+# キーワード検索のオートマトン（キーワードの組み合わせごとに共有）
+@st.cache_resource
+def get_keyword_automaton(keywords):
+    return KeywordAutomaton(keywords)
+
+# ほぼ同じ内容のセクションのまとめ（セクションのテキストはまとめ直すときだけ切り出す）
+@st.cache_data(max_entries=16)
+def get_section_groups(cache_key, keywords, threshold, _full_text, _sections):
+    return near_duplicate_groups(
+        [section.text(_full_text) for section in _sections], threshold=threshold
+    )
+
+# 標準キーワード＋追加キーワード
+keywords = tuple(PARTICIPATION_KEYWORDS + [k.strip() for k in extra_keywords if k.strip()])
 
-# PDFがアップロードされた場合
-if uploaded_file is not None:
+# 処理済みの入札説明書の全文検索
+with st.expander("🔎 処理済みの入札説明書を検索"):
+    render_index_search(get_search_index())
+
+# URLのジョブID（ページを再読み込みしても抽出結果を表示できる）
+job_id = st.query_params.get("job")
+
+# PDFがアップロードされた場合、またはジョブIDが指定された場合
+if uploaded_file is not None or job_id:
     st.subheader("📊 PDF解析結果")
     
-    # コンテンツ抽出
-    with st.spinner('PDFを解析中...'):
-        full_text, page_info, all_tables = extract_all_content(uploaded_file)
+    content, source = None, None
+    if uploaded_file is not None:
+        document_name = uploaded_file.name
+        
+        # コンテンツ抽出（同じPDF・同じ設定ならキャッシュを再利用）
+        # アップロードはディスクに書き出してメモリマップで読む（同じアップロードは1回だけ書き出す）
+        pdf_path, file_hash = get_upload_spool().spool(
+            uploaded_file, key=getattr(uploaded_file, 'file_id', None)
+        )
+        cache_key = make_cache_key(
+            file_hash,
+            extractor="stable",
+            extract_tables=extract_tables,
+            single_pass=single_pass
+        )
+        
+        # このセッションで初めて開くドキュメントか（再実行のたびに数えないため）
+        seen = st.session_state.setdefault('seen_documents', set())
+        first_time = cache_key not in seen
+        seen.add(cache_key)
+        
+        content, source = lookup(cache_key, get_extraction_cache(), get_extraction_store())
+        if content is not None:
+            submitted = st.session_state.get('submitted_jobs', {})
+            url_job = get_job_queue().get(job_id) if job_id else None
+            if cache_key in submitted:
+                # このセッションで登録したジョブの結果（再読み込みしても表示できるようジョブIDを残す）
+                job_id = submitted[cache_key]
+                st.query_params["job"] = job_id
+                source = 'job'
+            elif url_job is not None and url_job['cache_key'] == cache_key:
+                source = 'job'
+            else:
+                # 別のドキュメントのジョブIDが残っていれば消す
+                st.query_params.pop("job", None)
+            if first_time:
+                get_job_queue().count('cache_hits')
+        elif not background:
+            with st.spinner('PDFを解析中...'):
+                # 他のセッションが同じPDFを抽出中なら、その結果を待つ
+                content, source = get_or_extract(
+                    cache_key,
+                    lambda: extract_all_content(pdf_path),
+                    cache=get_extraction_cache(),
+                    store=get_extraction_store(),
+                    is_valid=lambda result: bool(result[1]),
+                    inflight=get_inflight_extractions()
+                )
+            if source in ('joined', 'extracted'):
+                get_job_queue().count(source)
+            # 新しく抽出したドキュメントは全文検索インデックスに登録
+            if source == 'extracted' and content[1]:
+                get_search_index().add_document(file_hash, uploaded_file.name, content[1])
+        else:
+            # 同じアップロード・同じ設定のジョブはセッション内で1回だけ登録
+            # （他のセッションが同じPDFのジョブを処理中なら、そのジョブに合流する）
+            submitted = st.session_state.setdefault('submitted_jobs', {})
+            if cache_key not in submitted:
+                get_job_pool()
+                submitted[cache_key] = get_job_queue().submit(
+                    pdf_path,
+                    name=uploaded_file.name,
+                    cache_key=cache_key,
+                    extract_tables=extract_tables,
+                    single_pass=single_pass,
+                    low_memory=low_memory
+                )
+            job_id = submitted[cache_key]
+            st.query_params["job"] = job_id
+    
+    if content is None:
+        # サーバーの再起動後もジョブを続けられるようワーカーを起動しておく
+        get_job_pool()
+        content, job = wait_for_job(job_id)
+        document_name = job['name'] or "document.pdf"
+        cache_key = job['cache_key']
+        source = 'job'
+    
+    full_text, page_info, all_tables = content
+    
+    if debug_mode and source in ('memory', 'disk'):
+        st.caption("⚡ キャッシュ済みの抽出結果を表示しています")
+    elif debug_mode and source == 'job':
+        st.caption(f"✅ バックグラウンド抽出（ジョブ {job_id}）の結果を表示しています")
+    elif debug_mode and source == 'joined':
+        st.caption("🔁 他のセッションが実行中だった抽出の結果を表示しています")
+    
+    if debug_mode:
+        # 同じPDFの抽出をまとめて省けた回数（サーバー全体）
+        counters = get_job_queue().counters()
+        joined, cache_hits = counters.get('joined', 0), counters.get('cache_hits', 0)
+        executed = counters.get('submitted', 0) + counters.get('extracted', 0)
+        st.caption(
+            f"🔁 省いた抽出 {joined + cache_hits}件"
+            f"（実行中の抽出に合流 {joined}件・抽出済みの結果を再利用 {cache_hits}件）／"
+            f"実行した抽出 {executed}件"
+        )
+        
+        # 保存済みのページを再利用した数（このドキュメント）
+        reused = sum(1 for p in page_info if p.get('reused'))
+        if reused:
+            st.caption(f"♻️ {len(page_info)}ページ中 {reused}ページは解析済みの結果を再利用しました")
+    
+    # この版を記録（セッション内でドキュメント・設定ごとに1回だけ書き込む）
+    recorded = st.session_state.setdefault('recorded_versions', set())
+    if (cache_key, extract_tables, single_pass) not in recorded:
+        record_version(
+            get_page_store(),
+            cache_key_hash(cache_key),
+            document_name,
+            content,
+            extract_tables=extract_tables,
+            single_pass=single_pass
+        )
+        recorded.add((cache_key, extract_tables, single_pass))
+    
+    # 前の版（同じページを一番多く含む処理済みの入札説明書）との差分
+    previous, diff = get_revision_diff(cache_key, extract_tables, single_pass, content)
+    if diff is not None:
+        with st.expander(
+            f"📝 前の版との差分（{previous['name'] or '名称なし'}・"
+            f"変更 {len(diff['pages'])}箇所／変更なし {diff['unchanged_pages']}ページ）",
+            expanded=bool(diff['pages'])
+        ):
+            statuses = {'changed': "変更", 'added': "追加", 'removed': "削除"}
+            if diff['pages']:
+                st.dataframe(pd.DataFrame([{
+                    '種類': statuses[change['status']],
+                    '前の版のページ': ", ".join(map(str, change['old_pages'])),
+                    'この版のページ': ", ".join(map(str, change['new_pages']))
+                } for change in diff['pages']]), use_container_width=True)
+            else:
+                st.info("ページの内容に変更はありません")
+            
+            for label, conditions in (
+                ("追加された参加条件", diff['conditions']['added']),
+                ("削除された参加条件", diff['conditions']['removed'])
+            ):
+                if conditions:
+                    st.write(f"### {label}（{len(conditions)}件）")
+                    st.dataframe(pd.DataFrame([{
+                        'ページ': c['page'],
+                        '分類': c['category'],
+                        '参加条件': c['condition']
+                    } for c in conditions]), use_container_width=True)
+            
+            for label, records in (
+                ("追加された表", diff['tables']['added']),
+                ("削除された表", diff['tables']['removed'])
+            ):
+                if records:
+                    st.write(f"### {label}（{len(records)}件）")
+                    st.write("、".join(
+                        "ページ {} - 表 {}（{}行×{}列）".format(r.page, r.index, *r.shape)
+                        for r in records
+                    ))
     
     # 抽出統計
     col1, col2, col3, col4 = st.columns(4)
@@ -195,29 +419,14 @@ if uploaded_file is not None:
     with tabs[0]:
         st.subheader("抽出されたテキスト（全文）")
         
-        # 表示オプション
-        show_all = st.checkbox("全文を表示", value=False)
-        
-        if show_all:
-            st.text_area(
-                "PDF全文（テキスト＋表）",
-                full_text,
-                height=600,
-                help="Ctrl+Fで検索できます"
-            )
-        else:
-            display_text = full_text[:5000] + "..." if len(full_text) > 5000 else full_text
-            st.text_area(
-                "PDF全文（最初の5000文字）",
-                display_text,
-                height=400
-            )
+        # 表示中の範囲だけを画面に送る（検索はサーバー側で行う）
+        render_text_viewer(full_text, cache_key)
         
         # ダウンロードボタン
         st.download_button(
             label="📥 全文をダウンロード",
             data=full_text,
-            file_name=f"全文_{uploaded_file.name.replace('.pdf', '')}.txt",
+            file_name=f"全文_{document_name.replace('.pdf', '')}.txt",
             mime="text/plain"
         )
     
@@ -249,6 +458,15 @@ if uploaded_file is not None:
                 st.write("### 詳細情報")
                 st.dataframe(df_summary, use_container_width=True)
                 
+                # 罫線のないページは表の検出を省略している
+                scan_stats = table_scan_stats(page_info)
+                if scan_stats['skipped']:
+                    st.caption(
+                        f"⚡ 罫線のない {scan_stats['skipped']}ページで表の検出を省略"
+                        f"（検出 {scan_stats['scanned']}ページ・{scan_stats['seconds']:.1f}秒、"
+                        f"推定 {scan_stats['saved_seconds']:.1f}秒短縮）"
+                    )
+                
                 # 問題のあるページを特定
                 if not df_summary.empty:
                     problem_pages = df_summary[df_summary['文字数'] < 100]
@@ -261,22 +479,45 @@ if uploaded_file is not None:
         st.subheader("検出された表一覧")
         
         if all_tables:
-            for idx, table_info in enumerate(all_tables):
+            # 表は選択したものだけDataFrameにする（表が数千個あっても一覧は軽い）
+            selected = st.selectbox(
+                f"表を選択（{len(all_tables)}件）",
+                range(len(all_tables)),
+                format_func=lambda idx: "ページ {} - 表 {}（{}行×{}列）".format(
+                    all_tables[idx].page, all_tables[idx].index, *all_tables[idx].shape
+                )
+            )
+            record = all_tables[selected]
+            try:
+                st.dataframe(record.to_dataframe(), use_container_width=True)
+                
+                # CSV形式でダウンロード
+                st.download_button(
+                    label="📥 この表をCSVでダウンロード",
+                    data=get_table_csv(cache_key, record.page, record.index, record),
+                    file_name=record.file_name,
+                    mime="text/csv"
+                )
+            except Exception as e:
+                st.error(f"表の表示エラー: {str(e)}")
+            
+            # 全ての表をまとめてダウンロード（押されたときだけZIPを作る）
+            # 再実行でダウンロードボタンが消えないよう、押されたことをドキュメントごとに覚えておく
+            zip_requested = f"tables_zip:{cache_key}"
+            if st.button(f"📦 全ての表をZIPにまとめる（{len(all_tables)}件）"):
+                st.session_state[zip_requested] = True
+            if st.session_state.get(zip_requested):
                 try:
-                    with st.expander(f"📋 ページ {table_info['page']} - 表 {table_info['table_index']}"):
-                        st.dataframe(table_info['dataframe'], use_container_width=True)
-                        
-                        # CSV形式でダウンロード
-                        csv = table_info['dataframe'].to_csv(index=False, encoding='utf-8-sig')
-                        st.download_button(
-                            label="📥 この表をCSVでダウンロード",
-                            data=csv,
-                            file_name=f"表_P{table_info['page']}_T{table_info['table_index']}.csv",
-                            mime="text/csv",
-                            key=f"table_{idx}"  # ユニークなキーを使用
-                        )
+                    with st.spinner('ZIPを作成中...'):
+                        zip_data = get_tables_zip(cache_key, all_tables)
+                    st.download_button(
+                        label="📥 ZIPをダウンロード",
+                        data=zip_data,
+                        file_name=f"表一覧_{document_name.replace('.pdf', '')}.zip",
+                        mime="application/zip"
+                    )
                 except Exception as e:
-                    st.error(f"表の表示エラー: {str(e)}")
+                    st.error(f"ZIP作成エラー: {str(e)}")
         else:
             st.info("表形式のデータは検出されませんでした")
     
@@ -284,39 +525,30 @@ if uploaded_file is not None:
         st.subheader("参加条件の抽出")
         
         # 参加条件のキーワード検索
-        keywords = ["参加資格", "入札参加資格", "応募資格", "資格要件", "参加条件", "入札参加要件"]
-        
-        found_sections = []
-        lines = full_text.split('\n')
-        
-        for i, line in enumerate(lines):
-            for keyword in keywords:
-                if keyword in line:
-                    start = max(0, i - 3)
-                    end = min(len(lines), i + 15)
-                    context = '\n'.join(lines[start:end])
-                    found_sections.append({
-                        'keyword': keyword,
-                        'line_number': i + 1,
-                        'context': context
-                    })
+        found_sections = find_sections(full_text, get_keyword_automaton(keywords))
         
         if found_sections:
-            st.success(f"✅ {len(found_sections)}箇所で参加条件関連のキーワードを発見")
-            
-            # 重複を除去
-            unique_sections = []
-            seen_contexts = set()
-            
-            for section in found_sections:
-                context_key = section['context'][:100]  # 最初の100文字で重複判定
-                if context_key not in seen_contexts:
-                    unique_sections.append(section)
-                    seen_contexts.add(context_key)
+            hit_count = sum(len(section.hits) for section in found_sections)
+            # 重なった範囲はまとめ済み。離れた場所にあるほぼ同じ内容のセクションもまとめる
+            groups = get_section_groups(
+                cache_key, keywords, dedup_threshold, full_text, found_sections
+            )
+            merged = f"、ほぼ同じ内容をまとめて{len(groups)}件" if len(groups) < len(found_sections) else ""
+            st.success(
+                f"✅ {hit_count}箇所で参加条件関連のキーワードを発見"
+                f"（{len(found_sections)}セクション{merged}）"
+            )
             
-            for i, section in enumerate(unique_sections[:10]):  # 最大10件表示
-                with st.expander(f"📍 {section['keyword']} (行 {section['line_number']})"):
-                    st.text(section['context'])
+            for group in groups[:10]:  # 最大10件表示
+                section = found_sections[group[0]]
+                others = ""
+                if len(group) > 1:
+                    lines = "・".join(str(found_sections[i].line_number) for i in group[1:])
+                    others = f"　ほか{len(group) - 1}箇所（行 {lines}）"
+                with st.expander(
+                    f"📍 {'・'.join(section.keywords)} (行 {section.line_number}){others}"
+                ):
+                    st.text(section.text(full_text))
         else:
             st.warning("参加条件に関するキーワードが見つかりませんでした")
 
@@ -340,5 +572,5 @@ else:
     3. **参加条件の検索**
        - キーワードベースの検索
        - 前後の文脈を含めて表示
-       - 重複を自動除去
+       - ほぼ同じ内容のセクションをまとめて表示
     """)
\ No newline at end of file
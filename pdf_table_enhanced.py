@@ -1,7 +1,15 @@
 import streamlit as st
-import pdfplumber
 import pandas as pd
-import io
+import tempfile
+
+from extraction import (
+    PARTICIPATION_KEYWORDS, ExtractionCache, ExtractionStore, FullTextIndex, InFlightExtractions,
+    KeywordAutomaton, TableProfileStore, UploadSpool, default_workers, extract_all_content_parallel,
+    find_sections, get_or_extract, make_cache_key, resolve_table_settings, table_scan_stats,
+    write_tables_zip
+)
+from streamlit_reporter import StreamlitReporter
+from streamlit_viewer import render_text_viewer
 
 st.set_page_config(
     page_title="入札参加条件抽出システム",
@@ -26,7 +34,40 @@ with st.sidebar:
     st.subheader("⚙️ 抽出設定")
     extract_tables = st.checkbox("表を抽出", value=True)
     merge_cells = st.checkbox("セル結合を考慮", value=True)
+    auto_table_settings = st.checkbox(
+        "表の設定を自動調整",
+        value=True,
+        help="数ページで設定を試し、発注者のレイアウトごとに最適な設定を記憶します"
+    )
+    single_pass = st.checkbox(
+        "表の文字を本文から除く",
+        value=True,
+        help="表を先に検出し、表の範囲にない文字だけで本文を作ります（表の内容が全文に重複しません）"
+    )
+    low_memory = st.checkbox(
+        "省メモリモード",
+        value=False,
+        help="ページごとに解析データを破棄し、大きなPDFでもメモリ使用量を一定に保ちます（少し遅くなります）"
+    )
     debug_mode = st.checkbox("デバッグモード", value=True)
+    
+    # 参加条件の検索キーワード（標準のキーワードに追加）
+    extra_keywords = st.text_area(
+        "追加の検索キーワード",
+        value="",
+        help="1行に1つ入力してください。数百語まで登録できます"
+    ).splitlines()
+    
+    # 並列処理（1コアの環境では使わない）
+    workers = 1
+    if default_workers() > 1:
+        workers = st.slider(
+            "並列ワーカー数",
+            min_value=1,
+            max_value=default_workers(),
+            value=default_workers(),
+            help="ページを複数プロセスに分けて抽出します（短いPDFは1プロセスで処理）"
+        )
 
 # メインエリア
 uploaded_file = st.file_uploader(
@@ -35,148 +76,143 @@ uploaded_file = st.file_uploader(
     help="入札説明書、仕様書などのPDFファイル"
 )
 
-# 表データを整形する関数
-def format_table(table):
-    """表データを読みやすく整形"""
-    if not table:
-        return ""
-    
-    formatted_rows = []
-    for row in table:
-        # None値を空文字に変換
-        cleaned_row = [str(cell).strip() if cell else "" for cell in row]
-        # 空行をスキップ
-        if any(cleaned_row):
-            formatted_rows.append(" | ".join(cleaned_row))
-    
-    return "\n".join(formatted_rows)
+# 表抽出の設定
+TABLE_SETTINGS = {
+    "vertical_strategy": "lines",
+    "horizontal_strategy": "lines",
+    "snap_tolerance": 3,
+    "join_tolerance": 3,
+    "edge_min_length": 3,
+    "min_words_vertical": 1,
+    "min_words_horizontal": 1,
+}
 
 # PDFからテキストと表を抽出する関数
-def extract_all_content(pdf_file):
+def extract_all_content(pdf_path):
     """PDFから全コンテンツ（テキスト＋表）を抽出"""
-    all_text = []
-    page_contents = []
-    all_tables = []
-    
     try:
-        with pdfplumber.open(pdf_file) as pdf:
-            st.write(f"📄 総ページ数: {len(pdf.pages)}")
-            
-            # プログレスバー
-            progress_bar = st.progress(0)
-            
-            for i, page in enumerate(pdf.pages):
-                page_data = {
-                    'page': i + 1,
-                    'text': "",
-                    'tables': [],
-                    'char_count': 0,
-                    'table_count': 0
-                }
-                
-                try:
-                    # テキスト抽出
-                    page_text = page.extract_text()
-                    
-                    # 表の抽出（extract_tablesオプションが有効な場合）
-                    tables = []
-                    if extract_tables:
-                        # 表抽出の設定
-                        table_settings = {
-                            "vertical_strategy": "lines",
-                            "horizontal_strategy": "lines",
-                            "snap_tolerance": 3,
-                            "join_tolerance": 3,
-                            "edge_min_length": 3,
-                            "min_words_vertical": 1,
-                            "min_words_horizontal": 1,
-                        }
-                        
-                        extracted_tables = page.extract_tables(table_settings)
-                        if extracted_tables:
-                            tables = extracted_tables
-                            page_data['table_count'] = len(tables)
-                            
-                            # 表をテキストに変換
-                            table_texts = []
-                            for j, table in enumerate(tables):
-                                table_text = f"\n[表{j+1}]\n"
-                                table_text += format_table(table)
-                                table_texts.append(table_text)
-                                
-                                # DataFrameとしても保存
-                                try:
-                                    df = pd.DataFrame(table[1:], columns=table[0])
-                                    page_data['tables'].append({
-                                        'index': j + 1,
-                                        'dataframe': df,
-                                        'text': table_text
-                                    })
-                                    all_tables.append({
-                                        'page': i + 1,
-                                        'table_index': j + 1,
-                                        'dataframe': df
-                                    })
-                                except:
-                                    # ヘッダーが正しく取れない場合
-                                    df = pd.DataFrame(table)
-                                    page_data['tables'].append({
-                                        'index': j + 1,
-                                        'dataframe': df,
-                                        'text': table_text
-                                    })
-                    
-                    # ページコンテンツの結合
-                    if page_text:
-                        all_text.append(f"\n--- ページ {i+1} ---\n")
-                        all_text.append(page_text)
-                        page_data['text'] = page_text
-                        page_data['char_count'] = len(page_text)
-                        
-                        # 表がある場合は追加
-                        if tables:
-                            for table_text in table_texts:
-                                all_text.append(table_text)
-                                page_data['char_count'] += len(table_text)
-                    elif tables:
-                        # テキストはないが表がある場合
-                        all_text.append(f"\n--- ページ {i+1} (表のみ) ---\n")
-                        for table_text in table_texts:
-                            all_text.append(table_text)
-                            page_data['char_count'] += len(table_text)
-                    else:
-                        all_text.append(f"\n--- ページ {i+1} (コンテンツなし) ---\n")
-                    
-                    page_contents.append(page_data)
-                    
-                    # プログレスバー更新
-                    progress_bar.progress((i + 1) / len(pdf.pages))
-                    
-                except Exception as e:
-                    st.warning(f"ページ {i+1} の処理中にエラー: {str(e)}")
-                    page_contents.append({
-                        'page': i + 1,
-                        'text': f"エラー: {str(e)}",
-                        'tables': [],
-                        'char_count': 0,
-                        'table_count': 0
-                    })
-            
-            progress_bar.empty()
-            
+        table_settings = TABLE_SETTINGS
+        if extract_tables and auto_table_settings:
+            table_settings = get_table_settings(pdf_path)
+        
+        return extract_all_content_parallel(
+            pdf_path,
+            extract_tables=extract_tables,
+            table_settings=table_settings,
+            workers=workers,
+            reporter=StreamlitReporter(debug_mode, get_keyword_automaton(keywords)),
+            single_pass=single_pass,
+            low_memory=low_memory
+        )
     except Exception as e:
         st.error(f"PDF読み込みエラー: {str(e)}")
         return "", [], []
-    
-    return "\n".join(all_text), page_contents, all_tables
+
+# アップロードの書き出し先（セッションをまたいで共有）
+@st.cache_resource
+def get_upload_spool():
+    return UploadSpool()
+
+# 抽出結果のキャッシュ（再実行やセッションをまたいで共有）
+@st.cache_resource
+def get_extraction_cache():
+    return ExtractionCache(max_entries=16)
+
+# 抽出結果の永続ストア（サーバー再起動後も再利用）
+@st.cache_resource
+def get_extraction_store():
+    return ExtractionStore()
+
+# 実行中の抽出（同じPDFを同時に開いたセッションは1回の抽出を待つ）
+@st.cache_resource
+def get_inflight_extractions():
+    return InFlightExtractions()
+
+# 処理済みドキュメントの全文検索インデックス
+@st.cache_resource
+def get_search_index():
+    return FullTextIndex()
+
+# レイアウトごとの表抽出設定（発注者のテンプレートごとに記憶）
+@st.cache_resource
+def get_table_profile_store():
+    return TableProfileStore()
+
+def get_table_settings(pdf_path):
+    """レイアウトに合った表抽出設定を選ぶ（初めてのレイアウトはサンプルページで調整）"""
+    settings, info = resolve_table_settings(
+        pdf_path,
+        store=get_table_profile_store(),
+        fallback=TABLE_SETTINGS
+    )
+    if debug_mode:
+        if info['source'] == 'stored':
+            st.caption(f"📐 記憶済みのレイアウト設定「{info['name']}」を使用（{info['documents']}件目）")
+        elif info['source'] == 'tuned':
+            st.caption(
+                f"📐 表の設定を調整しました:「{info['name']}」"
+                f"（{info['elapsed']:.1f}秒、採点 {info['scores']}）"
+            )
+    return settings
+
+# 表のCSV（選択された表だけ作り、表ごとにキャッシュ）
+@st.cache_data(max_entries=256)
+def get_table_csv(cache_key, page, index, _record):
+    return _record.to_csv()
+
+# 全ての表のZIP（押されたときだけ作り、ドキュメントごとにキャッシュ）
+# 作成中は1表分ずつ一時ファイルに書き出すが、ダウンロードにはできたZIP全体を読み込んで渡す
+@st.cache_data(max_entries=4)
+def get_tables_zip(cache_key, _records):
+    with tempfile.TemporaryFile() as f:
+        write_tables_zip(_records, f)
+        f.seek(0)
+        return f.read()
+
+# キーワード検索のオートマトン（キーワードの組み合わせごとに共有）
+@st.cache_resource
+def get_keyword_automaton(keywords):
+    return KeywordAutomaton(keywords)
+
+# 標準キーワード＋追加キーワード
+keywords = tuple(PARTICIPATION_KEYWORDS + [k.strip() for k in extra_keywords if k.strip()])
 
 # PDFがアップロードされた場合
 if uploaded_file is not None:
     st.subheader("📊 PDF解析結果")
     
-    # コンテンツ抽出
+    # コンテンツ抽出（同じPDF・同じ設定ならキャッシュを再利用）
+    # アップロードはディスクに書き出してメモリマップで読む（同じアップロードは1回だけ書き出す）
+    pdf_path, file_hash = get_upload_spool().spool(
+        uploaded_file, key=getattr(uploaded_file, 'file_id', None)
+    )
+    cache_key = make_cache_key(
+        file_hash,
+        extractor="table_enhanced",
+        extract_tables=extract_tables,
+        single_pass=single_pass,
+        # 自動調整の場合、設定はレイアウトから決まるので "auto" としてキャッシュする
+        table_settings="auto" if auto_table_settings else TABLE_SETTINGS
+    )
+    
     with st.spinner('PDFを解析中...'):
-        full_text, page_info, all_tables = extract_all_content(uploaded_file)
+        (full_text, page_info, all_tables), source = get_or_extract(
+            cache_key,
+            lambda: extract_all_content(pdf_path),
+            cache=get_extraction_cache(),
+            store=get_extraction_store(),
+            is_valid=lambda result: bool(result[1]),
+            inflight=get_inflight_extractions()
+        )
+    
+    # 新しく抽出したドキュメントは全文検索インデックスに登録
+    if source == 'extracted' and page_info:
+        get_search_index().add_document(file_hash, uploaded_file.name, page_info)
+    
+    if debug_mode and source in ('memory', 'disk'):
+        st.caption("⚡ キャッシュ済みの抽出結果を表示しています")
+    elif debug_mode and source == 'joined':
+        st.caption("🔁 他のセッションが実行中だった抽出の結果を表示しています")
     
     # 抽出統計
     col1, col2, col3, col4 = st.columns(4)
@@ -197,23 +233,8 @@ if uploaded_file is not None:
     with tabs[0]:
         st.subheader("抽出されたテキスト（全文）")
         
-        # 表示オプション
-        show_all = st.checkbox("全文を表示", value=False)
-        
-        if show_all:
-            st.text_area(
-                "PDF全文（テキスト＋表）",
-                full_text,
-                height=600,
-                help="Ctrl+Fで検索できます"
-            )
-        else:
-            display_text = full_text[:5000] + "..." if len(full_text) > 5000 else full_text
-            st.text_area(
-                "PDF全文（最初の5000文字）",
-                display_text,
-                height=400
-            )
+        # 表示中の範囲だけを画面に送る（検索はサーバー側で行う）
+        render_text_viewer(full_text, cache_key)
         
         # ダウンロードボタン
         st.download_button(
@@ -248,6 +269,15 @@ if uploaded_file is not None:
             st.write("### 詳細情報")
             st.dataframe(df_summary, use_container_width=True)
             
+            # 罫線のないページは表の検出を省略している
+            scan_stats = table_scan_stats(page_info)
+            if scan_stats['skipped']:
+                st.caption(
+                    f"⚡ 罫線のない {scan_stats['skipped']}ページで表の検出を省略"
+                    f"（検出 {scan_stats['scanned']}ページ・{scan_stats['seconds']:.1f}秒、"
+                    f"推定 {scan_stats['saved_seconds']:.1f}秒短縮）"
+                )
+            
             # 問題のあるページを特定
             problem_pages = df_summary[df_summary['文字数'] < 100]
             if not problem_pages.empty:
@@ -257,19 +287,45 @@ if uploaded_file is not None:
         st.subheader("検出された表一覧")
         
         if all_tables:
-            for table_info in all_tables:
-                with st.expander(f"📋 ページ {table_info['page']} - 表 {table_info['table_index']}"):
-                    st.dataframe(table_info['dataframe'], use_container_width=True)
-                    
-                    # CSV形式でダウンロード
-                    csv = table_info['dataframe'].to_csv(index=False, encoding='utf-8-sig')
+            # 表は選択したものだけDataFrameにする（表が数千個あっても一覧は軽い）
+            selected = st.selectbox(
+                f"表を選択（{len(all_tables)}件）",
+                range(len(all_tables)),
+                format_func=lambda idx: "ページ {} - 表 {}（{}行×{}列）".format(
+                    all_tables[idx].page, all_tables[idx].index, *all_tables[idx].shape
+                )
+            )
+            record = all_tables[selected]
+            try:
+                st.dataframe(record.to_dataframe(), use_container_width=True)
+                
+                # CSV形式でダウンロード
+                st.download_button(
+                    label="📥 この表をCSVでダウンロード",
+                    data=get_table_csv(cache_key, record.page, record.index, record),
+                    file_name=record.file_name,
+                    mime="text/csv"
+                )
+            except Exception as e:
+                st.error(f"表の表示エラー: {str(e)}")
+            
+            # 全ての表をまとめてダウンロード（押されたときだけZIPを作る）
+            # 再実行でダウンロードボタンが消えないよう、押されたことをドキュメントごとに覚えておく
+            zip_requested = f"tables_zip:{cache_key}"
+            if st.button(f"📦 全ての表をZIPにまとめる（{len(all_tables)}件）"):
+                st.session_state[zip_requested] = True
+            if st.session_state.get(zip_requested):
+                try:
+                    with st.spinner('ZIPを作成中...'):
+                        zip_data = get_tables_zip(cache_key, all_tables)
                     st.download_button(
-                        label="📥 この表をCSVでダウンロード",
-                        data=csv,
-                        file_name=f"表_P{table_info['page']}_T{table_info['table_index']}.csv",
-                        mime="text/csv",
-                        key=f"table_{table_info['page']}_{table_info['table_index']}"
+                        label="📥 ZIPをダウンロード",
+                        data=zip_data,
+                        file_name=f"表一覧_{uploaded_file.name.replace('.pdf', '')}.zip",
+                        mime="application/zip"
                     )
+                except Exception as e:
+                    st.error(f"ZIP作成エラー: {str(e)}")
         else:
             st.info("表形式のデータは検出されませんでした")
     
@@ -277,39 +333,19 @@ if uploaded_file is not None:
         st.subheader("参加条件の抽出")
         
         # 参加条件のキーワード検索
-        keywords = ["参加資格", "入札参加資格", "応募資格", "資格要件", "参加条件", "入札参加要件"]
-        
-        found_sections = []
-        lines = full_text.split('\n')
-        
-        for i, line in enumerate(lines):
-            for keyword in keywords:
-                if keyword in line:
-                    start = max(0, i - 3)
-                    end = min(len(lines), i + 15)
-                    context = '\n'.join(lines[start:end])
-                    found_sections.append({
-                        'keyword': keyword,
-                        'line_number': i + 1,
-                        'context': context
-                    })
+        found_sections = find_sections(full_text, get_keyword_automaton(keywords))
         
         if found_sections:
-            st.success(f"✅ {len(found_sections)}箇所で参加条件関連のキーワードを発見")
-            
-            # 重複を除去
-            unique_sections = []
-            seen_contexts = set()
-            
-            for section in found_sections:
-                context_key = section['context'][:100]  # 最初の100文字で重複判定
-                if context_key not in seen_contexts:
-                    unique_sections.append(section)
-                    seen_contexts.add(context_key)
+            hit_count = sum(len(section.hits) for section in found_sections)
+            st.success(
+                f"✅ {hit_count}箇所で参加条件関連のキーワードを発見"
+                f"（{len(found_sections)}セクション）"
+            )
             
-            for i, section in enumerate(unique_sections[:10]):  # 最大10件表示
-                with st.expander(f"📍 {section['keyword']} (行 {section['line_number']})"):
-                    st.text(section['context'])
+            # 重なった範囲はまとめ済みなので、表示する分だけテキストを切り出す
+            for section in found_sections[:10]:  # 最大10件表示
+                with st.expander(f"📍 {'・'.join(section.keywords)} (行 {section.line_number})"):
+                    st.text(section.text(full_text))
         else:
             st.warning("参加条件に関するキーワードが見つかりませんでした")
 
@@ -1,15 +1,202 @@
+import pandas as pd
 import streamlit as st
 
+from extraction import (
+    BATCH_OUTPUT_DIR, PROJECT_ORDERS, ConditionIndex, ProjectRegistry, UploadSpool,
+    extract_all_content, extract_page_conditions
+)
+
 st.title("入札提案書作成支援システム")
 st.write("シンプルバージョン - テスト中")
 
+# 案件のストア（セッションをまたいで共有）
+@st.cache_resource
+def get_project_registry():
+    return ProjectRegistry()
+
+# 全案件の参加条件の類似検索（案件ストアに書き込みがあったら作り直す）
+@st.cache_resource(max_entries=1)
+def get_condition_index(revision):
+    return ConditionIndex(registry.all_conditions())
+
+# ほぼ同じ参加条件のグループ（類似度ごとに1回だけ計算）
+@st.cache_data(max_entries=8)
+def get_condition_groups(revision, threshold):
+    return get_condition_index(revision).grouped(threshold)
+
+def condition_sources(index, members, limit=5):
+    """参加条件が出てきた案件名（多い場合は件数）"""
+    projects = list(dict.fromkeys(index.conditions[m]['project'] for m in members))
+    more = f" ほか{len(projects) - limit}件" if len(projects) > limit else ""
+    return "、".join(projects[:limit]) + more
+
+# アップロードの書き出し先（セッションをまたいで共有）
+@st.cache_resource
+def get_upload_spool():
+    return UploadSpool()
+
+registry = get_project_registry()
+
 # 基本的な入力
-with st.form("basic_form"):
+with st.form("basic_form", clear_on_submit=True):
     project_name = st.text_input("案件名")
     client_name = st.text_input("発注者名")
+    deadline = st.date_input("提出期限", value=None)
+    pdf_file = st.file_uploader("入札説明書（任意）", type=['pdf'])
     submitted = st.form_submit_button("登録")
     
     if submitted and project_name:
-        st.success(f"案件「{project_name}」を登録しました！")
+        content = None
+        if pdf_file is not None:
+            # 参加条件と表を先に抽出する（読めないPDFでは案件を登録しない）
+            try:
+                with st.spinner('入札説明書を解析中...'):
+                    # アップロードはディスクに書き出して読む
+                    pdf_path, file_hash = get_upload_spool().spool(
+                        pdf_file, key=getattr(pdf_file, 'file_id', None)
+                    )
+                    content = extract_all_content(pdf_path)
+            except Exception as e:
+                st.error(f"PDF読み込みエラー: {str(e)}")
         
-st.info("このアプリは開発中です。機能は順次追加されます。")
\ No newline at end of file
+        if pdf_file is None or content is not None:
+            document = None
+            if content is not None:
+                full_text, page_contents, all_tables = content
+                document = {
+                    'doc_key': file_hash,
+                    'name': pdf_file.name,
+                    'pages': len(page_contents),
+                    'char_count': len(full_text),
+                    'conditions': extract_page_conditions(page_contents),
+                    'tables': [(record.page, record.index, record.rows) for record in all_tables]
+                }
+            # 案件と入札説明書はまとめて登録する
+            registry.create_project(project_name, client_name.strip(), deadline, document=document)
+            st.success(f"案件「{project_name}」を登録しました！")
+
+# 過去案件（発注者・提出期限・参加条件の分類で絞り込み）
+st.subheader("📚 過去案件")
+stats = registry.stats()
+st.caption(
+    f"案件 {stats['projects']:,}件 / 入札説明書 {stats['documents']:,}件 / "
+    f"参加条件 {stats['conditions']:,}件"
+)
+
+order_labels = {
+    'created': "登録日（新しい順）", 'deadline': "提出期限", 'client': "発注者", 'name': "案件名"
+}
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    client_filter = st.selectbox("発注者", ["すべて"] + registry.clients())
+with col2:
+    category_filter = st.selectbox("参加条件の分類", ["すべて"] + registry.categories())
+with col3:
+    name_filter = st.text_input("案件名に含む語")
+with col4:
+    order = st.selectbox("並べ替え", list(PROJECT_ORDERS), format_func=order_labels.get)
+
+col5, col6 = st.columns(2)
+with col5:
+    since = st.date_input("提出期限（から）", value=None)
+with col6:
+    until = st.date_input("提出期限（まで）", value=None)
+
+projects = registry.list_projects(
+    client=None if client_filter == "すべて" else client_filter,
+    category=None if category_filter == "すべて" else category_filter,
+    since=since,
+    until=until,
+    name=name_filter.strip() or None,
+    order=order,
+    limit=200
+)
+
+if projects:
+    df_projects = pd.DataFrame([{
+        '案件名': p['name'],
+        '発注者': p['client'] or "",
+        '提出期限': p['deadline'] or "",
+        '入札説明書': p['document_count'],
+        '参加条件': p['condition_count'],
+        '表': p['table_count']
+    } for p in projects])
+    st.dataframe(df_projects, use_container_width=True)
+    if len(projects) == 200:
+        st.caption("最初の200件を表示しています（条件で絞り込んでください）")
+    
+    # 選んだ案件の参加条件
+    selected = st.selectbox(
+        "参加条件を表示する案件",
+        range(len(projects)),
+        format_func=lambda i: f"{projects[i]['name']}（{projects[i]['client'] or '発注者未登録'}）"
+    )
+    conditions = registry.conditions(
+        projects[selected]['project_id'],
+        category=None if category_filter == "すべて" else category_filter
+    )
+    if conditions:
+        st.dataframe(pd.DataFrame([{
+            '入札説明書': c['document'],
+            'ページ': c['page'],
+            '分類': c['category'],
+            '参加条件': c['condition']
+        } for c in conditions]), use_container_width=True)
+    else:
+        st.info("参加条件は登録されていません")
+else:
+    st.info("該当する案件はありません")
+
+# 過去の案件に出てきた似た参加条件（回答の使い回しに）
+st.subheader("🔁 似た参加条件")
+revision = registry.revision()
+if stats['conditions']:
+    condition_index = get_condition_index(revision)
+    query = st.text_input("参加条件", placeholder="例: 過去5年間に同種業務の実績があること")
+    if query.strip():
+        similar = condition_index.similar(query, k=20)
+        if similar:
+            st.dataframe(pd.DataFrame([{
+                '類似度': round(s['score'], 3),
+                '参加条件': s['text'],
+                '出現回数': s['count'],
+                '案件': condition_sources(condition_index, s['members'])
+            } for s in similar]), use_container_width=True)
+        else:
+            st.info("似た参加条件はありません")
+    
+    with st.expander("よく出てくる参加条件（ほぼ同じ言い回しをまとめて集計）"):
+        threshold = st.slider("まとめる類似度", min_value=0.5, max_value=1.0, value=0.8, step=0.05)
+        with st.spinner('集計中...'):
+            groups = get_condition_groups(revision, threshold)
+        if groups:
+            st.dataframe(pd.DataFrame([{
+                '参加条件': g['text'],
+                '出現回数': g['count'],
+                '言い回し': g['variants'],
+                '案件': condition_sources(condition_index, g['members'])
+            } for g in groups[:200]]), use_container_width=True)
+        else:
+            st.info("複数回出てくる参加条件はありません")
+else:
+    st.info("参加条件が登録されていません（入札説明書つきで案件を登録してください）")
+
+# 一括処理（python -m extraction）の出力の取り込み
+with st.expander("📥 一括処理の出力を取り込む"):
+    # サーバーの任意の場所は読ませず、一括処理の出力ディレクトリの下だけを取り込む
+    st.caption("一括処理の出力ディレクトリ（既定は `抽出結果`、環境変数 `PROPOSAL_BATCH_OUTPUT_DIR` で変更）の下から取り込みます")
+    output_root = st.text_input("出力先ディレクトリ（空欄なら出力ディレクトリそのもの）", value="")
+    import_client = st.text_input("発注者名（任意）", key="import_client")
+    if st.button("取り込む"):
+        try:
+            with st.spinner('取り込み中...'):
+                imported = registry.import_batch_output(
+                    output_root.strip(), client=import_client.strip(), allowed_root=BATCH_OUTPUT_DIR
+                )
+            st.success(f"{imported['imported']}件の入札説明書を取り込みました")
+            if imported['skipped']:
+                st.warning(f"{imported['skipped']}件は出力が見つからないためスキップしました")
+        except (FileNotFoundError, ValueError) as e:
+            st.error(str(e))
+
+st.info("このアプリは開発中です。機能は順次追加されます。")
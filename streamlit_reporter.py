@@ -0,0 +1,59 @@
+"""
+抽出処理の進捗をStreamlitに表示するアダプター
+"""
+
+import streamlit as st
+
+from extraction import ExtractionReporter, find_keyword_lines
+
+
+class StreamlitReporter(ExtractionReporter):
+    """プログレスバーと、処理済みページの統計・見つかったキーワードを逐次表示"""
+
+    def __init__(self, debug_mode=False, keyword_automaton=None, show_tables=True):
+        self.debug_mode = debug_mode
+        self.keyword_automaton = keyword_automaton
+        self.show_tables = show_tables
+        self.progress_bar = None
+        self.live_area = st.empty()
+        self.totals = {'pages': 0, 'chars': 0, 'tables': 0}
+        self.hits = []
+
+    def start(self, total_pages):
+        st.write(f"📄 総ページ数: {total_pages}")
+        self.progress_bar = st.progress(0)
+
+    def page(self, page_data):
+        # 処理済みページの統計と見つかったキーワードを逐次表示
+        self.totals['pages'] += 1
+        self.totals['chars'] += page_data['char_count']
+        self.totals['tables'] += page_data.get('table_count', 0)
+        
+        if self.keyword_automaton is not None:
+            page_text = page_data['text']
+            for hit in find_keyword_lines(page_text, self.keyword_automaton):
+                line = page_text[hit['line_start']:hit['line_end']]
+                self.hits.append(f"P{page_data['page']}: {line.strip()}")
+        
+        with self.live_area.container():
+            cols = st.columns(3 if self.show_tables else 2)
+            cols[0].metric("処理済みページ", self.totals['pages'])
+            cols[1].metric("文字数", f"{self.totals['chars']:,}")
+            if self.show_tables:
+                cols[2].metric("表", self.totals['tables'])
+            for hit in self.hits[-5:]:
+                st.caption(f"🔍 {hit}")
+
+    def progress(self, done, total):
+        if self.progress_bar is not None and total:
+            self.progress_bar.progress(done / total)
+
+    def warning(self, message, level="warning"):
+        # 表単位の警告はデバッグモードのときだけ表示
+        if level == "warning" or self.debug_mode:
+            st.warning(message)
+
+    def finish(self):
+        if self.progress_bar is not None:
+            self.progress_bar.empty()
+        self.live_area.empty()
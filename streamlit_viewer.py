@@ -0,0 +1,104 @@
+"""
+全文のページ送り表示と、処理済みドキュメントの全文検索（Streamlit）
+画面に送るのは表示中の範囲（最大5000文字程度）だけなので、ドキュメントが大きくても再実行が重くなりません
+"""
+
+import time
+
+import streamlit as st
+
+from extraction import TextPager
+
+
+# 全文の表示範囲（ドキュメントごとに1回だけ分割）
+@st.cache_resource(max_entries=8)
+def get_text_pager(cache_key, _full_text):
+    return TextPager(_full_text)
+
+
+# 全文検索の結果（一致した範囲ごとの件数と前後の文字だけ）
+@st.cache_data(max_entries=64)
+def search_text(cache_key, query, _pager):
+    return _pager.search(query)
+
+
+def render_text_viewer(full_text, cache_key, key="viewer"):
+    """全文をページ送りで表示し、検索で一致した範囲に移動できるようにする"""
+    pager = get_text_pager(cache_key, full_text)
+    window_key = f"{key}_window"
+    
+    # 別のドキュメントに切り替わったら先頭から表示
+    if st.session_state.get(f"{key}_document") != cache_key:
+        st.session_state[f"{key}_document"] = cache_key
+        st.session_state[window_key] = 1
+        st.session_state.pop(f"{key}_jump", None)
+    
+    query = st.text_input("🔍 全文を検索（一致した範囲に移動します）", key=f"{key}_query").strip()
+    if query:
+        total, hits = search_text(cache_key, query, pager)
+        if hits:
+            shown = sum(hit['count'] for hit in hits)
+            more = f"（最初の{len(hits)}範囲を表示）" if total > shown else ""
+            st.caption(f"{total:,}件一致・{len(hits)}範囲{more}")
+            selected = st.selectbox(
+                "一致した範囲",
+                range(len(hits)),
+                format_func=lambda i: (
+                    f"P{hits[i]['page']}（{hits[i]['count']}件）: …{hits[i]['snippet']}…"
+                ),
+                # 検索語が変わったら最初の一致から選び直す
+                key=f"{key}_hit:{query}"
+            )
+            # 選んだ一致が変わったときだけ移動する（ページ送りの操作を上書きしない）
+            jump = (query, selected)
+            if st.session_state.get(f"{key}_jump") != jump:
+                st.session_state[f"{key}_jump"] = jump
+                st.session_state[window_key] = hits[selected]['window'] + 1
+        else:
+            st.info("一致する箇所はありません")
+    
+    st.session_state[window_key] = min(max(st.session_state.get(window_key, 1), 1), len(pager))
+    number = st.number_input(
+        f"表示する範囲（全{len(pager)}範囲）",
+        min_value=1,
+        max_value=len(pager),
+        step=1,
+        key=window_key
+    )
+    
+    window = pager.window(number - 1)
+    label = f"ページ {window['page']}" if window['page'] is not None else "全文"
+    st.text_area(
+        f"{label}（{window['start']:,}〜{window['end']:,}文字目 / 全{len(full_text):,}文字）",
+        window['text'],
+        height=500
+    )
+
+
+def render_index_search(index, key="index_search", limit=50):
+    """処理済みの入札説明書（FullTextIndex）を検索し、一致したページを表示する"""
+    stats = index.stats()
+    query = st.text_input(
+        f"処理済みの入札説明書（{stats['documents']:,}件）から検索",
+        placeholder="例: 主任技術者",
+        key=key
+    )
+    if not query.strip():
+        return
+    if len("".join(query.split())) < 2:
+        st.caption("2文字以上で検索してください")
+        return
+    
+    started = time.perf_counter()
+    hits = index.search(query, limit=limit)
+    elapsed = time.perf_counter() - started
+    if not hits:
+        st.info("一致するページはありません")
+        return
+    
+    more = "以上" if len(hits) >= limit else ""
+    st.caption(f"{len(hits)}ページ{more}で一致（{elapsed * 1000:.0f}ms）")
+    for hit in hits:
+        name = hit['name'] or hit['doc_key'][:12]
+        st.markdown(f"**{name}** ページ {hit['page']}（{len(hit['positions'])}件）")
+        st.caption(f"…{hit['snippet']}…")
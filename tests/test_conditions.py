@@ -0,0 +1,70 @@
+import random
+import re
+
+from extraction.conditions import (
+    CONDITION_CATEGORIES, ConditionMatcher, ConditionScanner, extract_conditions
+)
+
+
+def _reference_classify(line):
+    """元の実装と同じ、カテゴリごとの正規表現（先頭キーワード.*後続キーワード）での分類"""
+    for name, heads, tails in CONDITION_CATEGORIES:
+        pattern = '(' + '|'.join(map(re.escape, heads)) + ')'
+        if tails is not None:
+            pattern += '.*(' + '|'.join(map(re.escape, tails)) + ')'
+        if re.search(pattern, line):
+            return name
+    return None
+
+
+def _random_lines(count, seed=0):
+    rng = random.Random(seed)
+    words = sorted({k for _, heads, tails in CONDITION_CATEGORIES for k in heads + (tails or [])})
+    # キーワードの一部だけの文字列も混ぜて、重なり・途中までの一致を作る
+    pieces = words + [word[:1] for word in words] + [word[1:] for word in words] + ["、", "の", "A"]
+    return ["".join(rng.choice(pieces) for _ in range(rng.randint(0, 8))) for _ in range(count)]
+
+
+def test_classify_matches_regex_reference():
+    matcher = ConditionMatcher()
+    for line in _random_lines(5000):
+        assert matcher.classify(line) == _reference_classify(line), line
+
+
+def test_classify_examples():
+    matcher = ConditionMatcher()
+    assert matcher.classify("建設業の許可を有する者") == '資格'
+    assert matcher.classify("同種業務の履行実績があること") == '実績'
+    # 後続キーワードが先頭キーワードより前にあるだけでは該当しない
+    assert matcher.classify("以上の実績") is None
+    assert matcher.classify("資本金1億円以上") == '財務'
+    assert matcher.classify("会社概要") is None
+    assert matcher.matches("ISO9001の認証を取得していること")
+    assert not matcher.matches("")
+
+
+def test_scanner_feed_by_page_matches_whole_text():
+    text = "\n".join([
+        "1. 入札参加資格",
+        "代表者が役員に就いていないもの",
+        "（1）建設業法の許可を有する者",
+        "（2）過去5年間に同種業務の実績があること",
+        "2. 入札説明書の交付",
+        "本店を県内に有する者であること。",
+        "技術者を現場に常駐させることができる者",
+    ])
+    whole = extract_conditions(text)
+    # 参加資格のセクション内の行は、パターンに該当しなくても含める
+    assert whole[:3] == [
+        "・ 代表者が役員に就いていないもの",
+        "（1）建設業法の許可を有する者",
+        "（2）過去5年間に同種業務の実績があること",
+    ]
+    # 。で終わる番号のない行は含めない
+    assert not any("本店" in condition for condition in whole)
+
+    scanner = ConditionScanner()
+    lines = text.split("\n")
+    for start in range(0, len(lines), 2):
+        scanner.feed("\n".join(lines[start:start + 2]))
+    assert scanner.conditions == whole
@@ -0,0 +1,67 @@
+import random
+
+import numpy as np
+import pytest
+
+from extraction.dedup import (
+    MinHasher, NearDuplicateIndex, near_duplicate_groups, shingle_hashes, signature_similarity
+)
+
+
+def _jaccard(a, b):
+    a, b = set(shingle_hashes(a).tolist()), set(shingle_hashes(b).tolist())
+    return len(a & b) / len(a | b)
+
+
+def _section(rng, length=200):
+    return "".join(rng.choice("入札参加資格の条件を満たす者はこと技術者配置実績本店") for _ in range(length))
+
+
+def test_near_duplicate_groups_empty_input():
+    assert near_duplicate_groups([]) == []
+    # 空のテキストはそれぞれ自分だけのグループ（空白だけのものは同じテキストとしてまとめる）
+    assert near_duplicate_groups(["", "abc"]) == [[0], [1]]
+    assert near_duplicate_groups(["", "abc", "  ", "abc", "\n"]) == [[0, 2, 4], [1, 3]]
+
+
+def test_near_duplicate_groups_ignores_whitespace_and_width():
+    texts = ["参加資格 ＡＢＣ", "参加資格abc", "参加\n資格ABC", "提出書類"]
+    assert near_duplicate_groups(texts) == [[0, 1, 2], [3]]
+
+
+def test_near_duplicate_groups_finds_edited_copies():
+    rng = random.Random(0)
+    originals = [_section(rng) for _ in range(20)]
+    texts = list(originals)
+    for i, text in enumerate(originals):
+        # 1文字だけ書き換えた写し
+        j = rng.randrange(len(text))
+        texts.append(text[:j] + "★" + text[j + 1:])
+    groups = near_duplicate_groups(texts, threshold=0.8)
+    assert sorted(groups) == [[i, i + 20] for i in range(20)]
+
+
+def test_signature_estimates_jaccard():
+    rng = random.Random(1)
+    hasher = MinHasher(num_perm=256)
+    base = _section(rng, 300)
+    for cut in (30, 100, 200):
+        other = base[:cut] + _section(rng, 300 - cut)
+        estimate = signature_similarity(hasher.signature(base), hasher.signature(other))
+        assert estimate == pytest.approx(_jaccard(base, other), abs=0.1)
+    assert hasher.signature("") is None
+    assert hasher.signatures(["", " "]) == [None, None]
+
+
+def test_index_query_threshold():
+    rng = random.Random(2)
+    index = NearDuplicateIndex(threshold=0.7)
+    base = _section(rng)
+    assert index.add("base", base)
+    assert not index.add("empty", "")
+    assert len(index) == 1
+    assert [key for key, _ in index.query(base)] == ["base"]
+    assert index.query(_section(rng)) == []
+    assert index.query("") == []
+    signature = index.signature(base)
+    assert np.array_equal(signature, MinHasher().signature(base))
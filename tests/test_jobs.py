@@ -0,0 +1,154 @@
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from benchmarks.synthetic_pdf import generate_pdf
+from extraction import extract_all_content
+from extraction.jobs import JobQueue, JobWorkerPool, load_job_content, process_owner, run_job
+from extraction.search_index import FullTextIndex
+from extraction.store import ExtractionStore
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"))
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(generate_pdf(4, "mixed", seed=1))
+    return str(path)
+
+
+def test_submit_joins_active_job_with_same_cache_key(queue):
+    first = queue.submit("a.pdf", name="a.pdf", cache_key="k", extract_tables=True)
+    assert queue.submit("a.pdf", cache_key="k") == first
+    other = queue.submit("b.pdf", cache_key="other")
+    assert other != first
+    assert queue.counters() == {'submitted': 2, 'joined': 1}
+
+    job = queue.get(first)
+    assert job['status'] == 'queued'
+    assert job['options'] == {'extract_tables': True}
+    assert queue.get("missing") is None
+
+    # 終わったジョブには合流しない
+    queue.finish(first)
+    assert queue.submit("a.pdf", cache_key="k") != first
+
+
+def test_claim_in_submission_order(queue):
+    first = queue.submit("a.pdf")
+    second = queue.submit("b.pdf")
+    assert queue.claim() == first
+    assert queue.get(first)['status'] == 'running'
+    assert queue.claim() == second
+    assert queue.claim() is None
+
+
+def test_pages_progress_and_status(queue):
+    job_id = queue.submit("a.pdf")
+    queue.claim()
+    for page in (2, 1, 3):
+        queue.add_page(job_id, {'page': page, 'total_pages': 3, 'text': str(page)})
+    assert [r['page'] for r in queue.page_results(job_id)] == [1, 2, 3]
+    assert [r['page'] for r in queue.page_results(job_id, start_page=3)] == [3]
+    job = queue.get(job_id)
+    assert (job['done_pages'], job['total_pages']) == (3, 3)
+
+    queue.fail(job_id, "壊れたPDF")
+    job = queue.get(job_id)
+    assert job['status'] == 'failed' and job['error'] == "壊れたPDF"
+    assert queue.stats() == {'failed': 1}
+
+
+def test_requeue_running_and_prune(queue):
+    job_id = queue.submit("a.pdf")
+    queue.claim()
+    queue.add_page(job_id, {'page': 1})
+    # このプロセスが処理中で、生存の記録も新しい
+    assert queue.requeue_running() == 0
+    assert queue.requeue_running(timeout=-1) == 1
+    job = queue.get(job_id)
+    assert (job['status'], job['done_pages']) == ('queued', 0)
+    assert queue.page_results(job_id) == []
+
+    queue.claim()
+    queue.finish(job_id)
+    queue.prune()
+    assert queue.get(job_id) is not None
+    queue.prune(max_age=-1)
+    assert queue.get(job_id) is None
+
+
+def _dead_owner():
+    process = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                             capture_output=True, text=True, check=True)
+    return f"{socket.gethostname()}:{process.stdout.strip()}:deadbeef"
+
+
+def test_requeue_only_abandoned_jobs(queue):
+    live = queue.submit("live.pdf")
+    dead = queue.submit("dead.pdf")
+    restarted = queue.submit("restarted.pdf")
+    other_host = queue.submit("other.pdf")
+    assert queue.claim() == live
+    assert queue.claim(owner=_dead_owner()) == dead
+    # 同じプロセスIDで起動し直した前のプロセス
+    assert queue.claim(owner=process_owner().rsplit(":", 1)[0] + ":old") == restarted
+    assert queue.claim(owner="other-host:1:abc") == other_host
+    for job_id in (live, dead, restarted, other_host):
+        queue.add_page(job_id, {'page': 1})
+
+    assert queue.requeue_running() == 2
+    assert [queue.get(job_id)['status'] for job_id in (live, dead, restarted, other_host)] == \
+        ['running', 'queued', 'queued', 'running']
+    assert len(queue.page_results(live)) == 1
+    assert queue.page_results(dead) == []
+
+    # 他のホストのジョブは生存の記録が途絶えたらやり直す
+    queue.heartbeat([live])
+    assert queue.requeue_running(timeout=-1) == 2
+    assert queue.get(other_host)['owner'] is None
+
+
+def test_run_job_stores_result(tmp_path, queue, pdf_path):
+    store_path = str(tmp_path / "extractions.sqlite3")
+    index_path = str(tmp_path / "index.sqlite3")
+    job_id = queue.submit(pdf_path, name="doc.pdf", cache_key="hash:settings")
+    queue.claim()
+    run_job(queue.path, job_id, store_path, index_path)
+
+    assert queue.get(job_id)['status'] == 'done'
+    expected = extract_all_content(pdf_path)
+    content = load_job_content(queue, job_id)
+    assert content[0] == expected[0]
+    assert ExtractionStore(store_path).get("hash:settings")[0] == expected[0]
+    assert "hash" in FullTextIndex(index_path)
+
+
+def test_run_job_records_failure(queue, tmp_path):
+    job_id = queue.submit(str(tmp_path / "missing.pdf"))
+    queue.claim()
+    run_job(queue.path, job_id, str(tmp_path / "extractions.sqlite3"))
+    job = queue.get(job_id)
+    assert job['status'] == 'failed' and job['error']
+
+
+def test_worker_pool_processes_jobs(tmp_path, queue, pdf_path):
+    pool = JobWorkerPool(
+        queue, workers=1, store_path=str(tmp_path / "extractions.sqlite3"), poll_interval=0.05
+    ).start()
+    try:
+        job_id = queue.submit(pdf_path, cache_key="hash:settings")
+        deadline = time.time() + 60
+        while queue.get(job_id)['status'] in ('queued', 'running') and time.time() < deadline:
+            time.sleep(0.1)
+    finally:
+        pool.stop()
+    assert queue.get(job_id)['status'] == 'done'
+    assert load_job_content(queue, job_id)[0] == extract_all_content(pdf_path)[0]
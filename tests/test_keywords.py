@@ -0,0 +1,72 @@
+import random
+
+from extraction.keywords import KeywordAutomaton
+from extraction.sections import PARTICIPATION_KEYWORDS, find_sections
+
+
+def _brute_force_matches(text, keywords):
+    return sorted(
+        (i, i + len(keyword), keyword)
+        for keyword in set(keywords)
+        for i in range(len(text))
+        if text.startswith(keyword, i)
+    )
+
+
+def _random_text(rng, alphabet, length):
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def test_iter_matches_finds_every_occurrence():
+    rng = random.Random(0)
+    for _ in range(300):
+        keywords = [_random_text(rng, "abc", rng.randint(1, 4)) for _ in range(rng.randint(1, 6))]
+        text = _random_text(rng, "abcd", rng.randint(0, 60))
+        automaton = KeywordAutomaton(keywords)
+        assert sorted(automaton.iter_matches(text)) == _brute_force_matches(text, keywords)
+        assert automaton.contains(text) == bool(_brute_force_matches(text, keywords))
+
+
+def test_find_all_keeps_longest_overlapping_keyword():
+    automaton = KeywordAutomaton(PARTICIPATION_KEYWORDS)
+    text = "入札参加資格と参加資格"
+    assert automaton.find_all(text) == [(0, 6, "入札参加資格"), (7, 11, "参加資格")]
+    assert (2, 6, "参加資格") in automaton.find_all(text, collapse=False)
+
+
+def test_empty_keywords():
+    automaton = KeywordAutomaton(["", ""])
+    assert automaton.find_all("参加資格") == []
+    assert not automaton.contains("参加資格")
+
+
+def _brute_force_sections(text, keywords, before, after):
+    """キーワードを含む行の前後の行範囲を、重なる・隣接するものをまとめて返す"""
+    lines = text.split("\n")
+    spans = []
+    for i, line in enumerate(lines):
+        if not any(keyword in line for keyword in keywords):
+            continue
+        start, end = max(0, i - before), i + after
+        if spans and start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+    return ["\n".join(lines[start:end]) for start, end in spans]
+
+
+def test_find_sections_matches_line_based_reference():
+    rng = random.Random(1)
+    filler = ["一般事項", "入札説明書", "提出書類", "", "参加", "資格", "要件"]
+    automaton = KeywordAutomaton(PARTICIPATION_KEYWORDS)
+    for _ in range(200):
+        lines = [
+            rng.choice(PARTICIPATION_KEYWORDS) + rng.choice(filler) if rng.random() < 0.1
+            else rng.choice(filler) + rng.choice(filler)
+            for _ in range(rng.randint(0, 80))
+        ]
+        text = "\n".join(lines)
+        before, after = rng.randint(0, 4), rng.randint(1, 20)
+        sections = find_sections(text, automaton, before=before, after=after)
+        assert [section.text(text) for section in sections] == \
+            _brute_force_sections(text, PARTICIPATION_KEYWORDS, before, after)
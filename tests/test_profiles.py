@@ -0,0 +1,55 @@
+import io
+
+import pdfplumber
+
+import benchmarks.synthetic_pdf as synthetic_pdf
+from extraction.pages import needs_table_scan
+from extraction.profiles import sample_pages, tune_table_settings
+
+
+def _horizontal_rule_table(rng, kind, page_number):
+    """縦罫線のない表（行の区切りだけ横罫線）のページ"""
+    ops, _ = synthetic_pdf._table_ops(rng, 50, 700, 6, 4)
+    # 縦罫線（x座標が同じ線）を除く
+    ops = [op for op in ops if not (op.endswith(" l S") and op.split()[0] == op.split()[3])]
+    return "\n".join(ops).encode()
+
+
+def _text_page(rng, kind, page_number):
+    return "\n".join(synthetic_pdf._text_ops(["本文だけのページ"], 50, 700)[0]).encode()
+
+
+def _open(page_content, pages=4):
+    original = synthetic_pdf._page_content
+    synthetic_pdf._page_content = page_content
+    try:
+        data = synthetic_pdf.generate_pdf(pages, "tables", seed=5)
+    finally:
+        synthetic_pdf._page_content = original
+    return pdfplumber.open(io.BytesIO(data))
+
+
+def test_needs_table_scan_counts_only_line_directions():
+    lines_text = {"vertical_strategy": "text", "horizontal_strategy": "lines"}
+    with _open(_horizontal_rule_table) as pdf:
+        page = pdf.pages[0]
+        assert page.lines and all(line['top'] == line['bottom'] for line in page.lines)
+        assert not needs_table_scan(page)
+        assert needs_table_scan(page, lines_text)
+        assert needs_table_scan(page, {"vertical_strategy": "text", "horizontal_strategy": "text"})
+    with _open(_text_page) as pdf:
+        assert not needs_table_scan(pdf.pages[0], lines_text)
+
+
+def test_horizontal_rule_tables_are_sampled_and_tuned_to_lines_text():
+    with _open(_horizontal_rule_table) as pdf:
+        assert len(sample_pages(pdf)) == 4
+        name, settings, scores = tune_table_settings(pdf)
+    assert name == 'lines_text'
+    assert scores['lines_text'] > scores['default']
+
+
+def test_text_only_pages_are_not_sampled():
+    with _open(_text_page) as pdf:
+        assert sample_pages(pdf) == []
+        assert tune_table_settings(pdf) == (None, None, {})
@@ -0,0 +1,91 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from extraction.projects import ProjectRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ProjectRegistry(str(tmp_path / "projects.sqlite3"))
+
+
+def _document(condition):
+    return {
+        'doc_key': "hash", 'name': "説明書.pdf", 'pages': 1, 'char_count': 10,
+        'conditions': [{'page': 1, 'category': '資格', 'condition': condition}]
+    }
+
+
+def test_create_project_with_document(registry):
+    project_id = registry.create_project("庁舎清掃", client="A市", document=_document("許可を有する"))
+    assert registry.get_project(project_id)['client'] == "A市"
+    assert [c['condition'] for c in registry.conditions(project_id)] == ["許可を有する"]
+    assert registry.stats() == {'projects': 1, 'documents': 1, 'conditions': 1}
+
+
+def test_revision_changes_on_every_write(registry):
+    revisions = [registry.revision()]
+    project_id = registry.create_project("庁舎清掃", document=_document("許可を有する"))
+    revisions.append(registry.revision())
+
+    # 件数が同じまま参加条件が置き換わっても変わる
+    document = _document("実績があること")
+    registry.add_document(project_id, document['doc_key'], document['name'],
+                          conditions=document['conditions'])
+    assert registry.stats()['conditions'] == 1
+    revisions.append(registry.revision())
+
+    registry.delete_project(project_id)
+    revisions.append(registry.revision())
+    assert revisions == sorted(set(revisions))
+
+    # 書き込みがなければ変わらない
+    registry.list_projects()
+    assert registry.revision() == revisions[-1]
+
+
+def _batch_output(root, name="入札A"):
+    """一括処理の出力（manifest.json とドキュメント1件）を作る"""
+    output_root = root / name
+    document_dir = output_root / "doc1"
+    document_dir.mkdir(parents=True)
+    (document_dir / "result.json").write_text(
+        json.dumps({'file': "説明書.pdf", 'pages': 1, 'char_count': 10, 'tables': []}), encoding='utf-8'
+    )
+    (document_dir / "conditions.json").write_text(
+        json.dumps([{'page': 1, 'category': '資格', 'condition': "許可を有する"}], ensure_ascii=False),
+        encoding='utf-8'
+    )
+    (output_root / "manifest.json").write_text(
+        json.dumps({'hash1': {'file': "説明書.pdf", 'output': str(document_dir)}}), encoding='utf-8'
+    )
+    return output_root
+
+
+def test_import_batch_output_under_allowed_root(registry, tmp_path):
+    allowed_root = tmp_path / "抽出結果"
+    _batch_output(allowed_root)
+    imported = registry.import_batch_output("入札A", allowed_root=str(allowed_root))
+    assert imported == {'imported': 1, 'skipped': 0}
+    assert registry.stats() == {'projects': 1, 'documents': 1, 'conditions': 1}
+
+
+def test_import_batch_output_rejects_paths_outside_allowed_root(registry, tmp_path):
+    allowed_root = tmp_path / "抽出結果"
+    allowed_root.mkdir()
+    outside = _batch_output(tmp_path, name="外")
+    for output_root in ("../外", str(outside)):
+        with pytest.raises(ValueError):
+            registry.import_batch_output(output_root, allowed_root=str(allowed_root))
+    assert registry.stats()['documents'] == 0
+
+
+def test_import_projects_does_not_load_batch():
+    code = "import sys, extraction.projects; print('extraction.batch' in sys.modules)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "False"
@@ -0,0 +1,125 @@
+import os
+
+import pytest
+
+import benchmarks.synthetic_pdf as synthetic_pdf
+from extraction import extract_all_content
+from extraction.revisions import (
+    PageResultStore, compare_with_previous, diff_with_previous, extract_all_content_incremental,
+    record_version
+)
+
+
+def _generate(tmp_path, name, pages, revise=None):
+    """合成PDFを書き出す（revise(ページ番号, 内容) で一部のページを書き換える）"""
+    original = synthetic_pdf._page_content
+
+    def page_content(rng, kind, page_number):
+        content = original(rng, kind, page_number)
+        return revise(page_number, content) if revise else content
+
+    synthetic_pdf._page_content = page_content
+    try:
+        data = synthetic_pdf.generate_pdf(pages, "text", seed=3)
+    finally:
+        synthetic_pdf._page_content = original
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def _add_line(page_number, content):
+    # 前の版にない文字を含む行を足す（共有フォントのToUnicodeが変わる）
+    if page_number != 5:
+        return content
+    line = synthetic_pdf._text_ops(["鬱蒼とした麒麟の檸檬"], 50, 40)[0][0]
+    return content + b"\n" + line.encode()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PageResultStore(str(tmp_path / "pages.sqlite3"))
+
+
+def test_incremental_matches_full_extraction(tmp_path, store):
+    path = _generate(tmp_path, "v1.pdf", 6)
+    full_text, page_contents, _ = extract_all_content_incremental(path, store)
+    expected_text, expected_pages, _ = extract_all_content(path)
+    assert full_text == expected_text
+    assert [p['text'] for p in page_contents] == [p['text'] for p in expected_pages]
+    assert not any(p['reused'] for p in page_contents)
+
+
+def test_revision_with_new_glyphs_reuses_unchanged_pages(tmp_path, store):
+    v1 = _generate(tmp_path, "v1.pdf", 20)
+    v2 = _generate(tmp_path, "v2.pdf", 20, revise=_add_line)
+    extract_all_content_incremental(v1, store)
+
+    full_text, page_contents, _ = extract_all_content_incremental(v2, store)
+    reused = [p['page'] for p in page_contents if p['reused']]
+    assert reused == [n for n in range(1, 21) if n != 5]
+    assert "鬱蒼とした麒麟の檸檬" in page_contents[4]['text']
+    assert full_text == extract_all_content(v2)[0]
+
+
+def test_compare_with_previous_reports_changed_page(tmp_path, store):
+    v1 = _generate(tmp_path, "v1.pdf", 8)
+    v2 = _generate(tmp_path, "v2.pdf", 8, revise=_add_line)
+    assert compare_with_previous(store, "v1", "v1.pdf", extract_all_content_incremental(v1, store)) \
+        == (None, None)
+
+    previous, diff = compare_with_previous(
+        store, "v2", "v2.pdf", extract_all_content_incremental(v2, store)
+    )
+    assert previous['doc_key'] == "v1"
+    assert diff['pages'] == [{'status': 'changed', 'old_pages': [5], 'new_pages': [5]}]
+    assert diff['unchanged_pages'] == 7
+
+
+def test_find_previous_requires_shared_pages(store):
+    store.put_version("old", "s", "old.pdf", ["a", "b", "c", "d"])
+    store.put_version("blank", "s", "blank.pdf", ["blank"] + ["x%d" % i for i in range(9)])
+
+    previous = store.find_previous("s", ["a", "b", "c", "e"])
+    assert previous['doc_key'] == "old"
+    assert previous['shared_pages'] == 3
+
+    # 白紙のページだけが一致するドキュメントは前の版にしない
+    assert store.find_previous("s", ["blank", "p", "q"]) is None
+    assert store.find_previous("s", ["blank", "x0"]) is None
+    assert store.find_previous("s", ["a", "b", "c", "d"], exclude="old") is None
+    assert store.find_previous("other", ["a", "b", "c", "d"]) is None
+
+
+def test_page_store_put_and_get_many(tmp_path):
+    store = PageResultStore(str(tmp_path / "pages.sqlite3"), max_bytes=10 ** 6)
+    store.put_many("s", {"a": {'page': 1, 'text': "A"}, "b": {'page': 2, 'text': "B"}})
+    assert store.get_many("s", ["a", "b", "c", "a"]) == {
+        "a": {'page': 1, 'text': "A"}, "b": {'page': 2, 'text': "B"}
+    }
+    # 設定が違えば別の結果
+    assert store.get_many("t", ["a"]) == {}
+    assert store.stats()['pages'] == 2
+
+
+def test_page_store_evicts_least_recently_used(tmp_path):
+    store = PageResultStore(str(tmp_path / "pages.sqlite3"), max_bytes=10 ** 6)
+    store.put_many("s", {"a": os.urandom(100000), "b": os.urandom(100000)})
+    store.get_many("s", ["a"])
+    store.max_bytes = store.stats()['bytes'] + 100
+    store.put_many("s", {"c": os.urandom(100000)})
+    assert set(store.get_many("s", ["a", "b", "c"])) == {"a", "c"}
+
+
+def test_diff_with_previous_does_not_record(tmp_path, store):
+    v1 = _generate(tmp_path, "v1.pdf", 6)
+    v2 = _generate(tmp_path, "v2.pdf", 6, revise=_add_line)
+    assert record_version(store, "v1", "v1.pdf", extract_all_content_incremental(v1, store))
+    content = extract_all_content_incremental(v2, store)
+
+    previous, diff = diff_with_previous(store, "v2", content)
+    assert previous['doc_key'] == "v1"
+    assert diff['unchanged_pages'] == 5
+    assert store.stats()['versions'] == 1
+    # 設定が違えば前の版にしない
+    assert diff_with_previous(store, "v2", content, extract_tables=False) == (None, None)
@@ -0,0 +1,61 @@
+import pytest
+
+from extraction.search_index import FullTextIndex, normalize_text
+
+
+def _pages(*texts):
+    return [
+        {'page': number, 'text': text, 'tables': [], 'char_count': len(text)}
+        for number, text in enumerate(texts, 1)
+    ]
+
+
+@pytest.fixture
+def index(tmp_path):
+    return FullTextIndex(str(tmp_path / "index.sqlite3"))
+
+
+def test_search_finds_pages_with_positions(index):
+    index.add_document("doc1", "説明書A.pdf", _pages(
+        "監理技術者を配置すること。主任技術者でもよい。",
+        "",
+        "主任技術者の資格要件\n主任技術者",
+    ))
+    hits = index.search("主任技術者")
+    assert [(hit['doc_key'], hit['page']) for hit in hits] == [("doc1", 1), ("doc1", 3)]
+    assert hits[0]['positions'] == [13]
+    assert hits[1]['positions'] == [0, 11]
+    assert "\n" not in hits[1]['snippet']
+    # 空のページは登録しない
+    assert index.stats() == {'documents': 1, 'pages': 2}
+
+
+def test_search_requires_grams_in_order(index):
+    index.add_document("doc1", "a.pdf", _pages("技術者主任"))
+    # 2-gramは全てあるが、並びが違う
+    assert index.search("者主任技術") == []
+    assert index.search("主") == []
+    assert index.search("  ") == []
+
+
+def test_search_ignores_width_and_case(index):
+    index.add_document("doc1", "a.pdf", _pages("ＩＳＯ９００１の認証を取得"))
+    assert [hit['page'] for hit in index.search("iso9001")] == [1]
+    assert normalize_text("ＡＢＣ１２３") == "abc123"
+
+
+def test_newer_documents_first_and_replace(index):
+    index.add_document("old", "old.pdf", _pages("入札参加資格"))
+    index.add_document("new", "new.pdf", _pages("入札参加資格"))
+    assert [hit['doc_key'] for hit in index.search("参加資格")] == ["new", "old"]
+    assert [hit['doc_key'] for hit in index.search("参加資格", limit=1)] == ["new"]
+
+    # 同じドキュメントを追加すると置き換える
+    index.add_document("old", "old.pdf", _pages("提出期限"))
+    assert [hit['doc_key'] for hit in index.search("参加資格")] == ["new"]
+    assert [doc['doc_key'] for doc in index.documents()] == ["old", "new"]
+
+    assert index.remove_document("new")
+    assert not index.remove_document("new")
+    assert "new" not in index and "old" in index
+    assert index.search("参加資格") == []
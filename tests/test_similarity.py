@@ -0,0 +1,116 @@
+import math
+import random
+
+import pytest
+
+from extraction.similarity import ConditionIndex, condition_key, condition_ngrams
+
+
+def _vectors(conditions):
+    """比較用の参加条件ごとのTF-IDFベクトル（辞書）を素直に計算する"""
+    keys = list(dict.fromkeys(condition_key(text) for text in conditions))
+    grams = [condition_ngrams(key) for key in keys]
+    df = {}
+    for counts in grams:
+        for gram in counts:
+            df[gram] = df.get(gram, 0) + 1
+
+    def idf(gram):
+        return math.log((1 + len(keys)) / (1 + df.get(gram, 0))) + 1
+
+    def vector(counts):
+        weights = {gram: (1 + math.log(count)) * idf(gram) for gram, count in counts.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {gram: w / norm for gram, w in weights.items()} if norm else {}
+
+    return keys, [vector(counts) for counts in grams], vector
+
+
+def _cosine(a, b):
+    return sum(w * b.get(gram, 0.0) for gram, w in a.items())
+
+
+def _conditions(count, seed=0):
+    rng = random.Random(seed)
+    base = [
+        "建設業法の許可を有すること", "過去5年間に同種業務の実績があること",
+        "監理技術者を専任で配置できること", "県内に本店を有すること",
+        "ISO9001の認証を取得していること", "会社更生法の適用を受けていないこと",
+    ]
+    conditions = []
+    for _ in range(count):
+        text = rng.choice(base)
+        if rng.random() < 0.5:
+            # 言い回しを少し変える
+            i = rng.randrange(len(text))
+            text = text[:i] + rng.choice("のをにが") + text[i + 1:]
+        conditions.append(rng.choice(["", "（1）", "2. ", "・"]) + text)
+    return conditions
+
+
+def test_condition_key_ignores_numbers_and_width():
+    assert condition_key("（１）ＩＳＯ ９００１ を取得") == condition_key("2. ISO9001を取得")
+    assert condition_key("①本店を有すること") == "本店を有すること"
+
+
+def test_similar_scores_match_brute_force():
+    conditions = _conditions(300)
+    index = ConditionIndex(conditions)
+    keys, vectors, query_vector = _vectors(conditions)
+    assert index.keys == keys
+
+    for query in ["建設業の許可を有すること", "本店を県内に有すること", "同種業務の実績", "無関係な文"]:
+        query_vec = query_vector(condition_ngrams(condition_key(query)))
+        expected = sorted(
+            ((_cosine(query_vec, vector), key) for key, vector in zip(keys, vectors)),
+            reverse=True
+        )
+        results = index.similar(query, k=5, min_score=0.3)
+        expected = [(score, key) for score, key in expected if score >= 0.3][:5]
+        assert [r['score'] for r in results] == pytest.approx([score for score, _ in expected])
+        for result in results:
+            assert all(condition_key(conditions[m]) == condition_key(conditions[result['members'][0]])
+                       for m in result['members'])
+
+
+def test_similar_with_dict_conditions_and_empty_query():
+    index = ConditionIndex([{'condition': "（1）本店を有すること"}, {'condition': "本店を有すること"}])
+    results = index.similar("本店を有すること")
+    assert results[0]['text'] == "本店を有すること"
+    assert results[0]['count'] == 2
+    assert results[0]['score'] == pytest.approx(1.0)
+    assert index.similar("") == []
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.8, 0.95])
+def test_grouped_matches_brute_force_components(threshold):
+    conditions = _conditions(400, seed=int(threshold * 100))
+    index = ConditionIndex(conditions)
+    keys, vectors, _ = _vectors(conditions)
+
+    # 類似度が threshold 以上の組でつながるものをまとめる
+    parent = list(range(len(keys)))
+
+    def find(i):
+        while parent[i] != i:
+            i = parent[i]
+        return i
+
+    for i in range(len(keys)):
+        for j in range(i + 1, len(keys)):
+            if _cosine(vectors[i], vectors[j]) >= threshold - 1e-9:
+                parent[find(j)] = find(i)
+    key_ids = {key: i for i, key in enumerate(keys)}
+    expected = {}
+    for position, text in enumerate(conditions):
+        expected.setdefault(find(key_ids[condition_key(text)]), []).append(position)
+    expected = sorted(members for members in expected.values() if len(members) >= 2)
+
+    groups = index.grouped(threshold)
+    assert sorted(group['members'] for group in groups) == expected
+    assert [group['count'] for group in groups] == sorted((g['count'] for g in groups), reverse=True)
+    assert all(group['count'] == len(group['members']) for group in groups)
+
+
+def test_grouped_empty():
+    assert ConditionIndex([]).grouped() == []
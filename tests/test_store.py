@@ -0,0 +1,57 @@
+import os
+import sqlite3
+
+import pytest
+
+from extraction.store import ExtractionStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "extractions.sqlite3")
+
+
+def test_put_and_get(path):
+    store = ExtractionStore(path)
+    assert store.get("a") is None
+    value = ("全文", [{'page': 1, 'text': "全文"}], [])
+    store.put("a", value)
+    assert store.get("a") == value
+    assert store.stats()['entries'] == 1
+    store.delete("a")
+    assert store.get("a") is None
+
+
+def test_other_version_is_discarded(path):
+    ExtractionStore(path, version="1").put("a", "old")
+    assert ExtractionStore(path, version="1").get("a") == "old"
+    store = ExtractionStore(path, version="2")
+    assert store.get("a") is None
+    assert store.stats()['entries'] == 0
+
+
+def test_evicts_least_recently_used(path):
+    store = ExtractionStore(path, max_bytes=10 ** 6)
+    # 圧縮しても小さくならない大きさのデータ
+    value = os.urandom(100000)
+    store.put("a", value + b"a")
+    store.put("b", value + b"b")
+    store.get("a")
+    store.max_bytes = store.stats()['bytes'] + 100
+    store.put("c", value + b"c")
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+
+    # 上限より大きい結果は保存しない
+    store.max_bytes = 100
+    store.put("d", value)
+    assert store.get("d") is None
+
+
+def test_corrupt_payload_is_removed(path):
+    store = ExtractionStore(path)
+    store.put("a", "value")
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE extractions SET payload = ? WHERE cache_key = ?", (b"broken", "a"))
+    assert store.get("a") is None
+    assert store.stats()['entries'] == 0